@@ -8,6 +8,8 @@ from pydantic import BaseModel
 import httpx
 from app.auth.dependencies import get_current_user
 from app.models.user import User
+from app.services import singleflight, upstream
+from app.services.circuit_breaker import CircuitOpenError
 import io
 from app.utils.logger import get_logger
 
@@ -15,6 +17,9 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Timeouts amplios para el cálculo de analytics por rango de fechas
+_DATE_RANGE_TIMEOUT = httpx.Timeout(30.0, connect=60.0)
+
 class DailyAnalytics(BaseModel):
     date: date
     customers: int
@@ -29,6 +34,13 @@ class AnalyticsResponse(BaseModel):
     total_vendors: int
     daily_data: List[DailyAnalytics]
 
+@singleflight.coalesce
+async def _fetch_date_range(
+    client: httpx.AsyncClient, db_api_url: str, params: dict
+) -> httpx.Response:
+    """Consultas idénticas concurrentes (dashboards) comparten una sola llamada."""
+    return await client.get(db_api_url, params=params, timeout=_DATE_RANGE_TIMEOUT)
+
 @router.get("/date-range", response_model=AnalyticsResponse)
 async def get_analytics_by_date_range(
     start_date: date = Query(..., description="Fecha inicial (YYYY-MM-DD)"),
@@ -65,13 +77,10 @@ async def get_analytics_by_date_range(
         logger.info(f"Conectando a DB API en: {db_api_url}")
         logger.info(f"Parámetros: {params}")
         
-        # Configuración robusta del cliente HTTP
-        timeout = httpx.Timeout(30.0, connect=60.0)
-        transport = httpx.AsyncHTTPTransport(retries=3)
-        
-        async with httpx.AsyncClient(timeout=timeout, transport=transport) as client:
+        # Cliente compartido; los timeouts amplios van en _DATE_RANGE_TIMEOUT
+        async with upstream.client_session() as client:
             try:
-                response = await client.get(db_api_url, params=params)
+                response = await _fetch_date_range(client, db_api_url, params)
                 logger.info(f"Respuesta recibida - Status: {response.status_code}")
                 
                 if response.status_code != 200:
@@ -123,6 +132,8 @@ async def get_analytics_by_date_range(
                 error_msg = f"Error procesando la respuesta JSON: {str(e)}"
                 logger.error(f"{error_msg}. Response text: {response.text if 'response' in locals() else 'N/A'}")
                 raise HTTPException(status_code=502, detail=error_msg)
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 error_msg = f"Error inesperado: {str(e)}"
                 logger.error(error_msg, exc_info=True)
@@ -132,7 +143,7 @@ async def get_analytics_by_date_range(
         error_msg = f"Error de conexión: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=503, detail=error_msg)
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         error_msg = f"Error inesperado: {str(e)}"
@@ -175,7 +186,7 @@ async def get_analytics_excel(
             params["store_id"] = str(store_id)
         
         # Hacer la petición al servicio smartpay-db-api
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.get(db_api_url, params=params, timeout=30.0)
             
             if response.status_code == 200:
@@ -199,6 +210,8 @@ async def get_analytics_excel(
             status_code=503,
             detail=f"Error de conexión con el servicio de base de datos: {str(e)}"
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,19 +1,22 @@
 import os
 from typing import Optional
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr, Field
 
+from app.auth.claims import AUTH_CLAIMS_MODE, build_claims, bump_user_version
 from app.auth.security import (
     create_access_token,
     decode_access_token,
     generate_password_reset_token,
-    get_password_hash,
-    verify_password,
+    verify_password_async,
     verify_password_reset_token,
 )
+from app.auth.user_cache import invalidate_user
+from app.services import upstream
+from app.services import user as user_service
+from app.services.circuit_breaker import CircuitOpenError
 from app.services.email import send_password_reset_email
 
 router = APIRouter()
@@ -57,13 +60,28 @@ class TokenOut(BaseModel):
     user_id: str
 
 
+async def _token_data(user: dict) -> dict:
+    token_data = {
+        "sub": user["user_id"],
+        "username": user["username"],
+        "role": (
+            user["role"]["name"]
+            if isinstance(user.get("role"), dict)
+            else user.get("role", "")
+        ),
+    }
+    if AUTH_CLAIMS_MODE:
+        token_data.update(await build_claims(user))
+    return token_data
+
+
 @router.post("/login", response_model=TokenOut)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Endpoint seguro de login. Solo requiere username y password (vía formulario).
     No acepta ni expone ningún otro dato sensible.
     """
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         url = f"{USER_SVC_URL}{USER_API_PREFIX}/users/by-username/{form_data.username}"
         resp = await client.get(url, headers=INTERNAL_HDR)
     if resp.status_code != 200:
@@ -79,22 +97,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # Only verify password for non-Initial state users
     password_valid = True
     if user_state != "initial":
-        password_valid = verify_password(form_data.password, user["password_hash"])
+        password_valid = await verify_password_async(
+            form_data.password, user["password_hash"]
+        )
 
     if is_inactive or not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas"
         )
 
-    token_data = {
-        "sub": user["user_id"],
-        "username": user["username"],
-        "role": (
-            user["role"]["name"]
-            if isinstance(user.get("role"), dict)
-            else user.get("role", "")
-        ),
-    }
+    token_data = await _token_data(user)
     token = create_access_token(token_data)
     refresh_token = create_access_token(
         {**token_data, "type": "refresh"}, expires_minutes=60 * 24 * 7
@@ -115,11 +127,18 @@ async def refresh_token(data: RefreshTokenIn):
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
     # Crear nuevos tokens
-    token_data = {
-        "sub": payload["sub"],
-        "username": payload["username"],
-        "role": payload["role"],
-    }
+    if AUTH_CLAIMS_MODE:
+        # Los claims se regeneran con los datos y la versión actuales del usuario
+        user = await user_service.get_user_data(payload["sub"])
+        if user is None:
+            raise HTTPException(status_code=401, detail="Usuario no existe")
+        token_data = await _token_data(user)
+    else:
+        token_data = {
+            "sub": payload["sub"],
+            "username": payload["username"],
+            "role": payload["role"],
+        }
     access_token = create_access_token(token_data)
     new_refresh_token = create_access_token(
         {**token_data, "type": "refresh"}, expires_minutes=60 * 24 * 7
@@ -139,7 +158,7 @@ async def request_password_reset(request: Request, data: PasswordResetRequestIn)
     si el DNI corresponde a un usuario registrado.
     """
     # Buscar usuario por DNI
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         url = f"{USER_SVC_URL}{USER_API_PREFIX}/users/by-dni/{data.dni}"
         resp = await client.get(url, headers=INTERNAL_HDR)
 
@@ -194,7 +213,7 @@ async def confirm_password_reset(data: PasswordResetIn):
         user_id = token_data["user_id"]
 
         # Actualizar contraseña en el servicio de usuarios y cambiar estado a Active
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             update_url = f"{USER_SVC_URL}{USER_API_PREFIX}/users/{user_id}"
             update_resp = await client.patch(
                 update_url,
@@ -204,6 +223,8 @@ async def confirm_password_reset(data: PasswordResetIn):
                     "state": "Active"
                 },
             )
+        invalidate_user(user_id)
+        await bump_user_version(user_id)
 
         if update_resp.status_code != 200:
             raise HTTPException(
@@ -213,7 +234,7 @@ async def confirm_password_reset(data: PasswordResetIn):
 
         return {"message": "Contraseña actualizada exitosamente"}
 
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         raise HTTPException(
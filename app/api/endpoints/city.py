@@ -2,10 +2,13 @@ from typing import List, Optional
 from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, HTTPException, Path, Response, status
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response, status
 
-from app.models.location import CityCreate, CityDB, CityUpdate
+from app.models.location import CityCreate, CityDB, CitySearchResult, CityUpdate
 from app.services import location as location_service
+from app.services import location_catalog
+from app.services.reference_cache import list_etag
+from app.utils.http_cache import not_modified
 
 router = APIRouter()
 
@@ -22,15 +25,46 @@ async def create_city(city_in: CityCreate):
 
 
 @router.get("/", response_model=List[CityDB])
-async def get_all_cities(name: Optional[str] = None, region_id: Optional[UUID] = None):
+async def get_all_cities(
+    request: Request,
+    response: Response,
+    name: Optional[str] = None,
+    region_id: Optional[UUID] = None,
+):
     try:
-        return await location_service.get_cities(name=name, region_id=region_id)
+        items = await location_service.get_cities(name=name, region_id=region_id)
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {e.response.text}",
         )
 
+    etag = list_etag(location_service.cities_cache, name=name, region_id=region_id)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return items
+
+
+@router.get("/search", response_model=List[CitySearchResult])
+async def search_cities(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Autocompletado: ciudades cuyo nombre (o una de sus palabras) empieza
+    por ``q``, sin distinguir tildes ni mayúsculas, con su región y país. Se
+    resuelve en memoria con el catálogo de ubicaciones.
+    """
+    try:
+        snapshot = await location_catalog.get_snapshot()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Error from downstream service: {e.response.text}",
+        )
+    return snapshot.city_index.search(q, limit)
+
 
 @router.get("/{city_id}", response_model=CityDB)
 async def get_city_by_id(city_id: UUID = Path(...)):
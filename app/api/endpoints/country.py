@@ -2,10 +2,18 @@ from typing import List
 from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, HTTPException, Path, status
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response, status
 
-from app.models.location import CountryCreate, CountryDB, CountryUpdate
+from app.models.location import (
+    CountryCreate,
+    CountryDB,
+    CountrySearchResult,
+    CountryUpdate,
+)
 from app.services import location as location_service
+from app.services import location_catalog
+from app.services.reference_cache import list_etag
+from app.utils.http_cache import not_modified
 
 router = APIRouter()
 
@@ -22,15 +30,41 @@ async def create_country(country_in: CountryCreate):
 
 
 @router.get("/", response_model=List[CountryDB])
-async def get_all_countries(name: str = None):
+async def get_all_countries(request: Request, response: Response, name: str = None):
     try:
-        return await location_service.get_countries(name=name)
+        items = await location_service.get_countries(name=name)
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {e.response.text}",
         )
 
+    etag = list_etag(location_service.countries_cache, name=name)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return items
+
+
+@router.get("/search", response_model=List[CountrySearchResult])
+async def search_countries(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Autocompletado: países cuyo nombre, palabra o código empieza por ``q``,
+    sin distinguir tildes ni mayúsculas. Se resuelve en memoria con el
+    catálogo de ubicaciones.
+    """
+    try:
+        snapshot = await location_catalog.get_snapshot()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Error from downstream service: {e.response.text}",
+        )
+    return snapshot.country_index.search(q, limit)
+
 
 @router.get("/{country_id}", response_model=CountryDB)
 async def get_country_by_id(country_id: UUID = Path(...)):
@@ -12,6 +12,8 @@ from app.models.device import Device, DeviceCreate, DeviceUpdate
 from app.models.location import LocationCreate, LocationDB
 from app.services import device as device_service
 from app.services import location as location_service
+from app.services import upstream
+from app.services.circuit_breaker import CircuitOpenError
 
 
 router = APIRouter()
@@ -89,7 +91,7 @@ async def delete_device(device_id: UUID):
 )
 async def create_location(location_in: LocationCreate):
     # Check if device exists
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             db_api = os.getenv("DB_API", "http://smartpay-db-api:8002")
             response = await client.get(
@@ -106,6 +108,8 @@ async def create_location(location_in: LocationCreate):
                 # If we get an error other than 404, we return the same status and detail
                 detail = e.response.json().get("detail", "Error from device service")
                 raise HTTPException(status_code=e.response.status_code, detail=detail)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail="Internal server error")
 
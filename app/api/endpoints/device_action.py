@@ -1,20 +1,58 @@
-from typing import Any, Dict, Optional
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from app.models.action import ActionType
-from app.services.socket_service import send_and_log_action
+from app.services import device_rpc
+from app.services.socket_service import send_and_log_action, send_bulk_action
 
 router = APIRouter()
 
+# Dispositivos máximos por petición masiva
+BULK_ACTION_MAX_DEVICES = 50000
+
 
 class ActionBody(BaseModel):
     applied_by_id: UUID
     payload: Optional[Dict[str, Any]] = None
 
 
+class BulkActionBody(ActionBody):
+    device_ids: List[UUID] = Field(
+        ..., min_length=1, max_length=BULK_ACTION_MAX_DEVICES
+    )
+    command: ActionType
+
+
+@router.post("/bulk", tags=["Device Actions"])
+async def action_bulk(body: BulkActionBody):
+    """
+    Send the same command to many devices.
+
+    Streams one NDJSON line per device as soon as its delivery finishes,
+    followed by a final ``summary`` line with the count per status.
+    """
+    # Sin duplicados, conservando el orden
+    device_ids = list(dict.fromkeys(body.device_ids))
+
+    async def results():
+        counts = Counter()
+        async for result in send_bulk_action(
+            device_ids, body.command, body.applied_by_id, body.payload
+        ):
+            counts[result["status"]] += 1
+            yield json.dumps(result) + "\n"
+        summary = {"command": body.command.value, "devices": len(device_ids), **counts}
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @router.post("/{device_id}/block", tags=["Device Actions"])
 async def action_block(device_id: UUID, body: ActionBody):
     """Block a device"""
@@ -32,8 +70,25 @@ async def action_block_sim(device_id: UUID, body: ActionBody):
 
 
 @router.post("/{device_id}/locate", tags=["Device Actions"])
-async def action_locate(device_id: UUID, body: ActionBody):
-    """Locate a device"""
+async def action_locate(
+    device_id: UUID,
+    body: ActionBody,
+    wait: bool = Query(
+        False, description="Wait for the device's location, battery and lock state"
+    ),
+    timeout: float = Query(device_rpc.DEVICE_RPC_TIMEOUT, gt=0, le=30),
+):
+    """
+    Locate a device.
+
+    With ``wait=true`` the response carries the device's answer (``source:
+    device``) or, if it is offline or does not answer within ``timeout``
+    seconds, the last known values (``source: last_known``).
+    """
+    if wait:
+        return await device_rpc.locate(
+            device_id, body.applied_by_id, body.payload, timeout
+        )
     return await send_and_log_action(
         device_id, "locate", body.applied_by_id, body.payload
     )
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from fastapi import APIRouter
+
+from app.services import action_log, delivery_metrics, device_presence
+from app.services import location as location_service
+from app.services import outbound, replay
+from app.services import role as role_service
+from app.services import singleflight, storm_control
+from app.services.circuit_breaker import get_breakers_status
+
+router = APIRouter()
+
+
+@router.get("/upstream")
+async def get_upstream_status():
+    """Estado de los circuit breakers por familia de rutas de la DB-API."""
+    return {
+        "breakers": get_breakers_status(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/singleflight")
+async def get_singleflight_stats():
+    """Lecturas upstream fusionadas por la coalescencia de llamadas idénticas."""
+    return {
+        "functions": singleflight.get_stats(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/reference-cache")
+async def get_reference_cache_status():
+    """Estado de la caché de países, regiones, ciudades y roles."""
+    caches = (
+        location_service.countries_cache,
+        location_service.regions_cache,
+        location_service.cities_cache,
+        role_service.roles_cache,
+    )
+    return {
+        "caches": {cache.name: cache.snapshot() for cache in caches},
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/delivery")
+async def get_delivery_stats():
+    """Latencia emit → ack y confirmaciones de los comandos, por tipo de comando."""
+    return {
+        "commands": delivery_metrics.get_stats(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/action-log")
+async def get_action_log_status():
+    """Registros de acción pendientes, escritos y guardados en el fichero local."""
+    return {
+        "writer": action_log.writer.snapshot(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/presence")
+async def get_presence_status():
+    """Dispositivos con registro de presencia, conectados y sesiones vencidas."""
+    return {
+        "presence": device_presence.tracker.snapshot(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/outbound")
+async def get_outbound_status():
+    """Colas de salida por dispositivo: profundidad, espera, coalescidos y descartados por carril."""
+    return {
+        "outbound": outbound.scheduler.snapshot(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/admission")
+async def get_admission_status():
+    """Sesiones Socket.IO admitidas y rechazadas, calentamiento y drenaje."""
+    return {
+        "admission": storm_control.admission.snapshot(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/replay")
+async def get_replay_status():
+    """Búfer de reenvío: epoch, dispositivos, eventos guardados, reenviados y resincronizaciones."""
+    return {
+        "replay": replay.log.snapshot(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
@@ -0,0 +1,47 @@
+from typing import Optional
+from uuid import UUID
+
+import httpx
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.services import location_catalog
+from app.utils.http_cache import not_modified
+
+router = APIRouter()
+
+
+@router.get("/catalog")
+async def get_location_catalog(
+    request: Request,
+    response: Response,
+    country_id: Optional[UUID] = Query(None),
+    region_id: Optional[UUID] = Query(None),
+):
+    """
+    Árbol completo de ubicaciones (país → región → ciudad) en una sola
+    respuesta, o el subárbol de un país (``country_id``) o una región
+    (``region_id``).
+    """
+    try:
+        snapshot = await location_catalog.get_snapshot()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Error from downstream service: {e.response.text}",
+        )
+
+    if region_id or country_id:
+        subtree = snapshot.subtree(
+            country_id=str(country_id) if country_id else None,
+            region_id=str(region_id) if region_id else None,
+        )
+        if subtree is None:
+            raise HTTPException(status_code=404, detail="Location not found")
+        body, etag = subtree
+    else:
+        body, etag = snapshot.body, snapshot.etag
+
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
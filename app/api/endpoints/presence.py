@@ -0,0 +1,50 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.models.presence import DevicePresencePage, DevicePresenceResponse
+from app.services.device_presence import tracker
+from app.services.socket_service import manager
+
+router = APIRouter()
+
+
+@router.get("", response_model=DevicePresencePage)
+async def list_presence(
+    store_id: Optional[str] = Query(
+        None, description="Solo dispositivos de esta tienda"
+    ),
+    online: Optional[bool] = Query(
+        None, description="Filtrar por conectados/desconectados"
+    ),
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
+):
+    """
+    Presencia de los dispositivos: si están conectados, desde cuándo y su
+    última señal, ordenados por device_id.
+
+    Lista los dispositivos conocidos por este worker (los filtros también se
+    aplican sobre ellos); ``online`` de cada uno es el de todo el clúster.
+    """
+    total, records = tracker.query(
+        store_id=store_id, online=online, skip=skip, limit=limit
+    )
+    online_ids = await manager.online_devices([record.device_id for record in records])
+    return {
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "items": [
+            record.to_dict(online=record.device_id in online_ids) for record in records
+        ],
+    }
+
+
+@router.get("/{device_id}", response_model=DevicePresenceResponse)
+async def get_presence(device_id: str):
+    """Presencia de un dispositivo según este worker, con ``online`` de todo el clúster."""
+    record = tracker.get(device_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Device has never connected")
+    return record.to_dict(online=await manager.is_online(device_id))
@@ -2,10 +2,12 @@ from typing import List, Optional
 from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, HTTPException, Path, status
+from fastapi import APIRouter, HTTPException, Path, Request, Response, status
 
 from app.models.location import RegionCreate, RegionDB, RegionUpdate
 from app.services import location as location_service
+from app.services.reference_cache import list_etag
+from app.utils.http_cache import not_modified
 
 router = APIRouter()
 
@@ -22,15 +24,26 @@ async def create_region(region_in: RegionCreate):
 
 
 @router.get("/", response_model=List[RegionDB])
-async def get_all_regions(country_id: Optional[UUID] = None, name: Optional[str] = None):
+async def get_all_regions(
+    request: Request,
+    response: Response,
+    country_id: Optional[UUID] = None,
+    name: Optional[str] = None,
+):
     try:
-        return await location_service.get_regions(country_id=country_id, name=name)
+        items = await location_service.get_regions(country_id=country_id, name=name)
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {e.response.text}",
         )
 
+    etag = list_etag(location_service.regions_cache, country_id=country_id, name=name)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return items
+
 
 @router.get("/{region_id}", response_model=RegionDB)
 async def get_region_by_id(region_id: UUID = Path(...)):
@@ -2,25 +2,33 @@ from typing import List, Optional
 from uuid import UUID
 
 import httpx
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 
 from app.models.role import Role, RoleCreate, RoleUpdate
 from app.services import role as role_service
+from app.services.reference_cache import list_etag
+from app.utils.http_cache import not_modified
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[Role])
-async def list_roles(name: Optional[str] = None):
+async def list_roles(request: Request, response: Response, name: Optional[str] = None):
     """Lista todos los roles. Permite filtrar por nombre."""
     try:
-        return await role_service.get_roles(name=name)
+        items = await role_service.get_roles(name=name)
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {e.response.text}",
         )
 
+    etag = list_etag(role_service.roles_cache, name=name)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return items
+
 
 @router.get("/{role_id}", response_model=Role)
 async def get_role(role_id: UUID):
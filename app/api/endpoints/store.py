@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException, Response, status
 
 from app.models.store import StoreCreate, StoreDB, StoreUpdate
 from app.services import store as store_service
+from app.services.circuit_breaker import CircuitOpenError
 from app.services.deployment import deployment_service
 from app.utils.logger import get_logger
 
@@ -51,6 +52,8 @@ async def read_stores(country_id: Optional[UUID] = None, plan: Optional[str] = N
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {error_detail}",
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al obtener tiendas: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -82,6 +85,8 @@ async def read_stores_by_country(country_id: UUID):
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {error_detail}",
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al obtener tiendas por país: {str(e)}", exc_info=True
@@ -172,7 +177,7 @@ async def create_and_deploy_store(store_in: StoreCreate):
             }
         }
         
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         logger.error(f"Error inesperado en deployment de tienda: {str(e)}", exc_info=True)
@@ -215,7 +220,7 @@ async def create_store(store_in: StoreCreate):
             logger.error(f"Error al crear tienda: {error_detail}", exc_info=True)
             raise HTTPException(status_code=e.response.status_code, detail=error_detail)
         
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         # Re-lanzar HTTPExceptions tal como están
         raise
     except Exception as e:
@@ -261,7 +266,7 @@ async def deploy_existing_store(store_id: UUID):
             }
         }
         
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         logger.error(f"Error inesperado en deployment de tienda {store_id}: {str(e)}", exc_info=True)
@@ -296,7 +301,7 @@ async def get_deployment_status(store_id: UUID):
         
         return deployment_status
         
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         logger.error(f"Error obteniendo estado de deployment para tienda {store_id}: {str(e)}", exc_info=True)
@@ -363,7 +368,7 @@ async def undeploy_store(store_id: UUID):
             "status": "undeployed"
         }
         
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         logger.error(f"Error inesperado en undeploy de tienda {store_id}: {str(e)}", exc_info=True)
@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, Response, status
 from app.auth.dependencies import get_current_user
 from app.models.user import User, UserCreate, UserUpdate
 from app.services import user as user_service
+from app.services.circuit_breaker import CircuitOpenError
 from app.utils.logger import get_logger
 
 # Configurar el logger para este módulo
@@ -31,6 +32,8 @@ async def create_user(user_in: UserCreate):
 
         logger.error(f"Error al crear usuario: {error_detail}", exc_info=True)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al crear usuario: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -71,6 +74,8 @@ async def read_users(role_name: Optional[str] = None, state: Optional[str] = Non
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {error_detail}",
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al obtener usuarios: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -113,6 +118,8 @@ async def create_user_for_store(store_id: UUID, user_in: UserCreate):
 
         logger.error(f"Error al crear usuario para tienda: {error_detail}", exc_info=True)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al crear usuario para tienda: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -142,6 +149,8 @@ async def update_user_store(store_id: UUID, user_id: UUID):
 
         logger.error(f"Error al actualizar tienda del usuario: {error_detail}", exc_info=True)
         raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al actualizar tienda del usuario: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -169,6 +178,8 @@ async def read_users_by_store(store_id: UUID, role_name: Optional[str] = None, s
             status_code=e.response.status_code,
             detail=f"Error from downstream service: {error_detail}",
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al obtener usuarios por tienda: {str(e)}", exc_info=True)
         raise HTTPException(
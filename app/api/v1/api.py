@@ -7,8 +7,11 @@ from app.api.endpoints import (
     country,
     device,
     device_action,
+    diagnostics,
     enrolment,
+    location,
     plan,
+    presence,
     region,
     role,
     store,
@@ -40,6 +43,9 @@ api_router.include_router(
     device_action.router, prefix="/device-actions", tags=["device-actions"]
 )
 api_router.include_router(socket_router.router)
+api_router.include_router(
+    diagnostics.router, prefix="/diagnostics", tags=["diagnostics"]
+)
 api_router.include_router(enrolment.router, prefix="/enrolments", tags=["enrolments"])
 api_router.include_router(
     factory_reset_protection.router,
@@ -47,8 +53,10 @@ api_router.include_router(
     tags=["factoryResetProtection"],
 )
 api_router.include_router(google.router, prefix="/google", tags=["google"])
+api_router.include_router(location.router, prefix="/locations", tags=["locations"])
 api_router.include_router(payment.router, prefix="/payments", tags=["payments"])
 api_router.include_router(plan.router, prefix="/plans", tags=["plans"])
+api_router.include_router(presence.router, prefix="/presence", tags=["presence"])
 api_router.include_router(qr_enrollment.router, prefix="/qrEnrollment", tags=["qrEnrollment"])
 api_router.include_router(region.router, prefix="/regions", tags=["regions"])
 api_router.include_router(role.router, prefix="/roles", tags=["roles"])
@@ -0,0 +1,226 @@
+"""
+Modo de autenticación por claims autocontenidos (opcional).
+
+Con ``AUTH_CLAIMS_MODE`` activo, el token de acceso incluye el rol, la
+tienda, el estado y un sello de versión del usuario, y ``get_current_user``
+construye el ``User`` solo a partir del token, sin consultar la DB-API.
+
+Para no aceptar tokens con datos obsoletos se lleva una versión por usuario:
+cada mutación de usuario que pasa por el gateway la incrementa y los tokens
+emitidos con una versión anterior se rechazan (el cliente debe refrescar).
+
+- ``RedisUserVersions``: las versiones están en Redis, compartidas por todos
+  los workers y nodos y a salvo de reinicios. Se usa con
+  ``AUTH_VERSIONS_REDIS_URL`` o, si está vacío, con el Redis de
+  ``PRESENCE_REDIS_URL`` o ``SOCKETIO_MANAGER_URL``. El cliente se crea al
+  primer uso (``get_versions``), no al importar el módulo. Cada clave caduca
+  ``ACCESS_TOKEN_EXPIRE_MINUTES`` después de la última mutación: para
+  entonces ya han expirado todos los tokens que revocaba.
+- ``UserVersions``: en memoria del proceso, para un solo worker. Se pierde
+  al reiniciar, así que un token revocado sigue valiendo hasta que expira.
+"""
+
+import os
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from app.auth.security import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.models.role import Role
+from app.models.user import StoreResponse, User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+AUTH_CLAIMS_MODE = os.getenv("AUTH_CLAIMS_MODE", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# URL de Redis para las versiones de usuario; vacío = la de la presencia o el
+# client manager si es Redis o, si no, en memoria del proceso
+AUTH_VERSIONS_REDIS_URL = os.getenv("AUTH_VERSIONS_REDIS_URL", "")
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "")
+SOCKETIO_MANAGER_URL = os.getenv("SOCKETIO_MANAGER_URL", "")
+
+# Claims sin los que no se puede construir el principal
+_REQUIRED_CLAIMS = ("sub", "username", "email")
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def _key(user_id: Any) -> str:
+    try:
+        return str(UUID(str(user_id)))
+    except ValueError:
+        return str(user_id)
+
+
+def normalize_user_state(state: Optional[str]) -> Optional[str]:
+    """Estado del servicio de usuarios al formato corto del gateway (A/I)."""
+    if state in ("UserState.ACTIVE", "Active"):
+        return "A"
+    if state == "Initial":
+        return "I"
+    return state
+
+
+class UserVersions:
+    """Versiones en memoria del proceso; sin entrada equivale a 0."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, user_id: Any) -> int:
+        return self._versions.get(_key(user_id), 0)
+
+    async def bump(self, user_id: Any) -> None:
+        key = _key(user_id)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisUserVersions(UserVersions):
+    """Versiones en Redis compartidas por todos los nodos (requiere ``redis``)."""
+
+    def __init__(
+        self,
+        url: str,
+        ttl: int = ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        prefix: str = "smartpay:user-version",
+    ):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:  # pragma: no cover - dependencia opcional
+            raise RuntimeError(
+                "AUTH_VERSIONS_REDIS_URL requiere el paquete 'redis'"
+            ) from e
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self._prefix = prefix
+
+    async def get(self, user_id: Any) -> int:
+        return int(await self._redis.get(f"{self._prefix}:{_key(user_id)}") or 0)
+
+    async def bump(self, user_id: Any) -> None:
+        key = f"{self._prefix}:{_key(user_id)}"
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_user_versions(
+    url: str = AUTH_VERSIONS_REDIS_URL,
+    presence_url: str = PRESENCE_REDIS_URL,
+    manager_url: str = SOCKETIO_MANAGER_URL,
+) -> UserVersions:
+    """Redis si hay URL propia, de presencia o de un client manager Redis."""
+    if not url:
+        url = presence_url
+        if not url and manager_url.startswith(("redis://", "rediss://")):
+            url = manager_url
+    if url:
+        return RedisUserVersions(url)
+    if AUTH_CLAIMS_MODE:
+        logger.warning(
+            "AUTH_CLAIMS_MODE sin Redis: las revocaciones de tokens son de cada "
+            "worker y se pierden al reiniciar"
+        )
+    return UserVersions()
+
+
+versions: Optional[UserVersions] = None
+
+
+def get_versions() -> UserVersions:
+    """Versiones compartidas del proceso, creadas al primer uso."""
+    global versions
+    if versions is None:
+        versions = create_user_versions()
+    return versions
+
+
+async def close_versions() -> None:
+    global versions
+    if versions is not None:
+        await versions.close()
+        versions = None
+
+
+async def current_version(user_id: Any) -> int:
+    return await get_versions().get(user_id)
+
+
+async def bump_user_version(user_id: Any) -> None:
+    """Invalida los tokens con claims emitidos hasta ahora para el usuario."""
+    await get_versions().bump(user_id)
+
+
+async def is_stale(payload: Dict[str, Any]) -> bool:
+    try:
+        version = int(payload.get("ver", 0))
+    except (TypeError, ValueError):
+        return True
+    return version < await current_version(payload.get("sub"))
+
+
+async def build_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Claims del principal a partir del usuario devuelto por la DB-API."""
+    role: Dict[str, Any] = user["role"] if isinstance(user.get("role"), dict) else {}
+    store: Dict[str, Any] = user["store"] if isinstance(user.get("store"), dict) else {}
+    return {
+        "email": user.get("email"),
+        "first_name": user.get("first_name"),
+        "last_name": user.get("last_name"),
+        "role_id": role.get("role_id"),
+        "store_id": store.get("id") or user.get("store_id"),
+        "store_name": store.get("nombre"),
+        "state": normalize_user_state(user.get("state")),
+        "ver": await current_version(user["user_id"]),
+    }
+
+
+def has_claims(payload: Dict[str, Any]) -> bool:
+    return AUTH_CLAIMS_MODE and "ver" in payload
+
+
+def user_from_claims(payload: Dict[str, Any]) -> User:
+    """
+    Principal construido solo con los datos del token. Si faltan claims o
+    no son válidos lanza ``credentials_exception`` (401).
+    """
+    if not all(isinstance(payload.get(claim), str) for claim in _REQUIRED_CLAIMS):
+        raise credentials_exception
+    try:
+        role = None
+        if payload.get("role_id") and payload.get("role"):
+            role = Role(role_id=payload["role_id"], name=payload["role"])
+        store = None
+        if payload.get("store_id"):
+            store = StoreResponse(
+                id=payload["store_id"], nombre=payload.get("store_name") or ""
+            )
+        return User(
+            user_id=payload["sub"],
+            username=payload["username"],
+            email=payload["email"],
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name"),
+            state=payload.get("state"),
+            role=role,
+            store=store,
+        )
+    except ValidationError as e:
+        raise credentials_exception from e
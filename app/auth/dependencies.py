@@ -1,16 +1,13 @@
-import os
 from uuid import UUID
 
-import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.auth.claims import has_claims, is_stale, normalize_user_state, user_from_claims
 from app.auth.security import decode_access_token
+from app.auth.user_cache import cache_user, get_cached_user, user_cache
 from app.models.user import User
-
-USER_SVC_URL = os.getenv("USER_SVC_URL") or os.getenv("DB_API", "http://localhost:8002")
-USER_API_PREFIX = "/api/v1"
-INTERNAL_HDR = {"X-Internal-Request": "true"}
+from app.services import user as user_service
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -33,26 +30,40 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    async with httpx.AsyncClient() as client:
-        url = f"{USER_SVC_URL}{USER_API_PREFIX}/users/{user_id}"
-        resp = await client.get(url, headers=INTERNAL_HDR)
+    if has_claims(payload):
+        # Modo claims: el principal sale del token, sin consultar la DB-API
+        if await is_stale(payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token revocado, vuelva a iniciar sesión",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = user_from_claims(payload)
+        if user.state not in ["A", "I"]:
+            raise HTTPException(status_code=400, detail="Usuario inactivo o bloqueado")
+        return user
+
+    # Clave normalizada (UUID en minúsculas), la misma que usan las invalidaciones
+    cached = get_cached_user(str(user_id))
+    if cached is not None:
+        return cached
 
-    if resp.status_code != 200:
+    # Se carga por el DataLoader de usuarios: si el endpoint pide el mismo
+    # usuario en la misma petición, no se repite la llamada a la DB-API
+    generation = user_cache.generation
+    user_data = await user_service.get_user_data(user_id)
+    if user_data is None:
         raise HTTPException(status_code=401, detail="Usuario no existe")
 
-    user_data = resp.json()
-
     # Normalize user state from user service
-    user_state = user_data.get("state")
-    if user_state in ("UserState.ACTIVE", "Active"):
-        user_data["state"] = "A"
-    elif user_state == "Initial":
-        user_data["state"] = "I"
+    user_data["state"] = normalize_user_state(user_data.get("state"))
 
     if user_data.get("state") not in ["A", "I"]:
         raise HTTPException(status_code=400, detail="Usuario inactivo o bloqueado")
 
-    return User(**user_data)
+    user = User(**user_data)
+    cache_user(str(user_id), user, generation)
+    return user
 
 
 def role_checker(allowed: list[str]):
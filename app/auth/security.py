@@ -1,6 +1,8 @@
+import asyncio
 import datetime as dt
 import os
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
 
 from fastapi import HTTPException, status
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
@@ -17,7 +19,23 @@ PWD_RESET_SECRET_KEY: str = os.getenv("PWD_RESET_SECRET_KEY", JWT_SECRET_KEY)
 PWD_RESET_SALT: str = os.getenv("PWD_RESET_SALT", "password-reset-salt")
 PWD_RESET_EXPIRES_MINUTES: int = int(os.getenv("PWD_RESET_EXPIRES_MINUTES", "30"))
 
+# Pool de hilos para bcrypt (libera el GIL): el event loop no se bloquea.
+# PASSWORD_HASH_WORKERS=0 ejecuta bcrypt en línea, como antes.
+PASSWORD_HASH_WORKERS: int = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# Verificaciones en espera + en curso admitidas; el resto recibe 503 al instante
+PASSWORD_HASH_MAX_PENDING: int = int(
+    os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8))
+)
+# Tiempo máximo de espera por un hilo libre antes de responder 503
+PASSWORD_HASH_QUEUE_TIMEOUT: float = float(
+    os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2.0")
+)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+T = TypeVar("T")
 # Serializer para tokens de restablecimiento de contraseña
 pwd_reset_serializer = URLSafeTimedSerializer(PWD_RESET_SECRET_KEY)
 
@@ -32,6 +50,72 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHashPool:
+    """Ejecuta bcrypt en un pool acotado con límite de admisión y de espera."""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _overloaded(self) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiados inicios de sesión simultáneos, intente de nuevo",
+            headers={"Retry-After": "1"},
+        )
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.workers <= 0:
+            return func(*args)
+        if self.pending >= self.max_pending:
+            raise self._overloaded()
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # El semáforo pertenece al event loop en el que se creó
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers)
+        slots = self._slots
+        assert slots is not None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._overloaded()
+            try:
+                return await loop.run_in_executor(self._executor, func, *args)
+            finally:
+                slots.release()
+        finally:
+            self.pending -= 1
+
+
+password_pool = PasswordHashPool()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """``verify_password`` fuera del event loop; 503 si el pool está saturado."""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(
     data: Dict[str, Any], expires_minutes: int | None = None
 ) -> str:
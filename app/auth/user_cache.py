@@ -0,0 +1,97 @@
+"""
+Caché en proceso del usuario autenticado (``get_current_user``).
+
+Guarda el ``User`` ya normalizado por ``sub`` del token durante un TTL corto,
+con un máximo de entradas (LRU). Así los endpoints protegidos no hacen un
+GET ``/users/{id}`` a la DB-API en cada petición. Las mutaciones de usuario
+que pasan por el gateway (``update_user``, ``delete_user``,
+``update_user_store``, restablecimiento de contraseña) invalidan la entrada;
+los cambios hechos directamente en la DB-API se ven al expirar el TTL.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from uuid import UUID
+
+from app.models.user import User
+
+AUTH_USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Segundos que un usuario cacheado se considera vigente
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+# Usuarios distintos máximos en caché (se descarta el menos usado)
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+
+
+class UserCache:
+    """Caché TTL + LRU de usuarios autenticados por ``sub``."""
+
+    def __init__(
+        self,
+        ttl: float = AUTH_USER_CACHE_TTL,
+        max_size: int = AUTH_USER_CACHE_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        # Se incrementa en cada invalidación; una carga iniciada antes no se guarda
+        self.generation = 0
+
+    def get(self, sub: str) -> Optional[User]:
+        entry = self._entries.get(sub)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= self._clock():
+            del self._entries[sub]
+            return None
+        self._entries.move_to_end(sub)
+        # Copia: los llamadores no deben alterar la entrada compartida
+        return user.model_copy()
+
+    def put(self, sub: str, user: User, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[sub] = (self._clock() + self.ttl, user)
+        self._entries.move_to_end(sub)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, sub: str) -> None:
+        self.generation += 1
+        self._entries.pop(sub, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+def get_cached_user(sub: str) -> Optional[User]:
+    if not AUTH_USER_CACHE_ENABLED:
+        return None
+    return user_cache.get(sub)
+
+
+def cache_user(sub: str, user: User, generation: Optional[int] = None) -> None:
+    if AUTH_USER_CACHE_ENABLED:
+        user_cache.put(sub, user, generation)
+
+
+def invalidate_user(user_id) -> None:
+    """Descarta el usuario cacheado tras modificarlo o eliminarlo."""
+    try:
+        user_cache.invalidate(str(UUID(str(user_id))))
+    except ValueError:
+        user_cache.invalidate(str(user_id))
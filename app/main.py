@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 import socketio
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
@@ -5,9 +7,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.api import api_router
+from app.auth import claims
+from app.middleware.dataloader import setup_dataloader
 from app.middleware.error_logging import setup_error_logging
 from app.routers.socket_router import router as socket_router
-from app.services.socket_service import sio
+from app.services import (
+    action_log,
+    device_presence,
+    location_catalog,
+    replay,
+    storm_control,
+    upstream,
+)
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.socket_service import drain_connections, drain_on_signal, manager, sio
 from app.utils.logger import get_logger
 
 # Configurar el logger principal
@@ -16,6 +29,38 @@ logger = get_logger(__name__)
 # Importar routers y la instancia de Socket.IO
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación.
+
+    Arranca el cliente HTTP hacia la DB-API y los servicios en segundo plano
+    (presencia, catálogo de ubicaciones, registro de acciones, control de
+    tormentas y búfer de reenvío). El drenaje escalonado de las conexiones
+    Socket.IO empieza con la señal de parada, antes de que uvicorn cierre los
+    websockets; al apagar se drena lo que quede y se detienen los servicios
+    en orden inverso.
+    """
+    await upstream.start_client()
+    await manager.start()
+    device_presence.tracker.start()
+    location_catalog.start_refresher()
+    action_log.writer.start()
+    storm_control.admission.start()
+    replay.log.start(manager.connections)
+    if storm_control.SOCKETIO_DRAIN_ON_SIGNAL:
+        drain_on_signal()
+    yield
+    await drain_connections()
+    await replay.log.stop()
+    await action_log.writer.stop()
+    await location_catalog.stop_refresher()
+    await device_presence.tracker.stop()
+    await manager.stop()
+    await claims.close_versions()
+    await upstream.close_client()
+
+
 # Configuración de la aplicación FastAPI
 app = FastAPI(
     title="SmartPay Gateway API",
@@ -23,6 +68,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Montar la aplicación Socket.IO en la ruta /socket.io
@@ -51,6 +97,9 @@ app.add_middleware(
 # Configurar el middleware de logging de errores
 setup_error_logging(app)
 
+# Loaders por petición para agrupar las búsquedas por ID hacia la DB-API
+setup_dataloader(app)
+
 
 # Manejador personalizado para errores de validación (422 Unprocessable Entity)
 @app.exception_handler(RequestValidationError)
@@ -81,6 +130,17 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+# Respuesta inmediata cuando el circuit breaker de la DB-API está abierto
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenError):
+    logger.warning(f"Petición rechazada por circuit breaker: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "upstream": exc.family},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
+
+
 # Endpoint raíz
 @app.get("/")
 async def root():
@@ -0,0 +1,31 @@
+"""
+Middleware que abre un ámbito de DataLoaders por petición HTTP.
+"""
+
+from typing import Callable
+
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.services import dataloader
+
+
+class DataLoaderMiddleware(BaseHTTPMiddleware):
+    """
+    Cada petición obtiene loaders nuevos, de modo que los lotes y la
+    memorización de entidades nunca se comparten entre peticiones.
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        token = dataloader.start_request_scope()
+        try:
+            return await call_next(request)
+        finally:
+            dataloader.end_request_scope(token)
+
+
+def setup_dataloader(app: FastAPI) -> None:
+    """
+    Configura el middleware de DataLoaders en la aplicación FastAPI.
+    """
+    app.add_middleware(DataLoaderMiddleware)
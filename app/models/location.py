@@ -139,6 +139,23 @@ class CityDB(CityBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schemas for autocomplete (/cities/search, /countries/search)
+class CountrySearchResult(BaseModel):
+    country_id: UUID
+    name: str
+    code: str
+    prefix: Optional[str] = None
+
+
+class CitySearchResult(BaseModel):
+    city_id: UUID
+    name: str
+    region_id: UUID
+    region: str
+    country_id: UUID
+    country: str
+
+
 # Schemas for Location
 class LocationBase(BaseModel):
     device_id: UUID
@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class DevicePresenceResponse(BaseModel):
+    device_id: str
+    store_id: Optional[str] = None
+    online: bool
+    sessions: int
+    connected_at: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    disconnected_at: Optional[datetime] = None
+
+
+class DevicePresencePage(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    items: List[DevicePresenceResponse]
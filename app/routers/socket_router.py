@@ -16,13 +16,20 @@ class MessageRequest(BaseModel):
     room_id: str  # obligatorio
 
 
+class StoreMessageRequest(BaseModel):
+    message: str
+    sender_id: Optional[str] = None
+    plan_state: Optional[str] = None  # solo dispositivos con este estado de plan
+
+
 @router.get("/connections", tags=["Monitoring"])
-def get_connections():
+async def get_connections():
     """
     Get information about current WebSocket connections
+    (across all gateway workers/nodes).
     """
     return {
-        "connected_devices": manager.total_devices(),
+        "connected_devices": await manager.count_devices(),
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
 
@@ -35,7 +42,7 @@ async def broadcast_message(message_request: MessageRequest):
     - **sender_id**: Identificador (opcional) del emisor.
     - **room_id**: Sala/Dispositivo destino. Obligatorio.
     """
-    if not manager.active_connections:
+    if not await manager.count_devices():
         raise HTTPException(status_code=404, detail="No devices connected")
     base_msg = {
         "type": "broadcast",
@@ -44,7 +51,7 @@ async def broadcast_message(message_request: MessageRequest):
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
     target = message_request.room_id
-    if target not in manager.active_connections:
+    if not await manager.is_online(target):
         raise HTTPException(status_code=404, detail="Target device not connected")
 
     directed_msg = {**base_msg, "recipients": 1, "room_id": target}
@@ -56,3 +63,38 @@ async def broadcast_message(message_request: MessageRequest):
         "recipients": 1,
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
+
+
+@router.post("/broadcast/store/{store_id}", tags=["Messaging"])
+async def broadcast_store_message(store_id: str, message_request: StoreMessageRequest):
+    """
+    Envío de un mensaje a todos los dispositivos conectados de una tienda.
+    - **message**: Contenido a enviar.
+    - **sender_id**: Identificador (opcional) del emisor.
+    - **plan_state**: Solo a los dispositivos con ese estado de plan (p. ej. `overdue`).
+    """
+    directed_msg = {
+        "type": "broadcast",
+        "message": message_request.message,
+        "from_device": message_request.sender_id,
+        "store_id": store_id,
+        "plan_state": message_request.plan_state,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+    # Un solo emit a la sala de la tienda
+    recipients = await manager.send_to_store(
+        store_id,
+        event="message",
+        data=directed_msg,
+        plan_state=message_request.plan_state,
+    )
+    if not recipients:
+        raise HTTPException(
+            status_code=404, detail="No devices connected for this store"
+        )
+    return {
+        "status": "success",
+        "message": "Message sent to store devices successfully",
+        "recipients": recipients,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
@@ -1,17 +1,22 @@
+import asyncio
 import os
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
 from app.models.action import ActionState
 
 import httpx
 
 from app.models.action import ActionCreate, ActionResponse, ActionUpdate
+from app.services import upstream
 
 # Obtener la URL del servicio de base de datos de las variables de entorno
 DB_API_URL = os.getenv("DB_API", "http://localhost:8002")
 API_PREFIX = "/api/v1"
 INTERNAL_HDR = {"X-Internal-Request": "true"}
 
+# Se desactiva al detectar que la DB-API no tiene ``POST /actions/bulk``
+_bulk_create_supported = True
+
 
 async def create_action(action_in: ActionCreate) -> Optional[ActionResponse]:
     """
@@ -21,7 +26,7 @@ async def create_action(action_in: ActionCreate) -> Optional[ActionResponse]:
     # Asumimos que el endpoint en el servicio DB es /api/v1/actions
     url = f"{DB_API_URL}{API_PREFIX}/actions"
 
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             # Enviar la solicitud POST con los datos de la acción en formato JSON
             response = await client.post(
@@ -44,6 +49,87 @@ async def create_action(action_in: ActionCreate) -> Optional[ActionResponse]:
             return None
 
 
+async def write_actions(
+    actions_in: List[ActionCreate],
+) -> List[Union[ActionResponse, None, Exception]]:
+    """
+    Crea varias acciones con una sola llamada a ``POST /actions/bulk``.
+
+    Si la DB-API no tiene esa ruta, se crean en paralelo una a una. Devuelve
+    una lista alineada con ``actions_in`` con la acción creada, None si la
+    DB-API la rechazó (4xx) o la excepción si no estaba disponible (error de
+    conexión, 5xx o breaker abierto) y puede reintentarse.
+    """
+    global _bulk_create_supported
+    if not actions_in:
+        return []
+
+    if _bulk_create_supported and len(actions_in) > 1:
+        url = f"{DB_API_URL}{API_PREFIX}/actions/bulk"
+        try:
+            async with upstream.client_session() as client:
+                response = await client.post(
+                    url,
+                    json=[action.model_dump(mode="json") for action in actions_in],
+                    headers=INTERNAL_HDR,
+                )
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except Exception as e:
+            print(f"Error al crear acciones en bloque: {e}")
+            return [e] * len(actions_in)
+
+        if response.status_code in (200, 201):
+            created = response.json()
+            if not isinstance(created, list) or len(created) != len(actions_in):
+                # Creadas pero sin poder asociarlas: no se reintenta una a una
+                print("Respuesta inesperada de POST /actions/bulk")
+                return [None] * len(actions_in)
+            results: List[Union[ActionResponse, None, Exception]] = []
+            for item in created:
+                try:
+                    results.append(ActionResponse(**item))
+                except Exception as e:
+                    print(f"Acción creada en bloque con formato inesperado: {e}")
+                    results.append(None)
+            return results
+        if response.status_code in (404, 405):
+            print("La DB-API no admite POST /actions/bulk, se crearán una a una")
+            _bulk_create_supported = False
+        else:
+            print(f"Error al crear acciones en bloque: {response.text}")
+            return [None] * len(actions_in)
+
+    url = f"{DB_API_URL}{API_PREFIX}/actions"
+
+    async def create_one(action_in: ActionCreate) -> Union[ActionResponse, None, Exception]:
+        try:
+            async with upstream.client_session() as client:
+                response = await client.post(
+                    url, json=action_in.model_dump(mode="json"), headers=INTERNAL_HDR
+                )
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except Exception as e:
+            return e
+        try:
+            response.raise_for_status()
+            return ActionResponse(**response.json())
+        except Exception as e:
+            print(f"Error al crear la acción en el servicio DB: {e}")
+            return None
+
+    return list(await asyncio.gather(*(create_one(action) for action in actions_in)))
+
+
+async def create_actions_bulk(
+    actions_in: List[ActionCreate],
+) -> List[Optional[ActionResponse]]:
+    """Como ``write_actions``, con None también para los errores de conexión."""
+    results = await write_actions(actions_in)
+    return [None if isinstance(result, Exception) else result for result in results]
+
+
 async def get_actions(
     device_id: Optional[UUID] = None, state: Optional[ActionState] = None
 ) -> List[ActionResponse]:
@@ -57,7 +143,7 @@ async def get_actions(
     if state:
         params["state"] = params["state"] = state.value
 
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             response = await client.get(url, params=params, headers=INTERNAL_HDR)
             response.raise_for_status()
@@ -75,7 +161,7 @@ async def get_action(action_id: UUID) -> Optional[ActionResponse]:
     Obtiene una única acción por su ID.
     """
     url = f"{DB_API_URL}{API_PREFIX}/actions/{action_id}"
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             response = await client.get(url, headers=INTERNAL_HDR)
             response.raise_for_status()
@@ -97,7 +183,7 @@ async def update_action(
     Actualiza una acción existente.
     """
     url = f"{DB_API_URL}{API_PREFIX}/actions/{action_id}"
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             response = await client.patch(
                 url, json=action_in.model_dump(mode='json', exclude_unset=True), headers=INTERNAL_HDR
@@ -119,7 +205,7 @@ async def delete_action(action_id: UUID) -> bool:
     Elimina una acción por su ID.
     """
     url = f"{DB_API_URL}{API_PREFIX}/actions/{action_id}"
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         try:
             response = await client.delete(url, headers=INTERNAL_HDR)
             response.raise_for_status()
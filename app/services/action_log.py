@@ -0,0 +1,347 @@
+"""
+Registro de acciones en segundo plano (write-behind).
+
+Cuando un comando se entrega a un dispositivo conectado y este lo confirma,
+``send_and_log_action`` responde en cuanto llega el ack y deja aquí el
+registro de la acción ya aplicada. El escritor agrupa los registros y los
+crea en la DB-API con ``POST /actions/bulk``:
+
+- Se vacía al llegar a ``ACTION_LOG_BATCH_SIZE`` registros o cada
+  ``ACTION_LOG_FLUSH_INTERVAL`` segundos.
+- Si la DB-API no está disponible, los registros se guardan en un fichero
+  local (``ACTION_LOG_SPILL_PATH``, una línea JSON por acción) y se
+  reenvían en cuanto una escritura vuelve a funcionar, también tras un
+  reinicio del gateway.
+- Al apagar se vacía lo pendiente (o se guarda en el fichero).
+
+El fichero local se lee y escribe en un hilo (``asyncio.to_thread``) para no
+bloquear el event loop con el disco ni con ``fsync``; un lock serializa esos
+accesos para que un reenvío no aparte el fichero mientras se le añade algo.
+
+Todos los workers comparten el fichero local. Cada uno añade sus registros
+con un ``flock`` (``<ruta>.lock``) para que las líneas no se mezclen. El
+reenvío es de un solo worker a la vez: el que toma ``<ruta>.replay.lock``
+aparta el fichero a ``<ruta>.replay`` y es su dueño hasta terminar; los
+demás lo intentan más tarde. Tras cada lote reenviado se anota cuántos
+registros van (``<ruta>.replay.done``), así que si el worker cae a mitad de
+reenvío, el siguiente sigue desde ahí y como mucho repite un lote.
+"""
+
+import asyncio
+import fcntl
+import os
+import time
+from typing import List, Optional, Tuple
+
+from app.models.action import ActionCreate
+from app.services import action as action_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ACTION_LOG_WRITE_BEHIND = os.getenv("ACTION_LOG_WRITE_BEHIND", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Registros por escritura agrupada
+ACTION_LOG_BATCH_SIZE = int(os.getenv("ACTION_LOG_BATCH_SIZE", "100"))
+# Segundos máximos que un registro espera en memoria
+ACTION_LOG_FLUSH_INTERVAL = float(os.getenv("ACTION_LOG_FLUSH_INTERVAL", "0.5"))
+# Registros máximos en memoria; por encima se escriben directamente al fichero
+ACTION_LOG_MAX_PENDING = int(os.getenv("ACTION_LOG_MAX_PENDING", "10000"))
+# Fichero local para los registros que no se pudieron escribir
+ACTION_LOG_SPILL_PATH = os.getenv(
+    "ACTION_LOG_SPILL_PATH", "data/action_log_spill.ndjson"
+)
+
+# Segundos entre reintentos del fichero local mientras la DB-API no responde
+_REPLAY_BACKOFF = 10.0
+
+
+def _flock(path: str, flags: int = fcntl.LOCK_EX) -> int:
+    """
+    Abre ``path`` y toma su ``flock`` exclusivo, que se suelta al cerrar el
+    descriptor devuelto (o al morir el proceso). Con ``LOCK_NB`` lanza
+    ``BlockingIOError`` si otro lo tiene.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, flags)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+class ActionLogWriter:
+    """Cola en memoria de registros de acción con escritura agrupada."""
+
+    def __init__(
+        self,
+        batch_size: int = ACTION_LOG_BATCH_SIZE,
+        flush_interval: float = ACTION_LOG_FLUSH_INTERVAL,
+        max_pending: int = ACTION_LOG_MAX_PENDING,
+        spill_path: str = ACTION_LOG_SPILL_PATH,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_path = spill_path
+        self._pending: List[ActionCreate] = []
+        # Registros por encima de max_pending que esperan a ir al fichero
+        self._overflow: List[ActionCreate] = []
+        self._overflow_task: Optional["asyncio.Future[None]"] = None
+        # Se vuelve a crear en start() para el event loop en curso
+        self._wakeup = asyncio.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._file_lock: Optional[asyncio.Lock] = None
+        # Descriptor con el flock del reenvío mientras este worker lo hace
+        self._replay_claim: Optional[int] = None
+        self._next_replay = 0.0
+        # Si hay fichero local por reenviar, según lo último que se vio en disco
+        # o lo que este worker apartó; evita mirar el disco en cada vuelta
+        self._spill_pending = False
+        self._next_spill_check = 0.0
+        self._stopping = False
+        self.written = 0
+        self.rejected = 0
+        self.spilled = 0
+        self.batches = 0
+
+    def record(self, action_in: ActionCreate) -> None:
+        """Deja un registro para escribirlo en la próxima escritura agrupada."""
+        if len(self._pending) >= self.max_pending:
+            self._overflow.append(action_in)
+            if self._overflow_task is None or self._overflow_task.done():
+                self._overflow_task = asyncio.ensure_future(self._spill_overflow())
+            return
+        self._pending.append(action_in)
+        self.start()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._file_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Detiene el escritor vaciando antes lo pendiente."""
+        if self._task is not None:
+            # Sin cancel(): en Python < 3.12 wait_for puede tragarse la cancelación
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        if self._overflow_task is not None:
+            await self._overflow_task
+            self._overflow_task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        try:
+            await self._replay_spill()
+        except Exception as e:
+            logger.error(f"No se pudo reenviar el fichero local de acciones: {e}")
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                return
+            self._wakeup.clear()
+            try:
+                available = await self.flush()
+                now = time.monotonic()
+                # El fichero de otros workers se busca cada _REPLAY_BACKOFF segundos
+                if (
+                    available
+                    and now >= self._next_replay
+                    and (self._spill_pending or now >= self._next_spill_check)
+                ):
+                    await self._replay_spill()
+            except Exception as e:
+                logger.error(f"Error en el escritor de acciones: {e}")
+
+    async def flush(self) -> bool:
+        """Escribe todo lo pendiente; False si la DB-API no estaba disponible."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            available = True
+            size = self.batch_size
+            while self._pending:
+                batch = self._pending[:size]
+                del self._pending[:size]
+                available = await self._write(batch) and available
+            return available
+
+    async def _write(self, batch: List[ActionCreate]) -> bool:
+        self.batches += 1
+        results = await action_service.write_actions(batch)
+        retry = [
+            item
+            for item, result in zip(batch, results)
+            if isinstance(result, Exception)
+        ]
+        rejected = sum(1 for result in results if result is None)
+        self.rejected += rejected
+        self.written += len(batch) - len(retry) - rejected
+        if retry:
+            logger.warning(
+                f"DB-API no disponible, {len(retry)} registros de acción al fichero local"
+            )
+            await self._spill_async(retry)
+        return not retry
+
+    async def _spill_overflow(self) -> None:
+        while self._overflow:
+            items, self._overflow = self._overflow, []
+            await self._spill_async(items)
+
+    async def _spill_async(self, items: List[ActionCreate]) -> None:
+        if not items:
+            return
+        async with self._lock_file():
+            await asyncio.to_thread(self._spill, items)
+
+    def _lock_file(self) -> asyncio.Lock:
+        if self._file_lock is None:
+            self._file_lock = asyncio.Lock()
+        return self._file_lock
+
+    def _spill(self, items: List[ActionCreate]) -> None:
+        if not items:
+            return
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock = _flock(self.spill_path + ".lock")
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                for item in items:
+                    spill.write(item.model_dump_json() + "\n")
+                spill.flush()
+                os.fsync(spill.fileno())
+        finally:
+            os.close(lock)
+        self.spilled += len(items)
+        self._spill_pending = True
+
+    def _take_spill(self) -> Optional[Tuple[List[ActionCreate], int]]:
+        """
+        Toma el reenvío para este worker, aparta el fichero local y devuelve
+        sus registros y cuántos de ellos ya se reenviaron. None si no hay
+        nada o si otro worker está reenviando.
+        """
+        if not os.path.exists(self.spill_path) and not os.path.exists(
+            self.spill_path + ".replay"
+        ):
+            self._spill_pending = False
+            return None
+        self._spill_pending = True
+        try:
+            claim = _flock(
+                self.spill_path + ".replay.lock", fcntl.LOCK_EX | fcntl.LOCK_NB
+            )
+        except BlockingIOError:
+            return None
+        replay_path = self.spill_path + ".replay"
+        lock = _flock(self.spill_path + ".lock")
+        try:
+            if os.path.exists(self.spill_path):
+                # Se aparta primero para no perder lo que se añada mientras tanto
+                # (se suma a un reenvío que quedara a medias antes de un reinicio)
+                with open(self.spill_path, encoding="utf-8") as src:
+                    with open(replay_path, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                os.remove(self.spill_path)
+        finally:
+            os.close(lock)
+        if not os.path.exists(replay_path):
+            os.close(claim)
+            return None
+        self._replay_claim = claim
+        with open(replay_path, encoding="utf-8") as spill:
+            items = [
+                ActionCreate.model_validate_json(line) for line in spill if line.strip()
+            ]
+        try:
+            with open(replay_path + ".done", encoding="utf-8") as progress:
+                done = int(progress.read() or 0)
+        except (FileNotFoundError, ValueError):
+            done = 0
+        return items, done
+
+    def _mark_replayed(self, done: int) -> None:
+        """Anota cuántos registros del reenvío en curso ya se escribieron."""
+        progress_path = self.spill_path + ".replay.done"
+        with open(progress_path + ".tmp", "w", encoding="utf-8") as progress:
+            progress.write(str(done))
+            progress.flush()
+            os.fsync(progress.fileno())
+        os.replace(progress_path + ".tmp", progress_path)
+
+    def _end_replay(self, finished: bool) -> None:
+        """Suelta el reenvío; si terminó, borra el fichero apartado."""
+        if finished:
+            for path in (self.spill_path + ".replay", self.spill_path + ".replay.done"):
+                if os.path.exists(path):
+                    os.remove(path)
+            # Lo que se apartó durante el reenvío queda para el siguiente
+            self._spill_pending = os.path.exists(self.spill_path)
+        if self._replay_claim is not None:
+            os.close(self._replay_claim)
+            self._replay_claim = None
+
+    async def _replay_spill(self) -> None:
+        """Reenvía los registros del fichero local; los que fallen vuelven a él."""
+        self._next_spill_check = time.monotonic() + _REPLAY_BACKOFF
+        async with self._lock_file():
+            taken = await asyncio.to_thread(self._take_spill)
+        if taken is None:
+            return
+        items, done = taken
+        finished = False
+        try:
+            logger.info(
+                f"Reenviando {len(items) - done} registros de acción del fichero local"
+            )
+            for start in range(done, len(items), self.batch_size):
+                end = start + self.batch_size
+                if not await self._write(items[start:end]):
+                    # Sigue sin estar disponible: el resto vuelve al fichero
+                    await self._spill_async(items[end:])
+                    self._next_replay = time.monotonic() + _REPLAY_BACKOFF
+                    break
+                await asyncio.to_thread(self._mark_replayed, min(end, len(items)))
+            finished = True
+        finally:
+            # Si no terminó, el fichero apartado y su avance quedan para el siguiente
+            async with self._lock_file():
+                await asyncio.to_thread(self._end_replay, finished)
+
+    def has_spill(self) -> bool:
+        """Si queda fichero local por reenviar (sin mirar el disco)."""
+        return self._spill_pending
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "rejected": self.rejected,
+            "spilled": self.spilled,
+            "batches": self.batches,
+            "spill_file": self.has_spill(),
+        }
+
+
+writer = ActionLogWriter()
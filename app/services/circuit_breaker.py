@@ -0,0 +1,224 @@
+"""
+Circuit breaker para las llamadas a smartpay-db-api.
+
+Cada familia de rutas upstream (``users``, ``payments``, ``actions``,
+``analytics``...) tiene su propio breaker. Cuando la proporción de errores o
+de llamadas lentas supera el umbral, el breaker se abre y las peticiones
+fallan al instante con ``CircuitOpenError`` (503 + Retry-After en la API) en
+lugar de esperar el timeout completo. Pasado el tiempo de apertura, se deja
+pasar un número limitado de peticiones de prueba (half-open) para decidir si
+se cierra de nuevo.
+"""
+
+import os
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, Optional
+
+import httpx
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+UPSTREAM_BREAKER_ENABLED = os.getenv("UPSTREAM_BREAKER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Número de llamadas recientes evaluadas por familia
+UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "20"))
+# Llamadas mínimas en la ventana antes de poder abrir el breaker
+UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "10"))
+# Proporción de fallos (errores, 5xx o llamadas lentas) que abre el breaker
+UPSTREAM_BREAKER_FAILURE_RATIO = float(
+    os.getenv("UPSTREAM_BREAKER_FAILURE_RATIO", "0.5")
+)
+# Una llamada que tarda más de este umbral cuenta como fallo
+UPSTREAM_BREAKER_SLOW_SECONDS = float(os.getenv("UPSTREAM_BREAKER_SLOW_SECONDS", "5"))
+# Tiempo que el breaker permanece abierto antes de pasar a half-open
+UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "30"))
+# Peticiones de prueba permitidas (y necesarias para cerrar) en half-open
+UPSTREAM_BREAKER_HALF_OPEN_PROBES = int(
+    os.getenv("UPSTREAM_BREAKER_HALF_OPEN_PROBES", "2")
+)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """La familia de rutas upstream está abierta; la llamada no se realizó."""
+
+    def __init__(self, family: str, retry_after: float):
+        self.family = family
+        self.retry_after = retry_after
+        super().__init__(
+            f"Servicio upstream '{family}' no disponible temporalmente; "
+            f"reintentar en {retry_after:.0f}s"
+        )
+
+
+class CircuitBreaker:
+    """Breaker de una familia de rutas con ventana deslizante de resultados."""
+
+    def __init__(
+        self,
+        family: str,
+        window: int = UPSTREAM_BREAKER_WINDOW,
+        min_calls: int = UPSTREAM_BREAKER_MIN_CALLS,
+        failure_ratio: float = UPSTREAM_BREAKER_FAILURE_RATIO,
+        open_seconds: float = UPSTREAM_BREAKER_OPEN_SECONDS,
+        half_open_probes: int = UPSTREAM_BREAKER_HALF_OPEN_PROBES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.family = family
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._results: Deque[bool] = deque(maxlen=window)
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_seconds - self._clock())
+
+    def before_call(self) -> None:
+        """Decide si la llamada puede salir; lanza ``CircuitOpenError`` si no."""
+        if self.state == BreakerState.OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.family, self.retry_after())
+            self.state = BreakerState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info(f"Circuit breaker '{self.family}' en half-open")
+
+        if self.state == BreakerState.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(self.family, self.open_seconds)
+            self._probes_in_flight += 1
+
+    def record(self, success: bool) -> None:
+        """Registra el resultado de una llamada autorizada por ``before_call``."""
+        if self.state == BreakerState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not success:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._close()
+            return
+
+        if self.state == BreakerState.OPEN:
+            # Llamadas iniciadas antes de abrir; no cambian el estado
+            return
+
+        self._results.append(success)
+        if len(self._results) < self.min_calls:
+            return
+        failures = self._results.count(False)
+        if failures / len(self._results) >= self.failure_ratio:
+            self._open()
+
+    def release(self) -> None:
+        """Libera una llamada autorizada que terminó sin resultado (cancelada)."""
+        if self.state == BreakerState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_at = self._clock()
+        self._results.clear()
+        logger.warning(
+            f"Circuit breaker '{self.family}' abierto durante {self.open_seconds}s"
+        )
+
+    def _close(self) -> None:
+        self.state = BreakerState.CLOSED
+        self.opened_at = None
+        self._results.clear()
+        logger.info(f"Circuit breaker '{self.family}' cerrado")
+
+    def snapshot(self) -> dict:
+        failures = self._results.count(False)
+        return {
+            "family": self.family,
+            "state": self.state.value,
+            "calls_in_window": len(self._results),
+            "failures_in_window": failures,
+            "retry_after": round(self.retry_after(), 1),
+            "rejected": self.rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def route_family(url: httpx.URL) -> str:
+    """Familia de rutas: primer segmento tras ``/api/v1/`` (``users``, ``actions``...)."""
+    parts = [part for part in url.path.split("/") if part]
+    if len(parts) >= 3 and parts[0] == "api":
+        return parts[2]
+    return parts[0] if parts else "root"
+
+
+def get_breaker(family: str) -> CircuitBreaker:
+    breaker = _breakers.get(family)
+    if breaker is None:
+        breaker = _breakers[family] = CircuitBreaker(family)
+    return breaker
+
+
+def get_breakers_status() -> Dict[str, dict]:
+    """Estado de todos los breakers conocidos, para diagnóstico."""
+    return {family: breaker.snapshot() for family, breaker in _breakers.items()}
+
+
+def reset_breakers() -> None:
+    _breakers.clear()
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """Transporte que aplica el breaker de la familia de rutas de cada petición."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        slow_seconds: float = UPSTREAM_BREAKER_SLOW_SECONDS,
+    ):
+        self._transport = transport
+        self._slow_seconds = slow_seconds
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = get_breaker(route_family(request.url))
+        breaker.before_call()
+        start = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            breaker.record(False)
+            raise
+        except BaseException:
+            # Cancelaciones u otros errores locales: no cuentan como resultado
+            breaker.release()
+            raise
+        slow = time.monotonic() - start > self._slow_seconds
+        breaker.record(response.status_code < 500 and not slow)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
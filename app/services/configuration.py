@@ -9,6 +9,8 @@ from app.models.configuration import (
     ConfigurationDB,
     ConfigurationUpdate,
 )
+from app.services import upstream
+from app.services.circuit_breaker import CircuitOpenError
 from app.utils.logger import get_logger
 
 # Configurar el logger para este módulo
@@ -26,7 +28,7 @@ async def create_configuration(
     If store_id is provided, the configuration will be associated with that store
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.post(
                 CONFIGURATION_API_URL, json=config_in.model_dump(mode="json")
             )
@@ -35,6 +37,8 @@ async def create_configuration(
     except httpx.HTTPStatusError as e:
         logger.error(f"Error al crear configuración: {e.response.text}", exc_info=True)
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al crear configuración: {str(e)}", exc_info=True
@@ -55,7 +59,7 @@ async def get_configurations(key: Optional[str] = None, store_id: Optional[UUID]
         params["store_id"] = str(store_id)
 
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.get(CONFIGURATION_API_URL, params=params)
             response.raise_for_status()
             return [ConfigurationDB(**item) for item in response.json()]
@@ -64,6 +68,8 @@ async def get_configurations(key: Optional[str] = None, store_id: Optional[UUID]
             f"Error al obtener configuraciones: {e.response.text}", exc_info=True
         )
         return []
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al obtener configuraciones: {str(e)}", exc_info=True
@@ -76,7 +82,7 @@ async def get_configuration(configuration_id: UUID) -> Optional[ConfigurationDB]
     Get a specific configuration by ID
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.get(f"{CONFIGURATION_API_URL}/{configuration_id}")
             response.raise_for_status()
             return ConfigurationDB(**response.json())
@@ -86,6 +92,8 @@ async def get_configuration(configuration_id: UUID) -> Optional[ConfigurationDB]
             exc_info=True,
         )
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al obtener configuración {configuration_id}: {str(e)}",
@@ -101,7 +109,7 @@ async def update_configuration(
     Update a configuration by ID
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.patch(
                 f"{CONFIGURATION_API_URL}/{configuration_id}",
                 json=config_update.model_dump(exclude_unset=True, mode="json"),
@@ -119,6 +127,8 @@ async def update_configuration(
             exc_info=True,
         )
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al actualizar configuración {configuration_id}: {str(e)}",
@@ -132,7 +142,7 @@ async def delete_configuration(configuration_id: UUID) -> bool:
     Delete a configuration by ID
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.delete(
                 f"{CONFIGURATION_API_URL}/{configuration_id}"
             )
@@ -143,6 +153,8 @@ async def delete_configuration(configuration_id: UUID) -> bool:
             exc_info=True,
         )
         return False
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al eliminar configuración {configuration_id}: {str(e)}",
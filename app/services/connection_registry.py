@@ -0,0 +1,150 @@
+"""
+Registro indexado de las conexiones Socket.IO de este proceso.
+
+Guarda cada conexión una sola vez (registro con ``__slots__``) y la indexa
+por SID, por dispositivo y por tienda, de modo que conectar, desconectar y
+consultar son O(1) aunque haya cientos de miles de sockets.
+
+No ahorra memoria respecto al diccionario anterior (device_id → SIDs): a
+100k conexiones ocupa lo mismo (``benchmarks/bench_connection_registry.py``).
+Para que los índices nuevos no la aumenten, comparten el mismo objeto
+``str`` de cada ID, y los de tienda y los estados de plan (repetidos en
+miles de conexiones) se internan.
+"""
+
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class Connection:
+    """Una conexión Socket.IO identificada con ``joinRoom``."""
+
+    __slots__ = ("sid", "device_id", "store_id", "plan_state", "connected_at")
+
+    def __init__(
+        self,
+        sid: str,
+        device_id: str,
+        store_id: Optional[str],
+        plan_state: Optional[str],
+        connected_at: float,
+    ):
+        self.sid = sid
+        self.device_id = device_id
+        self.store_id = store_id
+        self.plan_state = plan_state
+        self.connected_at = connected_at
+
+
+class ConnectionRegistry:
+    """Conexiones indexadas por SID, dispositivo y tienda."""
+
+    __slots__ = ("_by_sid", "_by_device", "_by_store")
+
+    def __init__(self):
+        self._by_sid: Dict[str, Connection] = {}
+        # device_id -> conexiones por orden de llegada (casi siempre una)
+        self._by_device: Dict[str, Tuple[Connection, ...]] = {}
+        # store_id -> dispositivos conectados de la tienda
+        self._by_store: Dict[str, Set[str]] = {}
+
+    def add(
+        self,
+        sid: str,
+        device_id: str,
+        store_id: Optional[str] = None,
+        plan_state: Optional[str] = None,
+    ) -> bool:
+        """
+        Registra la conexión (o la actualiza si el SID ya estaba) y devuelve
+        True si es la primera conexión del dispositivo.
+        """
+        store_id = sys.intern(store_id) if store_id else None
+        plan_state = sys.intern(plan_state) if plan_state else None
+        previous = self._by_sid.get(sid)
+        if previous is not None:
+            if (previous.device_id, previous.store_id, previous.plan_state) == (
+                device_id,
+                store_id,
+                plan_state,
+            ):
+                return False
+            self.remove(sid)
+
+        connections = self._by_device.get(device_id)
+        if connections is not None:
+            # Mismo objeto str que las conexiones que ya tiene el dispositivo
+            device_id = connections[0].device_id
+        connection = Connection(sid, device_id, store_id, plan_state, time.time())
+        self._by_sid[sid] = connection
+        self._by_device[device_id] = (connections or ()) + (connection,)
+        if store_id is not None:
+            self._by_store.setdefault(store_id, set()).add(device_id)
+        return connections is None
+
+    def remove(self, sid: str) -> Optional[Connection]:
+        """Quita la conexión del SID y la devuelve (None si no estaba)."""
+        connection = self._by_sid.pop(sid, None)
+        if connection is None:
+            return None
+        device_id = connection.device_id
+        connections = tuple(
+            other for other in self._by_device[device_id] if other is not connection
+        )
+        if connections:
+            self._by_device[device_id] = connections
+        else:
+            del self._by_device[device_id]
+        if connection.store_id is not None and not any(
+            other.store_id == connection.store_id for other in connections
+        ):
+            devices = self._by_store[connection.store_id]
+            devices.discard(device_id)
+            if not devices:
+                del self._by_store[connection.store_id]
+        return connection
+
+    def get(self, sid: str) -> Optional[Connection]:
+        return self._by_sid.get(sid)
+
+    def device_of(self, sid: str) -> Optional[str]:
+        connection = self._by_sid.get(sid)
+        return connection.device_id if connection is not None else None
+
+    def sids(self, device_id: str) -> List[str]:
+        """SIDs del dispositivo por orden de conexión."""
+        return [connection.sid for connection in self._by_device.get(device_id, ())]
+
+    def store_devices(
+        self, store_id: str, plan_state: Optional[str] = None
+    ) -> Set[str]:
+        """Dispositivos conectados de la tienda (con ese estado de plan, si se indica)."""
+        devices = self._by_store.get(store_id, ())
+        if plan_state is None:
+            return set(devices)
+        return {
+            device_id
+            for device_id in devices
+            if any(
+                connection.store_id == store_id and connection.plan_state == plan_state
+                for connection in self._by_device[device_id]
+            )
+        }
+
+    def stores(self) -> Dict[str, int]:
+        """Dispositivos conectados por tienda."""
+        return {store_id: len(devices) for store_id, devices in self._by_store.items()}
+
+    def devices(self) -> Iterator[str]:
+        return iter(self._by_device)
+
+    def connection_count(self) -> int:
+        return len(self._by_sid)
+
+    def __contains__(self, device_id: object) -> bool:
+        return device_id in self._by_device
+
+    def __len__(self) -> int:
+        """Número de dispositivos distintos conectados."""
+        return len(self._by_device)
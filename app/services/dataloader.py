@@ -0,0 +1,197 @@
+"""
+Carga por lotes de entidades por ID con alcance de petición (DataLoader).
+
+Las búsquedas por ID (``get_user``, ``get_device``, ``get_plan_by_id``,
+``get_store``...) emitidas en la misma vuelta del event loop se agrupan y se
+resuelven con una sola llamada upstream ``?ids=a,b,c``. Si la DB-API no
+ofrece esa ruta para una colección, se detecta en la primera llamada y se
+resuelven en paralelo una a una (fan-out).
+
+Cada petición HTTP tiene sus propios loaders (ver
+``app.middleware.dataloader``), que además memorizan los resultados durante
+la petición: pedir dos veces la misma entidad no repite la llamada. Las
+escrituras deben invalidar su entrada con ``forget``. Fuera de una petición
+(scripts, eventos Socket.IO) cada carga se resuelve por separado.
+"""
+
+import asyncio
+import os
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services import upstream
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DATALOADER_ENABLED = os.getenv("DATALOADER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Intentar la ruta ``?ids=`` de la DB-API antes de hacer fan-out
+DATALOADER_BULK_IDS = os.getenv("DATALOADER_BULK_IDS", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# IDs máximos por llamada agrupada
+DATALOADER_MAX_BATCH = int(os.getenv("DATALOADER_MAX_BATCH", "100"))
+
+BatchLoadFn = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+# Loaders de la petición en curso, por función de carga
+_request_loaders: ContextVar[Optional[Dict[BatchLoadFn, "DataLoader"]]] = ContextVar(
+    "request_loaders", default=None
+)
+# Colecciones cuya ruta no acepta ``?ids=`` (detectado en tiempo de ejecución)
+_bulk_unsupported: Set[str] = set()
+
+
+class DataLoader:
+    """Agrupa las cargas por ID de una vuelta del event loop en un lote."""
+
+    def __init__(
+        self, batch_load: BatchLoadFn, max_batch_size: int = DATALOADER_MAX_BATCH
+    ):
+        self._batch_load = batch_load
+        self._max_batch_size = max_batch_size
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._queue: List[Tuple[str, asyncio.Future]] = []
+        self.batches = 0
+
+    async def load(self, key: Any) -> Any:
+        key = str(key)
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[key] = loop.create_future()
+            self._queue.append((key, future))
+            if len(self._queue) == 1:
+                # Se despacha cuando el resto de tareas listas haya encolado sus IDs
+                loop.call_soon(self._dispatch)
+        # shield: cancelar a un llamador no cancela la carga compartida
+        return await asyncio.shield(future)
+
+    def clear(self, key: Any) -> None:
+        self._cache.pop(str(key), None)
+
+    def _dispatch(self) -> None:
+        queue, self._queue = self._queue, []
+        size = self._max_batch_size
+        for start in range(0, len(queue), size):
+            end = start + size
+            asyncio.ensure_future(self._run(queue[start:end]))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        keys = [key for key, _ in batch]
+        try:
+            results = await self._batch_load(keys)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = dict.fromkeys(keys, e)
+
+        for key, future in batch:
+            if future.done():
+                continue
+            value = results.get(key)
+            if isinstance(value, BaseException):
+                # Los errores no se memorizan: la próxima carga reintenta
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+
+def get_loader(batch_load: BatchLoadFn) -> DataLoader:
+    """Loader de la petición en curso para ``batch_load`` (uno nuevo si no hay petición)."""
+    loaders = _request_loaders.get()
+    if loaders is None or not DATALOADER_ENABLED:
+        return DataLoader(batch_load)
+    loader = loaders.get(batch_load)
+    if loader is None:
+        loader = loaders[batch_load] = DataLoader(batch_load)
+    return loader
+
+
+def forget(batch_load: BatchLoadFn, key: Any) -> None:
+    """Invalida una entidad memorizada en la petición en curso (tras escribirla)."""
+    loaders = _request_loaders.get()
+    if loaders is not None and batch_load in loaders:
+        loaders[batch_load].clear(key)
+
+
+def start_request_scope():
+    """Abre un ámbito de loaders para una petición; devuelve el token para cerrarlo."""
+    return _request_loaders.set({})
+
+
+def end_request_scope(token) -> None:
+    _request_loaders.reset(token)
+
+
+async def fetch_by_ids(
+    collection_url: str,
+    ids: List[str],
+    fetch_one: Callable[[str], Awaitable[Optional[dict]]],
+    id_field: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> Dict[str, Any]:
+    """
+    Resuelve un lote de IDs con ``GET collection_url?ids=...``.
+
+    Los IDs que la ruta agrupada no devuelve (o todos, si la ruta no existe)
+    se piden en paralelo con ``fetch_one``. Los errores de cada ID se
+    devuelven como valor para que solo fallen sus llamadores.
+    """
+    results: Dict[str, Any] = {}
+    if len(ids) > 1 and DATALOADER_BULK_IDS and collection_url not in _bulk_unsupported:
+        results = await _fetch_bulk(collection_url, ids, id_field, params, headers)
+
+    missing = [entity_id for entity_id in ids if entity_id not in results]
+    if missing:
+        fetched = await asyncio.gather(
+            *(fetch_one(entity_id) for entity_id in missing), return_exceptions=True
+        )
+        results.update(zip(missing, fetched))
+    return results
+
+
+async def _fetch_bulk(
+    collection_url: str,
+    ids: List[str],
+    id_field: str,
+    params: Optional[dict],
+    headers: Optional[dict],
+) -> Dict[str, dict]:
+    async with upstream.client_session() as client:
+        response = await client.get(
+            collection_url,
+            params={**(params or {}), "ids": ",".join(ids)},
+            headers=headers,
+        )
+
+    if response.status_code >= 500:
+        # Error transitorio: fan-out sin descartar la ruta agrupada
+        return {}
+    try:
+        items = response.json() if response.status_code == 200 else None
+    except ValueError:
+        items = None
+    if isinstance(items, list):
+        found = {
+            str(item.get(id_field)): item for item in items if isinstance(item, dict)
+        }
+        # Si devuelve entidades no pedidas, la ruta ignora el filtro ``ids``
+        if found.keys() <= set(ids):
+            return found
+
+    logger.info(f"{collection_url} no admite ?ids=, se usará fan-out por ID")
+    _bulk_unsupported.add(collection_url)
+    return {}
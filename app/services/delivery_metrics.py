@@ -0,0 +1,119 @@
+"""
+Métricas de entrega de comandos a dispositivos (emit → ack).
+
+Por cada tipo de comando se lleva un histograma de latencia con buckets
+fijos (acumulados, al estilo Prometheus) y contadores de confirmaciones,
+timeouts, reintentos y entregas fallidas. Se consultan en
+``GET /api/v1/diagnostics/delivery``.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Sequence
+
+# Límites superiores de los buckets en milisegundos
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Histograma de latencias con buckets fijos."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """Estimación del cuantil ``q`` (límite superior de su bucket)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+
+class _CommandStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.acked = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.failed = 0
+
+
+_lock = threading.Lock()
+_stats: Dict[str, _CommandStats] = {}
+
+
+def _get(command: str) -> _CommandStats:
+    stats = _stats.get(command)
+    if stats is None:
+        stats = _stats.setdefault(command, _CommandStats())
+    return stats
+
+
+def record_ack(command: str, latency_ms: float) -> None:
+    with _lock:
+        stats = _get(command)
+        stats.acked += 1
+        stats.latency.observe(latency_ms)
+
+
+def record_timeout(command: str, retrying: bool) -> None:
+    with _lock:
+        stats = _get(command)
+        stats.timeouts += 1
+        if retrying:
+            stats.retries += 1
+
+
+def record_failure(command: str) -> None:
+    """Comando sin confirmar tras agotar los reintentos."""
+    with _lock:
+        _get(command).failed += 1
+
+
+def get_stats() -> Dict[str, dict]:
+    with _lock:
+        return {
+            command: {
+                "acked": stats.acked,
+                "timeouts": stats.timeouts,
+                "retries": stats.retries,
+                "failed": stats.failed,
+                "latency": stats.latency.snapshot(),
+            }
+            for command, stats in sorted(_stats.items())
+        }
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
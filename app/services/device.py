@@ -1,16 +1,15 @@
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-import httpx
-
 from app.models.device import Device, DeviceCreate, DeviceUpdate
+from app.services import dataloader, upstream
 
 USER_SVC_URL = os.getenv("USER_SVC_URL", "http://localhost:8002")
 
 
 async def create_device(device_in: DeviceCreate) -> Optional[Device]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             f"{USER_SVC_URL}/api/v1/devices/", json=device_in.model_dump(mode="json")
         )
@@ -28,39 +27,55 @@ async def get_devices(
     if user_id:
         params["user_id"] = str(user_id)
 
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/devices/", params=params)
         response.raise_for_status()
         return [Device(**item) for item in response.json()]
 
 
-async def get_device(device_id: UUID) -> Optional[Device]:
-    async with httpx.AsyncClient() as client:
+async def _fetch_device(device_id: str) -> Optional[dict]:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/devices/{device_id}")
-        if response.status_code == 200:
-            return Device(**response.json())
-        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def _load_devices(device_ids: List[str]) -> Dict[str, Any]:
+    return await dataloader.fetch_by_ids(
+        f"{USER_SVC_URL}/api/v1/devices/",
+        device_ids,
+        _fetch_device,
+        id_field="device_id",
+    )
+
+
+async def get_device(device_id: UUID) -> Optional[Device]:
+    data = await dataloader.get_loader(_load_devices).load(device_id)
+    if data:
+        return Device(**data)
+    return None
 
 
 async def update_device(device_id: UUID, device_in: DeviceUpdate) -> Optional[Device]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.patch(
             f"{USER_SVC_URL}/api/v1/devices/{device_id}",
             json=device_in.model_dump(mode="json", exclude_unset=True),
         )
+        dataloader.forget(_load_devices, device_id)
         if response.status_code == 200:
             return Device(**response.json())
         return None
 
 
 async def delete_device(device_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{USER_SVC_URL}/api/v1/devices/{device_id}")
+        dataloader.forget(_load_devices, device_id)
         return response.status_code == 204
 
 
 async def get_device_count() -> int:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/devices/count")
         response.raise_for_status()
         return response.json().get("count", 0)
@@ -0,0 +1,240 @@
+"""
+Presencia de dispositivos: conectado/desconectado y última actividad.
+
+Registra por dispositivo cuándo se conectó, cuándo se desconectó, su última
+señal (``joinRoom`` o evento ``heartbeat``) y su tienda. Se consulta en
+``GET /api/v1/presence``.
+
+Las sesiones que envían ``heartbeat`` y dejan de hacerlo durante
+``PRESENCE_HEARTBEAT_TIMEOUT`` segundos se dan por muertas y se
+desconectan. Los vencimientos se llevan en una sola rueda de temporización
+(``app.utils.timing_wheel``), no con un temporizador por socket. Las
+sesiones que nunca han enviado ``heartbeat`` (firmware anterior) solo
+dependen del ping/pong de Engine.IO.
+
+Los registros son de este proceso: con varios workers o nodos, cada uno
+conoce los dispositivos que se han conectado a él. El campo ``online`` de
+``/presence`` se corrige con el registro de presencia compartido
+(``ConnectionManager.online_devices``), pero el listado, los filtros y las
+horas siguen siendo de este worker. La tienda se guarda en el propio
+registro, sin índice aparte: el índice por tienda de las conexiones vivas es
+el de ``ConnectionRegistry``.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+from app.utils.timing_wheel import TimingWheel
+
+logger = get_logger(__name__)
+
+# Segundos sin heartbeat tras los que se cierra la sesión (0 = nunca)
+PRESENCE_HEARTBEAT_TIMEOUT = float(os.getenv("PRESENCE_HEARTBEAT_TIMEOUT", "90"))
+# Resolución de la rueda de vencimientos en segundos
+PRESENCE_WHEEL_TICK = float(os.getenv("PRESENCE_WHEEL_TICK", "1"))
+# Segundos que se conserva el registro de un dispositivo desconectado
+PRESENCE_RETENTION = float(os.getenv("PRESENCE_RETENTION", "604800"))
+
+# Segundos entre purgas de registros de dispositivos desconectados
+_PURGE_INTERVAL = 60.0
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return (
+        datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z")
+    )
+
+
+class DevicePresence:
+    """Estado de presencia de un dispositivo."""
+
+    __slots__ = (
+        "device_id",
+        "store_id",
+        "sessions",
+        "connected_at",
+        "last_seen",
+        "disconnected_at",
+    )
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.store_id: Optional[str] = None
+        self.sessions = 0
+        self.connected_at: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.disconnected_at: Optional[float] = None
+
+    @property
+    def online(self) -> bool:
+        return self.sessions > 0
+
+    def to_dict(self, online: Optional[bool] = None) -> dict:
+        """``online`` sustituye al de este proceso (p. ej. el de todo el clúster)."""
+        return {
+            "device_id": self.device_id,
+            "store_id": self.store_id,
+            "online": self.online if online is None else online,
+            "sessions": self.sessions,
+            "connected_at": _isoformat(self.connected_at),
+            "last_seen": _isoformat(self.last_seen),
+            "disconnected_at": _isoformat(self.disconnected_at),
+        }
+
+
+class PresenceTracker:
+    """Registros de presencia con vencimiento de sesiones por heartbeat."""
+
+    def __init__(
+        self,
+        heartbeat_timeout: float = PRESENCE_HEARTBEAT_TIMEOUT,
+        tick: float = PRESENCE_WHEEL_TICK,
+        retention: float = PRESENCE_RETENTION,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.retention = retention
+        self._clock = clock
+        self._records: Dict[str, DevicePresence] = {}
+        # SIDs con heartbeat -> device_id
+        self._heartbeat_sids: Dict[str, str] = {}
+        self._wheel: TimingWheel[str] = TimingWheel(tick)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._last_purge = 0.0
+        # Cierra la sesión de un SID vencido (lo fija socket_service)
+        self.on_expire: Optional[Callable[[str], Awaitable[None]]] = None
+        self.expired = 0
+
+    def _record(self, device_id: str) -> DevicePresence:
+        record = self._records.get(device_id)
+        if record is None:
+            record = self._records[device_id] = DevicePresence(device_id)
+        return record
+
+    def connected(
+        self, sid: str, device_id: str, store_id: Optional[str] = None
+    ) -> None:
+        now = self._clock()
+        record = self._record(device_id)
+        if store_id:
+            record.store_id = store_id
+        if not record.online:
+            record.connected_at = now
+        record.sessions += 1
+        record.last_seen = now
+
+    def heartbeat(self, sid: str, device_id: str) -> None:
+        """Señal de vida del dispositivo; la sesión vencerá si deja de llegar."""
+        self._record(device_id).last_seen = self._clock()
+        if self.heartbeat_timeout > 0:
+            self._heartbeat_sids[sid] = device_id
+            self._wheel.schedule(sid, self.heartbeat_timeout)
+
+    def disconnected(self, sid: str, device_id: str) -> None:
+        self._heartbeat_sids.pop(sid, None)
+        self._wheel.cancel(sid)
+        record = self._records.get(device_id)
+        if record is None or not record.online:
+            return
+        now = self._clock()
+        record.sessions -= 1
+        record.last_seen = now
+        if not record.online:
+            record.disconnected_at = now
+
+    def get(self, device_id: str) -> Optional[DevicePresence]:
+        return self._records.get(device_id)
+
+    def query(
+        self,
+        store_id: Optional[str] = None,
+        online: Optional[bool] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> Tuple[int, List[DevicePresence]]:
+        """Registros de este proceso filtrados, ordenados por device_id: (total, página)."""
+        matching = sorted(
+            (
+                record
+                for record in self._records.values()
+                if (store_id is None or record.store_id == store_id)
+                and (online is None or record.online == online)
+            ),
+            key=lambda record: record.device_id,
+        )
+        end = skip + limit
+        return len(matching), matching[skip:end]
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic() + self._wheel.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            # Recupera los ticks perdidos si el bucle se retrasó
+            while next_tick <= time.monotonic():
+                next_tick += self._wheel.tick
+                try:
+                    await self.expire(self._wheel.advance())
+                except Exception as e:
+                    logger.error(f"Error al vencer sesiones sin heartbeat: {e}")
+            if self._clock() - self._last_purge >= _PURGE_INTERVAL:
+                self.purge()
+
+    async def expire(self, sids: List[str]) -> None:
+        """Cierra las sesiones vencidas en la rueda."""
+        for sid in sids:
+            device_id = self._heartbeat_sids.pop(sid, None)
+            if device_id is None:
+                continue
+            self.expired += 1
+            logger.warning(
+                f"Sesión {sid} del dispositivo {device_id} sin heartbeat, se cierra"
+            )
+            if self.on_expire is not None:
+                await self.on_expire(sid)
+
+    def purge(self) -> int:
+        """Olvida los dispositivos desconectados hace más de ``retention``."""
+        now = self._clock()
+        self._last_purge = now
+        stale = [
+            record
+            for record in self._records.values()
+            if not record.online
+            and now - (record.disconnected_at or now) > self.retention
+        ]
+        for record in stale:
+            del self._records[record.device_id]
+        return len(stale)
+
+    def snapshot(self) -> dict:
+        online = sum(1 for record in self._records.values() if record.online)
+        return {
+            "devices": len(self._records),
+            "online": online,
+            "heartbeat_sessions": len(self._wheel),
+            "expired_sessions": self.expired,
+        }
+
+
+tracker = PresenceTracker()
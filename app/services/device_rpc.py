@@ -0,0 +1,280 @@
+"""
+Consultas síncronas a un dispositivo (RPC sobre Socket.IO).
+
+``POST /device-actions/{id}/locate?wait=true`` envía el comando ``locate``
+con un ``correlation_id`` y ``reply: true`` y espera la respuesta del
+dispositivo en el ack, hasta ``DEVICE_RPC_TIMEOUT`` segundos::
+
+    {"correlation_id": "...", "location": {"latitude": 4.71, "longitude": -74.07,
+     "accuracy": 12.5}, "battery": 87, "locked": false}
+
+El envío pasa por la cola de salida del dispositivo como cualquier comando
+y, al ir por ``sio.call``, el ack vuelve también a través del client
+manager cuando el dispositivo está conectado a otro nodo. Una ubicación
+recibida se guarda en la DB-API en segundo plano.
+
+Solo se espera respuesta de las conexiones que confirman comandos (las que
+anuncian ``acks``, o todas con ``COMMAND_ACK_ENABLED``), como en
+``deliver_command``. A una app que no confirma se le envía el ``locate`` una
+vez, se da por entregado y se responde al momento con lo último conocido.
+
+Si el dispositivo está desconectado o no responde a tiempo se devuelve lo
+último conocido: la última respuesta recibida en este proceso o, si no hay,
+la última ubicación guardada en la DB-API. En ese caso el ``locate`` queda
+en la cola offline como uno normal. Una app antigua que confirma con
+``true`` sin datos cuenta como aplicada y también recibe lo último conocido.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID, uuid4
+
+import socketio
+from fastapi.responses import JSONResponse
+
+from app.models.action import ActionCreate, ActionState, ActionType
+from app.models.location import LocationCreate
+from app.services import action_log, delivery_metrics
+from app.services import location as location_service
+from app.services import outbound, replay, socket_service
+from app.services.socket_service import manager, sio
+
+# Segundos máximos que la petición HTTP espera la respuesta del dispositivo
+DEVICE_RPC_TIMEOUT = float(os.getenv("DEVICE_RPC_TIMEOUT", "8"))
+
+SOURCE_DEVICE = "device"
+SOURCE_LAST_KNOWN = "last_known"
+
+# device_id -> último informe recibido de ese dispositivo en este proceso
+_last_reports: Dict[str, dict] = {}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def parse_report(reply) -> Optional[dict]:
+    """Normaliza la respuesta del dispositivo; None si no trae datos."""
+    if not isinstance(reply, dict):
+        return None
+    location = reply.get("location") or {}
+    try:
+        latitude = float(location["latitude"])
+        longitude = float(location["longitude"])
+    except (KeyError, TypeError, ValueError):
+        location = None
+    else:
+        location = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "accuracy": location.get("accuracy"),
+        }
+    battery = reply.get("battery")
+    locked = reply.get("locked")
+    if location is None and battery is None and locked is None:
+        return None
+    return {
+        "location": location,
+        "battery": battery,
+        "locked": locked,
+        "reported_at": _now(),
+    }
+
+
+async def call_device(
+    device_id: str,
+    command: str,
+    payload: Optional[dict] = None,
+    timeout: float = DEVICE_RPC_TIMEOUT,
+) -> Optional[dict]:
+    """
+    Envía ``command`` esperando la respuesta del dispositivo.
+
+    Devuelve el ack (``{}`` si el dispositivo confirmó sin datos o no
+    confirma comandos y el envío salió), o None si no está conectado, la
+    cola de salida lo descartó o no respondió en ``timeout`` segundos,
+    contando el tiempo en la cola de salida.
+    """
+    action_msg = socket_service.action_message(device_id, command, payload, _now())
+    if not socket_service.COMMAND_ACK_ENABLED and not manager.confirming_sids(
+        device_id
+    ):
+        # No responde acks: esperar solo agotaría el timeout
+        key = outbound.coalesce_key(command, payload)
+        sent = await manager.send_to_device(device_id, "action", action_msg, key=key)
+        return None if sent is None else {}
+
+    correlation_id = uuid4().hex
+    action_msg.update(correlation_id=correlation_id, reply=True)
+    action_msg = replay.log.stamp(device_id, "action", action_msg, buffered=False)
+    deadline = time.monotonic() + timeout
+
+    async def call() -> Optional[dict]:
+        remaining = deadline - time.monotonic()
+        if socket_service.COMMAND_ACK_ENABLED:
+            sids = await manager.device_sids(device_id)
+        else:
+            sids = manager.confirming_sids(device_id)
+        if remaining <= 0 or not sids:
+            return None
+        start = time.perf_counter()
+        try:
+            reply = await sio.call("action", action_msg, to=sids[0], timeout=remaining)
+        except socketio.exceptions.TimeoutError:
+            delivery_metrics.record_timeout(command, retrying=False)
+            delivery_metrics.record_failure(command)
+            print(
+                f"Sin respuesta a '{command}' ({correlation_id}) del dispositivo {device_id}"
+            )
+            return None
+        except socketio.exceptions.SocketIOError as e:
+            print(f"No se pudo entregar '{command}' al dispositivo {device_id}: {e}")
+            return None
+        delivery_metrics.record_ack(command, (time.perf_counter() - start) * 1000)
+        if not isinstance(reply, dict):
+            return {}
+        if reply.get("correlation_id", correlation_id) != correlation_id:
+            print(
+                f"Se descarta una respuesta a otra petición del dispositivo {device_id}"
+            )
+            return {}
+        return reply
+
+    try:
+        return await asyncio.wait_for(
+            outbound.scheduler.send(
+                device_id, call, lane=outbound.lane_for("action", command)
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        return None
+
+
+async def _save_location(device_id: UUID, location: dict) -> None:
+    try:
+        await location_service.create_location(
+            LocationCreate(
+                device_id=device_id,
+                latitude=location["latitude"],
+                longitude=location["longitude"],
+            )
+        )
+    except Exception as e:
+        print(
+            f"ERROR: No se pudo guardar la ubicación del dispositivo '{device_id}'. Motivo: {e}"
+        )
+
+
+async def _record_applied(device_id: UUID, command: str, applied_by_id: UUID) -> None:
+    description = f"Action '{command}' applied to online device {device_id}."
+    if action_log.ACTION_LOG_WRITE_BEHIND:
+        action_log.writer.record(
+            ActionCreate(
+                device_id=device_id,
+                applied_by_id=applied_by_id,
+                action=ActionType(command),
+                state=ActionState.APPLIED,
+                description=description,
+            )
+        )
+        return
+    action_id = await socket_service.create_action_record(
+        device_id, command, applied_by_id
+    )
+    await socket_service.mark_actions([(action_id, ActionState.APPLIED, description)])
+
+
+async def _queue_for_later(
+    device_id: UUID, command: str, applied_by_id: UUID, payload: Optional[dict]
+) -> None:
+    """Sin respuesta: el comando queda pendiente en la cola offline."""
+    action_id = await socket_service.create_action_record(
+        device_id, command, applied_by_id
+    )
+    _, _, update = await socket_service.requeue_unacked(
+        str(device_id), command, payload, action_id, _now()
+    )
+    await socket_service.mark_actions([update])
+
+
+async def last_known(device_id: UUID) -> Optional[dict]:
+    """Último informe de este proceso o, si no hay, la última ubicación de la DB-API."""
+    report = _last_reports.get(str(device_id))
+    if report is not None:
+        return report
+    try:
+        stored = await location_service.get_location_by_device(device_id)
+    except Exception as e:
+        print(
+            f"ERROR: No se pudo leer la última ubicación del dispositivo '{device_id}'. Motivo: {e}"
+        )
+        return None
+    if stored is None:
+        return None
+    return {
+        "location": {
+            "latitude": stored.latitude,
+            "longitude": stored.longitude,
+            "accuracy": None,
+        },
+        "battery": None,
+        "locked": None,
+        "reported_at": stored.created_at.isoformat(),
+    }
+
+
+async def locate(
+    device_id: UUID,
+    applied_by_id: UUID,
+    payload: Optional[dict] = None,
+    timeout: float = DEVICE_RPC_TIMEOUT,
+) -> JSONResponse:
+    """
+    Pide al dispositivo su ubicación, batería y estado de bloqueo y responde
+    con lo que conteste; si no contesta, con lo último conocido (``404`` si
+    no se conoce nada).
+    """
+    command = "locate"
+    device_id_str = str(device_id)
+    start = time.perf_counter()
+    reply = await call_device(device_id_str, command, payload, timeout)
+
+    if reply is not None:
+        await _record_applied(device_id, command, applied_by_id)
+        report = parse_report(reply)
+        if report is not None:
+            _last_reports[device_id_str] = report
+            if report["location"] is not None:
+                asyncio.ensure_future(_save_location(device_id, report["location"]))
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "device_id": device_id_str,
+                    "source": SOURCE_DEVICE,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                    **report,
+                },
+            )
+        report = await last_known(device_id)
+    else:
+        _, report = await asyncio.gather(
+            _queue_for_later(device_id, command, applied_by_id, payload),
+            last_known(device_id),
+        )
+
+    if report is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "device_id": device_id_str,
+                "detail": "Device did not reply and no previous location is known.",
+            },
+        )
+    return JSONResponse(
+        status_code=200,
+        content={"device_id": device_id_str, "source": SOURCE_LAST_KNOWN, **report},
+    )
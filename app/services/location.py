@@ -2,8 +2,6 @@ import os
 from typing import List, Optional
 from uuid import UUID
 
-import httpx
-
 from app.models.location import (
     CityCreate,
     CityDB,
@@ -17,137 +15,196 @@ from app.models.location import (
     RegionDB,
     RegionUpdate,
 )
+from app.services import singleflight, upstream
+from app.services.reference_cache import ReferenceCache, name_matches
 
 USER_SVC_URL = os.getenv("USER_SVC_URL", "http://localhost:8002")
 
 
+async def _load_countries() -> List[CountryDB]:
+    async with upstream.client_session() as client:
+        response = await client.get(f"{USER_SVC_URL}/api/v1/countries/")
+        response.raise_for_status()
+        return [CountryDB(**item) for item in response.json()]
+
+
+async def _load_regions() -> List[RegionDB]:
+    async with upstream.client_session() as client:
+        response = await client.get(f"{USER_SVC_URL}/api/v1/regions/")
+        response.raise_for_status()
+        return [RegionDB(**item) for item in response.json()]
+
+
+async def _load_cities() -> List[CityDB]:
+    async with upstream.client_session() as client:
+        response = await client.get(f"{USER_SVC_URL}/api/v1/cities/")
+        response.raise_for_status()
+        return [CityDB(**item) for item in response.json()]
+
+
+# Listas completas en memoria; los filtros se resuelven localmente
+countries_cache = ReferenceCache("countries", _load_countries, id_field="country_id")
+regions_cache = ReferenceCache("regions", _load_regions, id_field="region_id")
+cities_cache = ReferenceCache("cities", _load_cities, id_field="city_id")
+
+
+def _invalidate_countries() -> None:
+    # Regiones y ciudades incluyen el país anidado
+    countries_cache.invalidate()
+    regions_cache.invalidate()
+    cities_cache.invalidate()
+
+
+def _invalidate_regions() -> None:
+    regions_cache.invalidate()
+    cities_cache.invalidate()
+
+
+def city_region_id(city: CityDB) -> Optional[UUID]:
+    return city.region_id or (city.region.region_id if city.region else None)
+
+
 async def create_city(city_in: CityCreate) -> Optional[CityDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             f"{USER_SVC_URL}/api/v1/cities/", json=city_in.model_dump(mode="json")
         )
         if response.status_code == 201:
+            cities_cache.invalidate()
             return CityDB(**response.json())
         return None
 
 
 async def get_cities(name: Optional[str] = None, region_id: Optional[UUID] = None) -> List[CityDB]:
-    params = {}
-    if name:
-        params["name"] = name
-    if region_id:
-        params["region_id"] = str(region_id)
-        
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SVC_URL}/api/v1/cities/", params=params)
-        response.raise_for_status()
-        return [CityDB(**item) for item in response.json()]
-
-
-async def get_city(city_id: UUID) -> Optional[CityDB]:
-    async with httpx.AsyncClient() as client:
+    cities = await cities_cache.get_all()
+    return [
+        city
+        for city in cities
+        if name_matches(city.name, name)
+        and (region_id is None or city_region_id(city) == region_id)
+    ]
+
+
+@singleflight.coalesce
+async def _fetch_city(city_id: UUID) -> Optional[CityDB]:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/cities/{city_id}")
         if response.status_code == 200:
             return CityDB(**response.json())
         return None
 
 
+async def get_city(city_id: UUID) -> Optional[CityDB]:
+    # Una ciudad creada fuera del gateway aún no está en la caché
+    return await cities_cache.get(city_id) or await _fetch_city(city_id)
+
+
 async def update_city(city_id: UUID, city_in: CityUpdate) -> Optional[CityDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.patch(
             f"{USER_SVC_URL}/api/v1/cities/{city_id}",
             json=city_in.model_dump(mode="json", exclude_unset=True),
         )
         if response.status_code == 200:
+            cities_cache.invalidate()
             return CityDB(**response.json())
         return None
 
 
 async def delete_city(city_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{USER_SVC_URL}/api/v1/cities/{city_id}")
+        if response.status_code == 204:
+            cities_cache.invalidate()
         return response.status_code == 204
 
 
 # Country Service Functions
 async def create_country(country_in: CountryCreate) -> Optional[CountryDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             f"{USER_SVC_URL}/api/v1/countries/", json=country_in.model_dump(mode="json")
         )
         if response.status_code == 201:
+            _invalidate_countries()
             return CountryDB(**response.json())
         return None
 
 
 async def get_countries(name: Optional[str] = None) -> List[CountryDB]:
-    params = {}
-    if name:
-        params["name"] = name
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SVC_URL}/api/v1/countries/", params=params)
-        response.raise_for_status()
-        return [CountryDB(**item) for item in response.json()]
+    countries = await countries_cache.get_all()
+    return [country for country in countries if name_matches(country.name, name)]
 
 
-async def get_country(country_id: UUID) -> Optional[CountryDB]:
-    async with httpx.AsyncClient() as client:
+@singleflight.coalesce
+async def _fetch_country(country_id: UUID) -> Optional[CountryDB]:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/countries/{country_id}")
         if response.status_code == 200:
             return CountryDB(**response.json())
         return None
 
 
+async def get_country(country_id: UUID) -> Optional[CountryDB]:
+    return await countries_cache.get(country_id) or await _fetch_country(country_id)
+
+
 async def update_country(country_id: UUID, country_in: CountryUpdate) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.patch(
             f"{USER_SVC_URL}/api/v1/countries/{country_id}",
             json=country_in.model_dump(mode="json", exclude_unset=True),
         )
+        if response.status_code in (200, 204):
+            _invalidate_countries()
         return response.status_code in (200, 204)
 
 
 async def delete_country(country_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{USER_SVC_URL}/api/v1/countries/{country_id}")
+        if response.status_code == 204:
+            _invalidate_countries()
         return response.status_code == 204
 
 
 # Region Service Functions
 async def create_region(region_in: RegionCreate) -> Optional[RegionDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             f"{USER_SVC_URL}/api/v1/regions/", json=region_in.model_dump(mode="json")
         )
         if response.status_code == 201:
+            _invalidate_regions()
             return RegionDB(**response.json())
         return None
 
 
 async def get_regions(country_id: Optional[UUID] = None, name: Optional[str] = None) -> List[RegionDB]:
-    params = {}
-    if country_id:
-        params["country_id"] = str(country_id)
-    if name:
-        params["name"] = name
-        
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SVC_URL}/api/v1/regions/", params=params)
-        response.raise_for_status()
-        return [RegionDB(**item) for item in response.json()]
-
-
-async def get_region(region_id: UUID) -> Optional[RegionDB]:
-    async with httpx.AsyncClient() as client:
+    regions = await regions_cache.get_all()
+    return [
+        region
+        for region in regions
+        if name_matches(region.name, name)
+        and (country_id is None or region.country_id == country_id)
+    ]
+
+
+@singleflight.coalesce
+async def _fetch_region(region_id: UUID) -> Optional[RegionDB]:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/regions/{region_id}")
         if response.status_code == 200:
             return RegionDB(**response.json())
         return None
 
 
+async def get_region(region_id: UUID) -> Optional[RegionDB]:
+    return await regions_cache.get(region_id) or await _fetch_region(region_id)
+
+
 async def update_region(region_id: UUID, region_in: RegionUpdate) -> Optional[RegionDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         # Convert the model to a dictionary and explicitly include all fields
         update_data = region_in.model_dump(mode="json", exclude_unset=False)
 
@@ -158,6 +215,9 @@ async def update_region(region_id: UUID, region_in: RegionUpdate) -> Optional[Re
             f"{USER_SVC_URL}/api/v1/regions/{region_id}", json=update_data
         )
 
+        if response.status_code in (200, 204):
+            _invalidate_regions()
+
         # Handle different status codes
         if response.status_code == 200:
             return RegionDB(**response.json())
@@ -171,14 +231,16 @@ async def update_region(region_id: UUID, region_in: RegionUpdate) -> Optional[Re
 
 
 async def delete_region(region_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{USER_SVC_URL}/api/v1/regions/{region_id}")
+        if response.status_code == 204:
+            _invalidate_regions()
         return response.status_code == 204
 
 
 # Location Service Functions
 async def create_location(location_in: LocationCreate) -> Optional[LocationDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             f"{USER_SVC_URL}/api/v1/locations/",
             json=location_in.model_dump(mode="json"),
@@ -193,14 +255,14 @@ async def get_locations(device_id: Optional[UUID] = None) -> List[LocationDB]:
     if device_id:
         params["device_id"] = str(device_id)
 
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/locations/", params=params)
         response.raise_for_status()
         return [LocationDB(**item) for item in response.json()]
 
 
 async def get_location(location_id: UUID) -> Optional[LocationDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(f"{USER_SVC_URL}/api/v1/locations/{location_id}")
         if response.status_code == 200:
             return LocationDB(**response.json())
@@ -208,7 +270,7 @@ async def get_location(location_id: UUID) -> Optional[LocationDB]:
 
 
 async def get_location_by_device(device_id: UUID) -> Optional[LocationDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(
             f"{USER_SVC_URL}/api/v1/locations/device/{device_id}"
         )
@@ -218,6 +280,6 @@ async def get_location_by_device(device_id: UUID) -> Optional[LocationDB]:
 
 
 async def delete_location(location_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{USER_SVC_URL}/api/v1/locations/{location_id}")
         return response.status_code == 204
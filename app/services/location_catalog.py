@@ -0,0 +1,207 @@
+"""
+Catálogo jerárquico de ubicaciones (país → región → ciudad) en memoria.
+
+El árbol se construye a partir de la caché de datos de referencia (ver
+``app.services.reference_cache``) y se guarda ya serializado junto con su
+ETag, de modo que ``GET /locations/catalog`` responde sin tocar la DB-API ni
+volver a serializar. Con cada versión del árbol se construyen también los
+índices por prefijo del autocompletado (``/cities/search`` y
+``/countries/search``). Se carga al arrancar y una tarea en segundo plano lo
+mantiene al día; si alguna de las listas de origen cambia (refresco o
+invalidación por una escritura del gateway), se reconstruye en la siguiente
+lectura.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.services import location as location_service
+from app.services.prefix_index import PrefixIndex
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Segundos entre refrescos en segundo plano del catálogo
+LOCATION_CATALOG_REFRESH = float(os.getenv("LOCATION_CATALOG_REFRESH", "300"))
+
+
+@dataclass
+class CatalogSnapshot:
+    """Árbol de ubicaciones serializado, con subárboles precalculados."""
+
+    tree: List[dict]
+    body: bytes
+    etag: str
+    # ETags de las listas de origen con las que se construyó
+    sources: Tuple[Optional[str], ...]
+    _countries: Dict[str, dict] = field(default_factory=dict)
+    _regions: Dict[str, dict] = field(default_factory=dict)
+    _subtrees: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)
+    country_index: PrefixIndex = field(init=False)
+    city_index: PrefixIndex = field(init=False)
+
+    def __post_init__(self):
+        countries, cities = [], []
+        for country in self.tree:
+            self._countries[country["country_id"]] = country
+            countries.append(
+                (
+                    (country["name"], country["code"]),
+                    {
+                        key: country[key]
+                        for key in ("country_id", "name", "code", "prefix")
+                    },
+                )
+            )
+            for region in country["regions"]:
+                self._regions[region["region_id"]] = region
+                for city in region["cities"]:
+                    cities.append(
+                        (
+                            (city["name"],),
+                            {
+                                "city_id": city["city_id"],
+                                "name": city["name"],
+                                "region_id": region["region_id"],
+                                "region": region["name"],
+                                "country_id": country["country_id"],
+                                "country": country["name"],
+                            },
+                        )
+                    )
+        self.country_index = PrefixIndex(countries)
+        self.city_index = PrefixIndex(cities)
+
+    def subtree(
+        self, country_id: Optional[str] = None, region_id: Optional[str] = None
+    ):
+        """Cuerpo y ETag de un país o una región; None si no existe."""
+        key = f"region:{region_id}" if region_id else f"country:{country_id}"
+        cached = self._subtrees.get(key)
+        if cached is None:
+            if region_id:
+                node = self._regions.get(region_id)
+            else:
+                node = self._countries.get(country_id) if country_id else None
+            if node is None:
+                return None
+            cached = self._subtrees[key] = _serialize(node)
+        return cached
+
+
+def _serialize(value) -> Tuple[bytes, str]:
+    body = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+    return body, '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+def _sources() -> Tuple[Optional[str], ...]:
+    return (
+        location_service.countries_cache.etag,
+        location_service.regions_cache.etag,
+        location_service.cities_cache.etag,
+    )
+
+
+async def _build() -> CatalogSnapshot:
+    countries = await location_service.get_countries()
+    regions = await location_service.get_regions()
+    cities = await location_service.get_cities()
+
+    cities_by_region: Dict[str, List[dict]] = {}
+    for city in sorted(cities, key=lambda c: c.name):
+        region_id = location_service.city_region_id(city)
+        if region_id is not None:
+            cities_by_region.setdefault(str(region_id), []).append(
+                {"city_id": str(city.city_id), "name": city.name}
+            )
+
+    regions_by_country: Dict[str, List[dict]] = {}
+    for region in sorted(regions, key=lambda r: r.name):
+        regions_by_country.setdefault(str(region.country_id), []).append(
+            {
+                "region_id": str(region.region_id),
+                "name": region.name,
+                "cities": cities_by_region.get(str(region.region_id), []),
+            }
+        )
+
+    tree = [
+        {
+            "country_id": str(country.country_id),
+            "name": country.name,
+            "code": country.code,
+            "prefix": country.prefix,
+            "regions": regions_by_country.get(str(country.country_id), []),
+        }
+        for country in sorted(countries, key=lambda c: c.name)
+    ]
+    sources = _sources()
+    body, etag = _serialize(tree)
+    # Los índices de autocompletado se construyen fuera del event loop
+    return await asyncio.to_thread(
+        CatalogSnapshot, tree=tree, body=body, etag=etag, sources=sources
+    )
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_rebuild: Optional["asyncio.Task[CatalogSnapshot]"] = None
+_refresher: Optional["asyncio.Task[None]"] = None
+
+
+async def get_snapshot(force: bool = False) -> CatalogSnapshot:
+    """Catálogo vigente; se reconstruye si sus listas de origen cambiaron."""
+    global _snapshot, _rebuild
+    if not force and _snapshot is not None and _snapshot.sources == _sources():
+        return _snapshot
+    if _rebuild is None or _rebuild.done():
+        _rebuild = asyncio.ensure_future(_build())
+        _rebuild.add_done_callback(_rebuild_done)
+    snapshot = await asyncio.shield(_rebuild)
+    _snapshot = snapshot
+    return snapshot
+
+
+def _rebuild_done(task: "asyncio.Task[CatalogSnapshot]") -> None:
+    # Se recoge aquí el error aunque nadie espere ya la reconstrucción
+    # (p. ej. la tarea de refresco se canceló al apagar)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(
+            f"No se pudo construir el catálogo de ubicaciones: {task.exception()}"
+        )
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            # Relee las listas (refrescándolas si vencieron) y rehace el árbol
+            await get_snapshot(force=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Ya lo registró _rebuild_done; se reintenta en el próximo refresco
+            pass
+        await asyncio.sleep(LOCATION_CATALOG_REFRESH)
+
+
+def start_refresher() -> None:
+    """Carga el catálogo en segundo plano y lo mantiene al día (lifespan)."""
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _refresher = asyncio.ensure_future(_refresh_loop())
+
+
+async def stop_refresher() -> None:
+    global _refresher, _rebuild
+    for task in (_refresher, _rebuild):
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _refresher = None
+    _rebuild = None
@@ -0,0 +1,292 @@
+"""
+Cola persistente de comandos para dispositivos desconectados.
+
+Cuando un dispositivo no está conectado, ``send_and_log_action`` guarda el
+comando en una base SQLite local y responde 202. Al reconectarse
+(``joinRoom``) se le envían los comandos pendientes en orden y se marcan
+como aplicados en la DB-API.
+
+- Cada dispositivo guarda como máximo ``OFFLINE_QUEUE_MAX_PER_DEVICE``
+  comandos; al superarlo se descartan los más antiguos.
+- Un comando caduca a los ``OFFLINE_QUEUE_TTL`` segundos y ya no se envía.
+- Reglas de colapso: un comando de estado reemplaza a los anteriores del
+  mismo grupo (``unblock`` anula un ``block`` pendiente y viceversa) y los
+  comandos idempotentes (``locate``, ``refresh``) no se repiten. No se
+  colapsan ni descartan los comandos que un vaciado está entregando
+  (``pending`` los reserva hasta ``ack`` o ``release``): el nuevo sale detrás.
+
+Todos los workers comparten el fichero. La reserva se guarda en la propia
+fila (``claimed_by`` con el worker y ``claimed_at``) dentro de una
+transacción, así que un comando lo entrega un solo worker: mientras otro
+tiene reservados comandos de un dispositivo, ``pending`` no devuelve nada de
+ese dispositivo y el vaciado queda en manos de quien los reservó. Cada worker
+es dueño solo de las filas que reservó; si muere sin liberarlas, la reserva
+vence a los ``OFFLINE_QUEUE_CLAIM_TTL`` segundos y otro puede entregarlas.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+OFFLINE_QUEUE_ENABLED = os.getenv("OFFLINE_QUEUE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Fichero SQLite de la cola (se crea al primer uso)
+OFFLINE_QUEUE_PATH = os.getenv("OFFLINE_QUEUE_PATH", "data/offline_queue.db")
+# Comandos pendientes máximos por dispositivo
+OFFLINE_QUEUE_MAX_PER_DEVICE = int(os.getenv("OFFLINE_QUEUE_MAX_PER_DEVICE", "100"))
+# Segundos que un comando pendiente sigue siendo válido (7 días)
+OFFLINE_QUEUE_TTL = float(os.getenv("OFFLINE_QUEUE_TTL", "604800"))
+# Segundos tras los que vence la reserva de un worker que no la liberó (caído)
+OFFLINE_QUEUE_CLAIM_TTL = float(os.getenv("OFFLINE_QUEUE_CLAIM_TTL", "300"))
+
+# Comandos que fijan un estado: el último de cada grupo es el que cuenta
+STATE_GROUPS = {
+    "block": "lock",
+    "unblock": "lock",
+    "block_sim": "sim",
+    "unblock_sim": "sim",
+}
+# Comandos sin efecto acumulativo: basta con enviarlos una vez
+IDEMPOTENT_COMMANDS = {"locate", "refresh"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_commands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id TEXT NOT NULL,
+    command TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    action_id TEXT,
+    queued_at TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_pending_device ON pending_commands (device_id, id);
+"""
+
+
+@dataclass
+class QueuedCommand:
+    id: int
+    device_id: str
+    command: str
+    payload: dict
+    action_id: Optional[str]
+    queued_at: str
+
+
+class OfflineQueue:
+    """Cola FIFO acotada por dispositivo, guardada en SQLite."""
+
+    def __init__(
+        self,
+        path: str = OFFLINE_QUEUE_PATH,
+        max_per_device: int = OFFLINE_QUEUE_MAX_PER_DEVICE,
+        ttl: float = OFFLINE_QUEUE_TTL,
+        clock: Callable[[], float] = time.time,
+        claim_ttl: float = OFFLINE_QUEUE_CLAIM_TTL,
+        owner: Optional[str] = None,
+    ):
+        self.path = path
+        self.max_per_device = max_per_device
+        self.ttl = ttl
+        self.claim_ttl = claim_ttl
+        # Worker que firma las reservas
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._clock = clock
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def push(
+        self,
+        device_id: str,
+        command: str,
+        payload: Optional[dict],
+        action_id: Optional[str],
+        queued_at: str,
+    ) -> List[Tuple[str, str]]:
+        """
+        Encola un comando. Devuelve ``(action_id, motivo)`` de los comandos
+        que quedan descartados por colapso o por superar el máximo.
+        """
+        return self.push_many([(device_id, command, payload, action_id, queued_at)])
+
+    def push_many(
+        self, entries: List[Tuple[str, str, Optional[dict], Optional[str], str]]
+    ) -> List[Tuple[str, str]]:
+        """Como ``push`` para varios comandos, en una sola transacción."""
+        dropped: List[Tuple[str, str]] = []
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            for entry in entries:
+                dropped += self._push(*entry)
+        return dropped
+
+    def _push(
+        self, device_id, command, payload, action_id, queued_at
+    ) -> List[Tuple[str, str]]:
+        dropped: List[Tuple[str, str]] = []
+        group = STATE_GROUPS.get(command)
+        if group is not None or command in IDEMPOTENT_COMMANDS:
+            same = (
+                [c for c, g in STATE_GROUPS.items() if g == group]
+                if group
+                else [command]
+            )
+            marks = ",".join("?" * len(same))
+            rows = self._db.execute(
+                f"SELECT id, command, action_id FROM pending_commands "
+                f"WHERE device_id = ? AND command IN ({marks}) "
+                f"AND (claimed_by IS NULL OR claimed_at <= ?)",
+                (device_id, *same, self._claim_cutoff()),
+            ).fetchall()
+            dropped += [
+                (row[2], f"Superseded by a later '{command}' command.")
+                for row in rows
+                if row[2]
+            ]
+            self._delete([row[0] for row in rows])
+
+        self._db.execute(
+            "INSERT INTO pending_commands "
+            "(device_id, command, payload, action_id, queued_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                device_id,
+                command,
+                json.dumps(payload or {}),
+                action_id,
+                queued_at,
+                self._clock() + self.ttl,
+            ),
+        )
+
+        overflow = self._db.execute(
+            "SELECT id, action_id, claimed_by, claimed_at FROM pending_commands "
+            "WHERE device_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (device_id, self.max_per_device),
+        ).fetchall()
+        cutoff = self._claim_cutoff()
+        overflow = [row for row in overflow if row[2] is None or row[3] <= cutoff]
+        dropped += [
+            (row[1], "Dropped: offline queue for the device is full.")
+            for row in overflow
+            if row[1]
+        ]
+        self._delete([row[0] for row in overflow])
+        return dropped
+
+    def pending(
+        self, device_id: str
+    ) -> Tuple[List[QueuedCommand], List[QueuedCommand]]:
+        """
+        Comandos pendientes del dispositivo en orden de llegada, separados en
+        ``(vigentes, caducados)``. Los caducados se borran; los vigentes
+        siguen en la cola, reservados para este worker, hasta confirmarlos
+        con ``ack`` o devolverlos con ``release``. Si otro worker tiene
+        reservados comandos del dispositivo devuelve ``([], [])``: es él
+        quien lo está vaciando.
+        """
+        due: List[QueuedCommand] = []
+        expired: List[QueuedCommand] = []
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, device_id, command, payload, action_id, queued_at, expires_at, "
+                "claimed_by, claimed_at FROM pending_commands WHERE device_id = ? ORDER BY id",
+                (device_id,),
+            ).fetchall()
+            cutoff = self._claim_cutoff()
+            if any(
+                row[7] not in (None, self.owner) and row[8] > cutoff for row in rows
+            ):
+                return due, expired
+            now = self._clock()
+            for row in rows:
+                item = QueuedCommand(
+                    row[0], row[1], row[2], json.loads(row[3]), row[4], row[5]
+                )
+                (expired if row[6] <= now else due).append(item)
+            self._delete([item.id for item in expired])
+            self._db.executemany(
+                "UPDATE pending_commands SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                [(self.owner, now, item.id) for item in due],
+            )
+        return due, expired
+
+    def ack(self, ids: List[int]) -> None:
+        """Quita de la cola los comandos ya entregados."""
+        if not ids:
+            return
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._delete(ids)
+
+    def release(self, ids: Iterable[int]) -> None:
+        """Libera la reserva de ``pending`` de los comandos que no se entregaron."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "UPDATE pending_commands SET claimed_by = NULL, claimed_at = NULL "
+                "WHERE id = ? AND claimed_by = ?",
+                [(i, self.owner) for i in ids],
+            )
+
+    def count(self, device_id: Optional[str] = None) -> int:
+        with self._lock:
+            if device_id is None:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM pending_commands"
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM pending_commands WHERE device_id = ?",
+                    (device_id,),
+                ).fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _claim_cutoff(self) -> float:
+        """Las reservas hechas antes de este instante ya vencieron."""
+        return self._clock() - self.claim_ttl
+
+    def _delete(self, ids: List[int]) -> None:
+        if ids:
+            self._db.executemany(
+                "DELETE FROM pending_commands WHERE id = ?", [(i,) for i in ids]
+            )
+
+
+_queue: Optional[OfflineQueue] = None
+
+
+def get_queue() -> Optional[OfflineQueue]:
+    """Cola compartida del proceso (None si está desactivada)."""
+    global _queue
+    if not OFFLINE_QUEUE_ENABLED:
+        return None
+    if _queue is None:
+        _queue = OfflineQueue()
+        logger.info(f"Cola de comandos offline en {OFFLINE_QUEUE_PATH}")
+    return _queue
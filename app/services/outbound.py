@@ -0,0 +1,273 @@
+"""
+Cola de salida por dispositivo con carriles de prioridad.
+
+Todo lo que se envía a un dispositivo (comandos ``action`` y mensajes) pasa
+por su cola, que lo entrega de uno en uno: el siguiente envío no sale hasta
+que termina el anterior (ack, timeout o emit), así un socket lento no
+acumula un búfer de escritura sin límite.
+
+- Carriles: los comandos de bloqueo/desbloqueo y baja salen antes que el
+  resto de comandos, y estos antes que las notificaciones y mensajes. El
+  carril crítico tiene su propio turno: no espera al ack de un comando o
+  mensaje en curso, así que como mucho hay un envío crítico y otro de los
+  demás carriles a la vez.
+- Coalescencia: un ``locate``/``refresh`` que ya espera en la cola no se
+  repite; quien lo pide de nuevo comparte el resultado del que ya está.
+- Profundidad máxima (``OUTBOUND_MAX_DEPTH``): con la cola llena, el nuevo
+  envío desplaza al más reciente de un carril menos prioritario o, si no lo
+  hay, se descarta.
+- Espera máxima (``OUTBOUND_MAX_WAIT``): lo que lleva demasiado en la cola
+  no se envía.
+
+Un envío descartado, vencido o interrumpido (el turno se canceló al apagar)
+devuelve None, igual que uno sin ack: los comandos vuelven a la cola offline y se reenvían al reconectar. La
+profundidad y el tiempo de espera se consultan en
+``GET /api/v1/diagnostics/outbound``.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.services.delivery_metrics import LatencyHistogram
+from app.services.offline_queue import IDEMPOTENT_COMMANDS, STATE_GROUPS
+
+OUTBOUND_QUEUE_ENABLED = os.getenv("OUTBOUND_QUEUE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Envíos en cola como máximo por dispositivo
+OUTBOUND_MAX_DEPTH = int(os.getenv("OUTBOUND_MAX_DEPTH", "50"))
+# Segundos que un envío puede esperar en la cola antes de descartarse
+OUTBOUND_MAX_WAIT = float(os.getenv("OUTBOUND_MAX_WAIT", "60"))
+
+LANE_CRITICAL = 0
+LANE_COMMAND = 1
+LANE_NOTIFY = 2
+LANE_NAMES = ("critical", "command", "notify")
+
+CRITICAL_COMMANDS = set(STATE_GROUPS) | {"unenroll"}
+
+
+def lane_for(event: str, command: Optional[str] = None) -> int:
+    """Carril de un envío según el evento y, para ``action``, el comando."""
+    if event != "action" or command == "notify":
+        return LANE_NOTIFY
+    if command in CRITICAL_COMMANDS:
+        return LANE_CRITICAL
+    return LANE_COMMAND
+
+
+def coalesce_key(command: str, payload: Optional[dict]) -> Optional[str]:
+    """Clave de los comandos que basta con enviar una vez si ya esperan."""
+    if command in IDEMPOTENT_COMMANDS and not payload:
+        return command
+    return None
+
+
+class _Outgoing:
+    __slots__ = ("transport", "lane", "key", "future", "enqueued_at")
+
+    def __init__(
+        self, transport, lane: int, key: Optional[str], future: "asyncio.Future"
+    ):
+        self.transport = transport
+        self.lane = lane
+        self.key = key
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+# Turnos de envío de cada dispositivo y los carriles que atiende cada uno
+_TURNS = ((LANE_CRITICAL,), (LANE_COMMAND, LANE_NOTIFY))
+
+
+def _turn_of(lane: int) -> int:
+    return 0 if lane == LANE_CRITICAL else 1
+
+
+class _Outbox:
+    __slots__ = ("lanes", "by_key", "workers")
+
+    def __init__(self) -> None:
+        self.lanes: List[Deque[_Outgoing]] = [deque() for _ in LANE_NAMES]
+        self.by_key: Dict[str, _Outgoing] = {}
+        self.workers: List[Optional["asyncio.Task[None]"]] = [None] * len(_TURNS)
+
+    def depth(self) -> int:
+        return sum(len(lane) for lane in self.lanes)
+
+    def idle(self) -> bool:
+        return not self.depth() and not any(self.workers)
+
+
+class _LaneStats:
+    def __init__(self):
+        self.wait = LatencyHistogram()
+        self.enqueued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.expired = 0
+
+
+class OutboundScheduler:
+    """Colas de salida de todos los dispositivos de este proceso."""
+
+    def __init__(
+        self,
+        max_depth: int = OUTBOUND_MAX_DEPTH,
+        max_wait: float = OUTBOUND_MAX_WAIT,
+        enabled: bool = OUTBOUND_QUEUE_ENABLED,
+    ):
+        self.max_depth = max_depth
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._outboxes: Dict[str, _Outbox] = {}
+        self._stats = [_LaneStats() for _ in LANE_NAMES]
+
+    async def send(
+        self,
+        device_id: str,
+        transport: Callable[[], Awaitable[Any]],
+        lane: int = LANE_COMMAND,
+        key: Optional[str] = None,
+    ) -> Any:
+        """
+        Encola ``transport`` (la corrutina que hace el envío) y devuelve su
+        resultado, o None si se descartó antes de enviarse.
+        """
+        if not self.enabled:
+            return await transport()
+        # shield: si quien espera se cancela, el envío sigue su curso
+        return await asyncio.shield(self.submit(device_id, transport, lane, key))
+
+    def submit(
+        self,
+        device_id: str,
+        transport: Callable[[], Awaitable[Any]],
+        lane: int = LANE_COMMAND,
+        key: Optional[str] = None,
+    ) -> "asyncio.Future":
+        stats = self._stats[lane]
+        outbox = self._outboxes.get(device_id)
+        if outbox is None:
+            outbox = self._outboxes[device_id] = _Outbox()
+
+        if key is not None:
+            waiting = outbox.by_key.get(key)
+            if waiting is not None:
+                stats.coalesced += 1
+                if lane < waiting.lane:
+                    # Sube al carril más prioritario de los que lo piden
+                    outbox.lanes[waiting.lane].remove(waiting)
+                    waiting.lane = lane
+                    outbox.lanes[lane].append(waiting)
+                    self._wake(device_id, outbox, lane)
+                return waiting.future
+
+        future = asyncio.get_running_loop().create_future()
+        if outbox.depth() >= self.max_depth and not self._evict(outbox, lane):
+            stats.dropped += 1
+            future.set_result(None)
+            return future
+
+        outgoing = _Outgoing(transport, lane, key, future)
+        outbox.lanes[lane].append(outgoing)
+        if key is not None:
+            outbox.by_key[key] = outgoing
+        stats.enqueued += 1
+        self._wake(device_id, outbox, lane)
+        return future
+
+    def _wake(self, device_id: str, outbox: _Outbox, lane: int) -> None:
+        turn = _turn_of(lane)
+        if outbox.workers[turn] is None:
+            outbox.workers[turn] = asyncio.ensure_future(
+                self._drain(device_id, outbox, turn)
+            )
+
+    def _evict(self, outbox: _Outbox, lane: int) -> bool:
+        """Descarta el envío más reciente de un carril menos prioritario que ``lane``."""
+        for lower in range(len(LANE_NAMES) - 1, lane, -1):
+            if outbox.lanes[lower]:
+                victim = outbox.lanes[lower].pop()
+                self._forget(outbox, victim)
+                self._stats[lower].dropped += 1
+                victim.future.set_result(None)
+                return True
+        return False
+
+    @staticmethod
+    def _forget(outbox: _Outbox, outgoing: _Outgoing) -> None:
+        if outgoing.key is not None and outbox.by_key.get(outgoing.key) is outgoing:
+            del outbox.by_key[outgoing.key]
+
+    async def _drain(self, device_id: str, outbox: _Outbox, turn: int) -> None:
+        lanes = [outbox.lanes[index] for index in _TURNS[turn]]
+        outgoing: Optional[_Outgoing] = None
+        try:
+            while True:
+                lane = next((lane for lane in lanes if lane), None)
+                if lane is None:
+                    return
+                outgoing = lane.popleft()
+                self._forget(outbox, outgoing)
+                stats = self._stats[outgoing.lane]
+                waited = time.monotonic() - outgoing.enqueued_at
+                stats.wait.observe(waited * 1000)
+                if waited > self.max_wait:
+                    stats.expired += 1
+                    outgoing.future.set_result(None)
+                    continue
+                try:
+                    result = await outgoing.transport()
+                except Exception as e:
+                    outgoing.future.set_exception(e)
+                else:
+                    stats.sent += 1
+                    outgoing.future.set_result(result)
+        finally:
+            # Cancelado (p. ej. al apagar): nadie se queda esperando un resultado
+            if outgoing is not None and not outgoing.future.done():
+                outgoing.future.set_result(None)
+            for lane in lanes:
+                while lane:
+                    pending = lane.popleft()
+                    self._forget(outbox, pending)
+                    if not pending.future.done():
+                        pending.future.set_result(None)
+            outbox.workers[turn] = None
+            if self._outboxes.get(device_id) is outbox and outbox.idle():
+                del self._outboxes[device_id]
+
+    def depth(self, device_id: str) -> int:
+        outbox = self._outboxes.get(device_id)
+        return outbox.depth() if outbox is not None else 0
+
+    def snapshot(self) -> dict:
+        depths = [outbox.depth() for outbox in self._outboxes.values()]
+        return {
+            "enabled": self.enabled,
+            "devices_with_backlog": sum(1 for depth in depths if depth),
+            "queued": sum(depths),
+            "max_device_depth": max(depths, default=0),
+            "lanes": {
+                name: {
+                    "queued": sum(len(o.lanes[index]) for o in self._outboxes.values()),
+                    "enqueued": stats.enqueued,
+                    "sent": stats.sent,
+                    "coalesced": stats.coalesced,
+                    "dropped": stats.dropped,
+                    "expired": stats.expired,
+                    "wait": stats.wait.snapshot(),
+                }
+                for index, (name, stats) in enumerate(zip(LANE_NAMES, self._stats))
+            },
+        }
+
+
+scheduler = OutboundScheduler()
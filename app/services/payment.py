@@ -3,10 +3,9 @@ from typing import List, Optional
 from uuid import UUID
 import logging
 
-import httpx
-
 from app.models.payment import PaymentCreate, PaymentState, PaymentUpdate
 from app.models.payment_response import PaymentResponse
+from app.services import upstream
 
 USER_SVC_URL = os.getenv("USER_SVC_URL", "http://localhost:8002")
 PAYMENT_API_URL = f"{USER_SVC_URL}/api/v1/payments"
@@ -14,7 +13,7 @@ PAYMENT_API_URL = f"{USER_SVC_URL}/api/v1/payments"
 logging.basicConfig(level=logging.DEBUG)
 
 async def create_payment(payment_in: PaymentCreate) -> Optional[PaymentResponse]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(
             PAYMENT_API_URL, json=payment_in.model_dump(mode="json")
         )
@@ -39,7 +38,7 @@ async def get_payments(
     if store_id:
         params["store_id"] = str(store_id)
 
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(PAYMENT_API_URL, params=params)
         response.raise_for_status()
         
@@ -73,7 +72,7 @@ async def get_payments(
 
 
 async def get_payment(payment_id: UUID) -> Optional[PaymentResponse]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.get(f"{PAYMENT_API_URL}/{payment_id}")
         if response.status_code == 200:
             return PaymentResponse(**response.json())
@@ -83,7 +82,7 @@ async def get_payment(payment_id: UUID) -> Optional[PaymentResponse]:
 async def update_payment(
     payment_id: UUID, payment_update: PaymentUpdate
 ) -> Optional[PaymentResponse]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.patch(
             f"{PAYMENT_API_URL}/{payment_id}",
             json=payment_update.model_dump(exclude_unset=False, mode="json"),
@@ -94,6 +93,6 @@ async def update_payment(
 
 
 async def delete_payment(payment_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{PAYMENT_API_URL}/{payment_id}")
         return response.status_code == 204
@@ -1,17 +1,16 @@
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-import httpx
-
 from app.models.plan import Plan, PlanCreate, PlanDB, PlanRaw, PlanUpdate
+from app.services import dataloader, upstream
 
 USER_SVC_URL = os.getenv("USER_SVC_URL", "http://localhost:8002")
 PLAN_API_URL = f"{USER_SVC_URL}/api/v1/plans"
 
 
 async def create_plan(plan_in: PlanCreate) -> Optional[Plan]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.post(PLAN_API_URL, json=plan_in.model_dump(mode="json"))
         if response.status_code == 201:
             return Plan(**response.json())
@@ -21,7 +20,7 @@ async def create_plan(plan_in: PlanCreate) -> Optional[Plan]:
 async def get_all_plans(
     device_id: Optional[UUID] = None, user_id: Optional[UUID] = None, store_id: Optional[UUID] = None
 ) -> List[PlanRaw]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         params = {}
         if device_id:
             params["device_id"] = str(device_id)
@@ -35,16 +34,25 @@ async def get_all_plans(
         return [PlanRaw(**item) for item in response.json()]
 
 
-async def get_plan_by_id(plan_id: UUID) -> Optional[PlanRaw]:
-    async with httpx.AsyncClient() as client:
+async def _fetch_plan(plan_id: str) -> Optional[dict]:
+    async with upstream.client_session() as client:
         response = await client.get(f"{PLAN_API_URL}/{plan_id}")
-        if response.status_code == 200:
-            return PlanRaw(**response.json())
-        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def _load_plans(plan_ids: List[str]) -> Dict[str, Any]:
+    return await dataloader.fetch_by_ids(PLAN_API_URL, plan_ids, _fetch_plan, id_field="plan_id")
+
+
+async def get_plan_by_id(plan_id: UUID) -> Optional[PlanRaw]:
+    data = await dataloader.get_loader(_load_plans).load(plan_id)
+    if data:
+        return PlanRaw(**data)
+    return None
 
 
 async def update_plan(plan_id: UUID, plan_update: PlanUpdate) -> Optional[PlanDB]:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         # Convert the model to a dictionary and explicitly include all fields
         update_data = plan_update.model_dump(mode="json", exclude_unset=False)
 
@@ -55,6 +63,7 @@ async def update_plan(plan_id: UUID, plan_update: PlanUpdate) -> Optional[PlanDB
             f"{PLAN_API_URL}/{plan_id}",
             json=update_data,
         )
+        dataloader.forget(_load_plans, plan_id)
 
         # Handle different status codes
         if response.status_code == 200:
@@ -71,6 +80,7 @@ async def update_plan(plan_id: UUID, plan_update: PlanUpdate) -> Optional[PlanDB
 
 
 async def delete_plan(plan_id: UUID) -> bool:
-    async with httpx.AsyncClient() as client:
+    async with upstream.client_session() as client:
         response = await client.delete(f"{PLAN_API_URL}/{plan_id}")
+        dataloader.forget(_load_plans, plan_id)
         return response.status_code == 204
@@ -0,0 +1,93 @@
+"""
+Índice por prefijo (trie) para autocompletado en memoria.
+
+Las claves se normalizan sin tildes ni mayúsculas (``Bogotá`` ≡ ``bogota``)
+y se indexa tanto el nombre completo como el inicio de cada palabra
+(``Santa Marta`` responde a ``sa`` y a ``mar``). Cada nodo guarda ya
+ordenados sus mejores ``max_k`` resultados, de modo que una consulta solo
+recorre los caracteres del prefijo.
+"""
+
+import unicodedata
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Resultados precalculados por nodo (tope de ``limit`` en las consultas)
+MAX_K = 50
+
+
+def normalize(text: str) -> str:
+    """Texto sin tildes, en minúsculas y con espacios simples."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+class _Node:
+    __slots__ = ("children", "top", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.top: List[Any] = []
+        self.ids: List[int] = []
+
+
+class PrefixIndex:
+    """Trie de solo lectura: se construye de una vez y se consulta por prefijo."""
+
+    def __init__(
+        self, entries: Iterable[Tuple[Iterable[str], Any]], max_k: int = MAX_K
+    ):
+        """
+        ``entries`` son pares ``(claves, valor)``; la primera clave es el
+        nombre principal y tiene prioridad sobre el resto (p. ej. códigos).
+        """
+        self.max_k = max_k
+        self._root = _Node()
+        self.size = 0
+
+        ranked = []
+        for index, (keys, value) in enumerate(entries):
+            self.size += 1
+            keys = [normalize(key) for key in keys if key]
+            if not keys:
+                continue
+            name = keys[0]
+            for position, key in enumerate(keys):
+                # Nombre completo > otras claves > inicio de una palabra interior
+                ranked.append(
+                    (0 if position == 0 else 1, len(name), name, index, key, value)
+                )
+                words = key.split(" ")
+                for start in range(1, len(words)):
+                    ranked.append(
+                        (2, len(name), name, index, " ".join(words[start:]), value)
+                    )
+
+        # Insertando por orden de prioridad, cada nodo se queda con los primeros max_k
+        ranked.sort(key=lambda item: item[:4])
+        nodes = []
+        for *_, index, key, value in ranked:
+            node = self._root
+            for char in key:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                    nodes.append(child)
+                node = child
+                if len(node.ids) < max_k and index not in node.ids:
+                    node.ids.append(index)
+                    node.top.append(value)
+        for node in nodes:
+            node.ids = []
+
+    def search(self, query: str, limit: int = 10) -> List[Any]:
+        """Mejores ``limit`` valores cuyo nombre (o palabra) empieza por ``query``."""
+        node = self._root
+        for char in normalize(query):
+            child = node.children.get(char)
+            if child is None:
+                return []
+            node = child
+        if node is self._root:
+            return []
+        return node.top[:limit]
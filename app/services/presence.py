@@ -0,0 +1,282 @@
+"""
+Registro compartido de presencia de dispositivos (device_id → SIDs).
+
+Con varios workers o nodos del gateway, cada proceso solo ve sus propias
+conexiones Socket.IO. Este registro guarda qué SIDs tiene cada dispositivo en
+todo el clúster, de modo que las comprobaciones de conexión, el conteo de
+``/connections`` y la elección de SID para ``sio.call`` funcionan sea cual
+sea el worker que atiende la petición (los emits llegan al worker correcto a
+través del client manager, ver ``app.services.socket_cluster``).
+
+- Sin registro (``create_presence`` devuelve None): un solo proceso, basta
+  con el registro de conexiones del propio ``ConnectionManager``. Con un
+  client manager Redis y sin ``PRESENCE_REDIS_URL`` se usa ese mismo Redis.
+- ``LocalPresence``: en memoria; varias instancias pueden compartir el mismo
+  ``store`` para simular nodos en tests.
+- ``RedisPresence``: en Redis (requiere el paquete ``redis``). Cada nodo
+  renueva una clave con TTL; las entradas de un nodo caído se purgan.
+"""
+
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from app.services.socket_cluster import SOCKETIO_MANAGER_URL
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# URL de Redis para la presencia; vacío = la de SOCKETIO_MANAGER_URL si es
+# Redis o, si no, en memoria del proceso
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "")
+# Segundos sin latido tras los que se purgan las conexiones de un nodo
+PRESENCE_NODE_TTL = int(os.getenv("PRESENCE_NODE_TTL", "30"))
+
+
+class PresenceRegistry(ABC):
+    """Interfaz del registro de presencia."""
+
+    @abstractmethod
+    async def add(self, device_id: str, sid: str, groups: Sequence[str] = ()) -> None:
+        """Registra el SID; ``groups`` son las salas de grupo (tienda, plan)."""
+
+    @abstractmethod
+    async def remove(self, device_id: str, sid: str) -> bool:
+        """Quita el SID; True si el dispositivo queda sin conexiones."""
+
+    @abstractmethod
+    async def sids(self, device_id: str) -> List[str]:
+        """SIDs del dispositivo en todo el clúster."""
+
+    async def is_online(self, device_id: str) -> bool:
+        return bool(await self.sids(device_id))
+
+    async def online(self, device_ids: Iterable[str]) -> Set[str]:
+        """Los dispositivos de ``device_ids`` que están conectados."""
+        return {
+            device_id for device_id in device_ids if await self.is_online(device_id)
+        }
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Dispositivos distintos conectados en todo el clúster."""
+
+    @abstractmethod
+    async def group_count(self, group: str) -> int:
+        """Dispositivos conectados en todo el clúster que están en ``group``."""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalPresence(PresenceRegistry):
+    """Presencia en memoria; ``store`` se puede compartir entre instancias."""
+
+    def __init__(self, store: Optional[dict] = None):
+        store = store if store is not None else {}
+        # device_id -> SIDs
+        self._devices: Dict[str, Set[str]] = store.setdefault("devices", {})
+        # grupo -> device_ids, y device_id -> grupos
+        self._groups: Dict[str, Set[str]] = store.setdefault("groups", {})
+        self._device_groups: Dict[str, Set[str]] = store.setdefault("device_groups", {})
+
+    async def add(self, device_id: str, sid: str, groups: Sequence[str] = ()) -> None:
+        self._devices.setdefault(device_id, set()).add(sid)
+        for group in groups:
+            self._groups.setdefault(group, set()).add(device_id)
+            self._device_groups.setdefault(device_id, set()).add(group)
+
+    async def remove(self, device_id: str, sid: str) -> bool:
+        sids = self._devices.get(device_id)
+        if sids is None:
+            return True
+        sids.discard(sid)
+        if sids:
+            return False
+        del self._devices[device_id]
+        for group in self._device_groups.pop(device_id, ()):
+            members = self._groups[group]
+            members.discard(device_id)
+            if not members:
+                del self._groups[group]
+        return True
+
+    async def sids(self, device_id: str) -> List[str]:
+        return list(self._devices.get(device_id, ()))
+
+    async def count(self) -> int:
+        return len(self._devices)
+
+    async def group_count(self, group: str) -> int:
+        return len(self._groups.get(group, ()))
+
+
+# Quita una conexión y, si era la última del dispositivo, al dispositivo de
+# ``devices`` y de sus grupos, todo en un paso: un ``add`` simultáneo no
+# puede colarse entre la comprobación y el borrado. Las claves de grupo se
+# calculan en el script (Redis sin cluster)
+_REMOVE_SCRIPT = """
+redis.call('SREM', KEYS[1], ARGV[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+if redis.call('SCARD', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('SREM', KEYS[3], ARGV[3])
+for _, group in ipairs(redis.call('SMEMBERS', KEYS[4])) do
+    redis.call('SREM', ARGV[4] .. group, ARGV[3])
+end
+redis.call('DEL', KEYS[4])
+return 1
+"""
+
+
+class RedisPresence(PresenceRegistry):
+    """
+    Presencia en Redis compartida por todos los nodos.
+
+    Claves (bajo ``prefix``): ``dev:{device_id}`` con los miembros
+    ``{nodo}|{sid}``, ``devices`` con los dispositivos conectados,
+    ``node:{nodo}`` con las conexiones de cada nodo (para purgarlas),
+    ``group:{grupo}`` y ``groups-of:{device_id}`` con los grupos de cada
+    dispositivo, ``nodes`` y ``alive:{nodo}`` (latido con TTL).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        node_id: Optional[str] = None,
+        ttl: int = PRESENCE_NODE_TTL,
+        prefix: str = "smartpay:presence",
+    ):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("PRESENCE_REDIS_URL requiere el paquete 'redis'") from e
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self.node_id = node_id or uuid.uuid4().hex
+        self.ttl = ttl
+        self._prefix = prefix
+        self._heartbeat: Optional["asyncio.Task[None]"] = None
+        self._remove_script = self._redis.register_script(_REMOVE_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self._prefix, *parts))
+
+    async def add(self, device_id: str, sid: str, groups: Sequence[str] = ()) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self._key("dev", device_id), f"{self.node_id}|{sid}")
+            pipe.sadd(self._key("devices"), device_id)
+            pipe.sadd(self._key("node", self.node_id), f"{device_id}|{sid}")
+            for group in groups:
+                pipe.sadd(self._key("group", group), device_id)
+                pipe.sadd(self._key("groups-of", device_id), group)
+            await pipe.execute()
+
+    async def remove(self, device_id: str, sid: str) -> bool:
+        return await self._remove(self.node_id, device_id, sid)
+
+    async def _remove(self, node_id: str, device_id: str, sid: str) -> bool:
+        gone = await self._remove_script(
+            keys=[
+                self._key("dev", device_id),
+                self._key("node", node_id),
+                self._key("devices"),
+                self._key("groups-of", device_id),
+            ],
+            args=[
+                f"{node_id}|{sid}",
+                f"{device_id}|{sid}",
+                device_id,
+                self._key("group", ""),
+            ],
+        )
+        return bool(gone)
+
+    async def sids(self, device_id: str) -> List[str]:
+        members = await self._redis.smembers(self._key("dev", device_id))
+        return [member.split("|", 1)[1] for member in members]
+
+    async def online(self, device_ids: Iterable[str]) -> Set[str]:
+        device_ids = list(device_ids)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for device_id in device_ids:
+                pipe.exists(self._key("dev", device_id))
+            found = await pipe.execute()
+        return {device_id for device_id, exists in zip(device_ids, found) if exists}
+
+    async def count(self) -> int:
+        return await self._redis.scard(self._key("devices"))
+
+    async def group_count(self, group: str) -> int:
+        return await self._redis.scard(self._key("group", group))
+
+    async def start(self) -> None:
+        await self._redis.sadd(self._key("nodes"), self.node_id)
+        await self._beat()
+        self._heartbeat = asyncio.ensure_future(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await self._purge(self.node_id)
+        await self._redis.aclose()
+
+    async def _beat(self) -> None:
+        await self._redis.set(self._key("alive", self.node_id), "1", ex=self.ttl)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self._beat()
+                for node_id in await self._redis.smembers(self._key("nodes")):
+                    if node_id != self.node_id and not await self._redis.exists(
+                        self._key("alive", node_id)
+                    ):
+                        logger.warning(
+                            f"Nodo {node_id} sin latido, se purgan sus conexiones"
+                        )
+                        await self._purge(node_id)
+            except Exception as e:
+                logger.error(f"Error en el latido de presencia: {e}")
+
+    async def _purge(self, node_id: str) -> None:
+        for member in await self._redis.smembers(self._key("node", node_id)):
+            device_id, sid = member.split("|", 1)
+            await self._remove(node_id, device_id, sid)
+        await self._redis.delete(
+            self._key("node", node_id), self._key("alive", node_id)
+        )
+        await self._redis.srem(self._key("nodes"), node_id)
+
+
+def create_presence(
+    url: str = PRESENCE_REDIS_URL, manager_url: str = SOCKETIO_MANAGER_URL
+) -> Optional[PresenceRegistry]:
+    """
+    Registro según la configuración: Redis si hay URL y, si no, el Redis del
+    client manager de Socket.IO cuando lo hay. Con otro client manager entre
+    procesos (AMQP) y sin ``PRESENCE_REDIS_URL`` no hay registro compartido:
+    cada worker solo ve sus conexiones y se avisa al arrancar.
+    """
+    if not url and manager_url.startswith(("redis://", "rediss://")):
+        logger.info(
+            "PRESENCE_REDIS_URL vacío: la presencia usa el Redis de SOCKETIO_MANAGER_URL"
+        )
+        url = manager_url
+    if url:
+        logger.info("Presencia de dispositivos compartida en Redis")
+        return RedisPresence(url)
+    if manager_url and not manager_url.startswith("memory://"):
+        logger.error(
+            "SOCKETIO_MANAGER_URL reparte los emits entre procesos pero falta "
+            "PRESENCE_REDIS_URL: cada worker solo verá sus propias conexiones y "
+            "encolará como offline los comandos a dispositivos de otros workers"
+        )
+    return None
@@ -0,0 +1,167 @@
+"""
+Caché de datos de referencia (países, regiones, ciudades, roles).
+
+Estos datos cambian muy pocas veces, así que se guarda la lista completa de
+cada entidad y se sirven desde memoria las consultas por ID y los filtros
+(``name``, ``country_id``, ``region_id``) sin ir a la DB-API.
+
+- Lectura a través de la caché con TTL (``REFERENCE_CACHE_TTL``).
+- Pasado el TTL se sigue sirviendo la copia anterior durante
+  ``REFERENCE_CACHE_STALE`` segundos mientras se refresca en segundo plano
+  (stale-while-revalidate); si el refresco falla se mantiene la copia.
+- Listas con más de ``REFERENCE_CACHE_MAX_ITEMS`` elementos no se cachean.
+- Cada versión de la lista tiene un ETag para respuestas condicionales.
+- Las rutas de creación/edición/borrado del gateway invalidan la caché.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REFERENCE_CACHE_ENABLED = os.getenv("REFERENCE_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Segundos que una lista se considera fresca
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+# Segundos adicionales en que se sirve la lista vencida mientras se refresca
+REFERENCE_CACHE_STALE = float(os.getenv("REFERENCE_CACHE_STALE", "3600"))
+# Tamaño máximo de una lista cacheada
+REFERENCE_CACHE_MAX_ITEMS = int(os.getenv("REFERENCE_CACHE_MAX_ITEMS", "50000"))
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class ReferenceCache(Generic[T]):
+    """Lista completa de una entidad de referencia con índice por ID."""
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[], Awaitable[List[T]]],
+        id_field: str,
+        ttl: float = REFERENCE_CACHE_TTL,
+        stale: float = REFERENCE_CACHE_STALE,
+        max_items: int = REFERENCE_CACHE_MAX_ITEMS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._load = load
+        self._id_field = id_field
+        self.ttl = ttl
+        self.stale = stale
+        self.max_items = max_items
+        self._clock = clock
+        self._items: Optional[List[T]] = None
+        self._by_id: Dict[str, T] = {}
+        self._loaded_at = 0.0
+        self._refresh: Optional["asyncio.Task[List[T]]"] = None
+        # Se incrementa al invalidar; un refresco iniciado antes no se guarda
+        self._generation = 0
+        self.etag: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    async def get_all(self) -> List[T]:
+        if not REFERENCE_CACHE_ENABLED:
+            return await self._load()
+
+        age = self._clock() - self._loaded_at
+        if self._items is not None and age < self.ttl:
+            self.hits += 1
+            return self._items
+        if self._items is not None and age < self.ttl + self.stale:
+            self.hits += 1
+            self._start_refresh()
+            return self._items
+
+        self.misses += 1
+        return await asyncio.shield(self._start_refresh())
+
+    async def get(self, entity_id) -> Optional[T]:
+        """Entidad por ID desde la lista cacheada (None si no está)."""
+        await self.get_all()
+        return self._by_id.get(str(entity_id))
+
+    def invalidate(self) -> None:
+        """Descarta la lista; la próxima lectura vuelve a la DB-API."""
+        self._generation += 1
+        self._items = None
+        self._by_id = {}
+        self.etag = None
+        self._refresh = None
+
+    def _start_refresh(self) -> "asyncio.Task[List[T]]":
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._do_refresh(self._generation))
+        return self._refresh
+
+    async def _do_refresh(self, generation: int) -> List[T]:
+        try:
+            items = await self._load()
+        except Exception as e:
+            if self._items is not None:
+                logger.warning(
+                    f"No se pudo refrescar la caché '{self.name}', se sirve la copia anterior: {e}"
+                )
+                return self._items
+            raise
+        if generation != self._generation:
+            return items
+        if len(items) > self.max_items:
+            logger.warning(
+                f"Caché '{self.name}': {len(items)} elementos superan el máximo "
+                f"({self.max_items}), no se cachea"
+            )
+            return items
+
+        self._items = items
+        self._by_id = {str(getattr(item, self._id_field)): item for item in items}
+        self._loaded_at = self._clock()
+        body = json.dumps(
+            [item.model_dump(mode="json") for item in items], sort_keys=True
+        )
+        self.etag = hashlib.sha1(body.encode()).hexdigest()[:16]
+        return items
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "items": len(self._items) if self._items is not None else None,
+            "age": (
+                round(self._clock() - self._loaded_at, 1)
+                if self._items is not None
+                else None
+            ),
+            "etag": self.etag,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def name_matches(value: Optional[str], query: Optional[str]) -> bool:
+    """Filtro ``name`` como en la DB-API: contiene, sin distinguir mayúsculas."""
+    if not query:
+        return True
+    return query.casefold() in (value or "").casefold()
+
+
+def list_etag(cache: ReferenceCache, **filters) -> Optional[str]:
+    """ETag de una lista (filtrada o no) servida desde ``cache``."""
+    if cache.etag is None:
+        return None
+    key = json.dumps(
+        {k: str(v) for k, v in filters.items() if v is not None}, sort_keys=True
+    )
+    suffix = hashlib.sha1(key.encode()).hexdigest()[:8]
+    return f'W/"{cache.etag}-{suffix}"'
@@ -0,0 +1,187 @@
+"""
+Números de secuencia por dispositivo y reenvío de lo perdido al reconectar.
+
+Cada evento que el gateway envía a un dispositivo (``action``, ``message``,
+...) lleva ``seq``, un número que crece de uno en uno por dispositivo. Los
+envíos sin ack (``send_to_device``) se guardan además en un búfer circular
+por dispositivo de como mucho ``REPLAY_BUFFER_SIZE`` eventos y
+``REPLAY_TTL`` segundos.
+
+Al reconectar, el dispositivo envía el último ``seq`` que recibió y el
+``epoch`` de la bienvenida (en el handshake o en ``joinRoom``), y recibe
+solo los eventos del búfer posteriores. Si alguno ya salió del búfer, o el
+``epoch`` no coincide porque el proceso se reinició, la bienvenida lo indica
+con ``resync: true`` y el dispositivo debe resincronizar su estado completo.
+
+Los comandos con ack no se guardan en el búfer porque de sus reintentos se
+encarga la cola offline. Llevan ``seq`` igualmente, y un reintento tras un
+ack perdido repite el mismo ``seq``, así el dispositivo puede descartar el
+duplicado en lugar de ejecutarlo dos veces.
+
+Los contadores y el búfer son de cada proceso. Con varios workers solo numera
+los envíos a un dispositivo el que tiene su socket; los que salen de otro
+worker (por el client manager) van sin ``seq`` y no se pueden reenviar, y
+lo enviado mientras está desconectado de todos no se guarda (los comandos
+quedan en la cola offline). Con un solo proceso se guarda también lo enviado
+estando desconectado.
+
+La limpieza periódica olvida los dispositivos sin envíos en ``REPLAY_TTL``
+segundos que no están conectados a este proceso; si uno de ellos vuelve con
+un ``lastSeq`` anterior, la bienvenida le pide resincronizar y su secuencia
+empieza de nuevo. A los conectados se les conserva para que ``seq`` no
+retroceda en mitad de una sesión.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Callable, Container, Deque, Dict, List, Optional, Tuple
+
+REPLAY_ENABLED = os.getenv("REPLAY_ENABLED", "true").lower() in ("1", "true", "yes")
+# Eventos guardados como máximo por dispositivo
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "50"))
+# Segundos que un evento sigue disponible para reenviarse
+REPLAY_TTL = float(os.getenv("REPLAY_TTL", "300"))
+
+
+class _Stream:
+    __slots__ = ("seq", "buffer", "evicted", "last_used")
+
+    def __init__(self, now: float):
+        self.seq = 0
+        # (seq, evento, datos, hora de envío)
+        self.buffer: Deque[Tuple[int, str, dict, float]] = deque()
+        # Mayor seq que ya no se puede reenviar
+        self.evicted = 0
+        # Hora del último envío
+        self.last_used = now
+
+
+class ReplayLog:
+    """Secuencias y búfer de reenvío de los dispositivos de este proceso."""
+
+    def __init__(
+        self,
+        size: int = REPLAY_BUFFER_SIZE,
+        ttl: float = REPLAY_TTL,
+        enabled: bool = REPLAY_ENABLED,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.size = size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.clock = clock
+        # Identifica este proceso: los seq de otro epoch no se comparan
+        self.epoch = uuid.uuid4().hex[:12]
+        self._streams: Dict[str, _Stream] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        # Dispositivos conectados, cuyos contadores no se olvidan
+        self._connected: Container[str] = ()
+        self.replayed = 0
+        self.resyncs = 0
+
+    def stamp(self, device_id: str, event: str, data, buffered: bool = True):
+        """
+        Devuelve una copia de ``data`` con el siguiente ``seq`` del
+        dispositivo y, si ``buffered``, la guarda para reenviarla.
+        """
+        if not self.enabled or not isinstance(data, dict):
+            return data
+        stream = self._streams.get(device_id)
+        if stream is None:
+            stream = self._streams[device_id] = _Stream(self.clock())
+        stream.seq += 1
+        stream.last_used = self.clock()
+        data = {**data, "seq": stream.seq}
+        if buffered:
+            self._expire(stream)
+            stream.buffer.append((stream.seq, event, data, self.clock()))
+            if len(stream.buffer) > self.size:
+                stream.evicted = stream.buffer.popleft()[0]
+        return data
+
+    def _expire(self, stream: _Stream) -> None:
+        limit = self.clock() - self.ttl
+        while stream.buffer and stream.buffer[0][3] < limit:
+            stream.evicted = stream.buffer.popleft()[0]
+
+    def last_seq(self, device_id: str) -> int:
+        stream = self._streams.get(device_id)
+        return stream.seq if stream is not None else 0
+
+    def missed(
+        self, device_id: str, last_seq: int, epoch: Optional[str]
+    ) -> Tuple[List[Tuple[str, dict]], bool]:
+        """
+        Eventos guardados posteriores a ``last_seq`` y si con ellos el
+        dispositivo queda al día (False: debe resincronizar).
+        """
+        stream = self._streams.get(device_id)
+        seq = stream.seq if stream is not None else 0
+        if epoch != self.epoch or last_seq > seq:
+            self.resyncs += 1
+            return [], False
+        if stream is None:
+            return [], True
+        self._expire(stream)
+        events = [(event, data) for s, event, data, _ in stream.buffer if s > last_seq]
+        complete = last_seq >= stream.evicted
+        self.replayed += len(events)
+        if not complete:
+            self.resyncs += 1
+        return events, complete
+
+    def purge(self, connected: Optional[Container[str]] = None) -> int:
+        """
+        Vacía lo vencido y olvida los dispositivos sin envíos en ``ttl``
+        segundos que no están en ``connected``; devuelve cuántos olvidó.
+        """
+        connected = self._connected if connected is None else connected
+        limit = self.clock() - self.ttl
+        idle = []
+        for device_id, stream in self._streams.items():
+            self._expire(stream)
+            if (
+                not stream.buffer
+                and stream.last_used < limit
+                and device_id not in connected
+            ):
+                idle.append(device_id)
+        for device_id in idle:
+            del self._streams[device_id]
+        return len(idle)
+
+    def start(self, connected: Container[str] = ()) -> None:
+        """Arranca la limpieza; ``connected`` son los dispositivos de este proceso."""
+        self._connected = connected
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.ttl / 2))
+            self.purge()
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "epoch": self.epoch,
+            "devices": len(self._streams),
+            "buffered": sum(len(stream.buffer) for stream in self._streams.values()),
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+        }
+
+
+log = ReplayLog()
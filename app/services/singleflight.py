@@ -0,0 +1,113 @@
+"""
+Coalescencia de lecturas concurrentes idénticas hacia la DB-API (singleflight).
+
+Cuando varias corrutinas piden a la vez el mismo recurso (misma función y
+mismos argumentos, es decir, misma URL y parámetros), solo la primera hace la
+llamada upstream; el resto espera ese mismo resultado ya parseado. Solo se
+comparten llamadas en vuelo: en cuanto termina, la siguiente vuelve a salir.
+
+El resultado es el mismo objeto para todos los que esperan, por lo que los
+llamadores no deben mutarlo.
+"""
+
+import asyncio
+import functools
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Protocol, TypeVar, cast
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+T = TypeVar("T")
+T_co = TypeVar("T_co", covariant=True)
+
+# Llamadas en vuelo por clave
+_inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+# Contadores por función: llamadas, ejecuciones reales, fusionadas y en vuelo
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _freeze(value: Any) -> Hashable:
+    """Convierte argumentos (dicts, listas) en una clave hashable estable."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def _forget(name: str, key: Hashable, task: "asyncio.Task[Any]") -> None:
+    _stats[name]["in_flight"] -= 1
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Evita el aviso "exception was never retrieved" si todos cancelaron
+    if not task.cancelled():
+        task.exception()
+
+
+async def run(name: str, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+    """Ejecuta ``call`` o se une a la ejecución en vuelo con la misma clave."""
+    stats = _stats.setdefault(
+        name, {"calls": 0, "executions": 0, "merged": 0, "in_flight": 0}
+    )
+    stats["calls"] += 1
+
+    task = _inflight.get(key)
+    if task is None:
+        stats["executions"] += 1
+        stats["in_flight"] += 1
+        task = asyncio.ensure_future(call())
+        _inflight[key] = task
+        task.add_done_callback(functools.partial(_forget, name, key))
+    else:
+        stats["merged"] += 1
+
+    # shield: cancelar a un llamador no cancela la llamada compartida
+    return await asyncio.shield(task)
+
+
+class Coalesced(Protocol[T_co]):
+    """Función decorada con ``coalesce``: se llama igual y expone ``forget``."""
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Awaitable[T_co]:
+        """Llama (o se une) a la lectura en vuelo con esos argumentos."""
+
+    def forget(self, *args: Any, **kwargs: Any) -> None:
+        """Descarta la lectura en vuelo con esos argumentos."""
+
+
+def coalesce(func: Callable[..., Awaitable[T]]) -> "Coalesced[T]":
+    """Decorador para funciones de lectura (GET) de los servicios."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        if not SINGLEFLIGHT_ENABLED:
+            return await func(*args, **kwargs)
+        key = (name, _freeze(args), _freeze(kwargs))
+        return await run(name, key, lambda: func(*args, **kwargs))
+
+    def forget(*args: Any, **kwargs: Any) -> None:
+        """Tras una escritura, la próxima lectura no se une a una ya en vuelo."""
+        _inflight.pop((name, _freeze(args), _freeze(kwargs)), None)
+
+    wrapper.forget = forget  # type: ignore[attr-defined]
+    return cast("Coalesced[T]", wrapper)
+
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    """Contadores de coalescencia por función, para diagnóstico."""
+    return {name: dict(counters) for name, counters in _stats.items()}
+
+
+def reset_stats() -> None:
+    _stats.clear()
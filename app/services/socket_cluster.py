@@ -0,0 +1,78 @@
+"""
+Client manager de Socket.IO para repartir el gateway en varios procesos.
+
+Con ``SOCKETIO_MANAGER_URL`` los emits (a salas, a SIDs y los acks de
+``sio.call``) se publican en un bus compartido y cada worker entrega los que
+corresponden a sus conexiones:
+
+- ``redis://`` / ``rediss://``: ``socketio.AsyncRedisManager`` (paquete ``redis``).
+- ``amqp://``: ``socketio.AsyncAioPikaManager`` (paquete ``aio_pika``).
+- ``memory://<canal>``: bus en memoria del proceso, para tests que simulan
+  varios servidores en un mismo proceso.
+- vacío: manager por defecto, un solo proceso.
+"""
+
+import asyncio
+import os
+import pickle
+from typing import Dict, List, Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SOCKETIO_MANAGER_URL = os.getenv("SOCKETIO_MANAGER_URL", "")
+# Canal del bus compartido (separa entornos que usen el mismo Redis/AMQP)
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "smartpay-socketio")
+
+
+class InProcessPubSubManager(AsyncPubSubManager):
+    """Bus pub/sub en memoria compartido por los managers del mismo canal."""
+
+    name = "inprocess"
+    _subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def __init__(
+        self, channel: str = SOCKETIO_CHANNEL, write_only: bool = False, logger=None
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def _publish(self, data):
+        # Copia serializada, como viajaría por un bus real
+        message = pickle.dumps(data)
+        for queue in self._subscribers.get(self.channel, []):
+            queue.put_nowait(message)
+
+    async def _listen(self):
+        self._queue = asyncio.Queue()
+        self._subscribers.setdefault(self.channel, []).append(self._queue)
+        try:
+            while True:
+                yield await self._queue.get()
+        finally:
+            self._subscribers[self.channel].remove(self._queue)
+
+
+def create_client_manager(
+    url: str = SOCKETIO_MANAGER_URL,
+) -> Optional[socketio.AsyncManager]:
+    """Client manager para ``url`` (None = manager por defecto de un proceso)."""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://")):
+        manager = socketio.AsyncRedisManager(url, channel=SOCKETIO_CHANNEL)
+    elif url.startswith("amqp://"):
+        manager = socketio.AsyncAioPikaManager(url, channel=SOCKETIO_CHANNEL)
+    elif url.startswith("memory://"):
+        channel = url.removeprefix("memory://")
+        manager = InProcessPubSubManager(channel=channel or SOCKETIO_CHANNEL)
+    else:
+        raise ValueError(f"SOCKETIO_MANAGER_URL no soportada: {url}")
+    logger.info(
+        f"Socket.IO con client manager '{manager.name}' (canal {manager.channel})"
+    )
+    return manager
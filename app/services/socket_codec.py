@@ -0,0 +1,142 @@
+"""
+Serialización de los paquetes Socket.IO negociada por cliente.
+
+Por defecto los paquetes van en JSON. Un cliente puede pedir MessagePack al
+conectar con ``?serializer=msgpack`` en la URL: a partir de ahí el servidor
+le envía mensajes binarios MessagePack y acepta los suyos en ese formato.
+Las versiones antiguas de la app, que no lo piden, siguen con JSON.
+
+Los emits a una sala se codifican una vez por formato, no una por
+destinatario. La compresión permessage-deflate de WebSocket la negocia el
+servidor ASGI (uvicorn la ofrece por defecto); para long-polling se usa la
+compresión HTTP de Engine.IO a partir de ``SOCKETIO_COMPRESSION_THRESHOLD``
+bytes.
+"""
+
+import os
+import weakref
+from typing import Set
+from urllib.parse import parse_qs
+
+import socketio
+from socketio import packet
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Permite que los clientes pidan MessagePack (requiere el paquete msgpack)
+SOCKETIO_MSGPACK_ENABLED = os.getenv("SOCKETIO_MSGPACK_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Bytes a partir de los que se comprimen las respuestas de long-polling
+SOCKETIO_COMPRESSION_THRESHOLD = int(
+    os.getenv("SOCKETIO_COMPRESSION_THRESHOLD", "1024")
+)
+
+MSGPACK = "msgpack"
+
+try:
+    from socketio.msgpack_packet import MsgPackPacket
+except ImportError:  # pragma: no cover - dependencia opcional
+    MsgPackPacket = None
+
+# Los paquetes MessagePack llevan los bytes tal cual, sin adjuntos aparte
+_PLAIN_TYPES = {packet.BINARY_EVENT: packet.EVENT, packet.BINARY_ACK: packet.ACK}
+
+
+def _to_msgpack(pkt: packet.Packet) -> bytes:
+    return MsgPackPacket(
+        packet_type=_PLAIN_TYPES.get(pkt.packet_type, pkt.packet_type),
+        data=pkt.data,
+        namespace=pkt.namespace,
+        id=pkt.id,
+    ).encode()
+
+
+# Métodos privados de ``socketio.AsyncServer`` que se sobrescriben o llaman,
+# con sus parámetros en python-socketio 5.11.2 (la versión fijada en
+# requirements.txt). Al actualizarla hay que revisarlos: los tests comprueban
+# que siguen existiendo con la misma firma.
+PRIVATE_SERVER_API = {
+    "_handle_eio_connect": ("eio_sid", "environ"),
+    "_handle_eio_disconnect": ("eio_sid",),
+    "_handle_eio_message": ("eio_sid", "data"),
+    "_send_packet": ("eio_sid", "pkt"),
+    "_send_eio_packet": ("eio_sid", "eio_pkt"),
+    "_handle_connect": ("eio_sid", "namespace", "data"),
+    "_handle_disconnect": ("eio_sid", "namespace"),
+    "_handle_event": ("eio_sid", "namespace", "id", "data"),
+    "_handle_ack": ("eio_sid", "namespace", "id", "data"),
+}
+
+
+class NegotiatingAsyncServer(socketio.AsyncServer):
+    """``AsyncServer`` que habla MessagePack con los clientes que lo piden."""
+
+    def __init__(
+        self, *args, msgpack_enabled: bool = SOCKETIO_MSGPACK_ENABLED, **kwargs
+    ):
+        kwargs.setdefault("http_compression", True)
+        kwargs.setdefault("compression_threshold", SOCKETIO_COMPRESSION_THRESHOLD)
+        super().__init__(*args, **kwargs)
+        if msgpack_enabled and MsgPackPacket is None:
+            logger.warning(
+                "SOCKETIO_MSGPACK_ENABLED sin el paquete 'msgpack': solo JSON"
+            )
+            msgpack_enabled = False
+        self.msgpack_enabled = msgpack_enabled
+        # Conexiones Engine.IO que usan MessagePack
+        self.msgpack_sids: Set[str] = set()
+        # Paquete Engine.IO ya codificado en JSON -> su versión MessagePack
+        self._msgpack_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def serializer_of(self, eio_sid: str) -> str:
+        return MSGPACK if eio_sid in self.msgpack_sids else "json"
+
+    async def _handle_eio_connect(self, eio_sid, environ):
+        if self.msgpack_enabled:
+            query = parse_qs(environ.get("QUERY_STRING", ""))
+            if query.get("serializer", [""])[0] == MSGPACK:
+                self.msgpack_sids.add(eio_sid)
+        return await super()._handle_eio_connect(eio_sid, environ)
+
+    async def _handle_eio_disconnect(self, eio_sid):
+        try:
+            return await super()._handle_eio_disconnect(eio_sid)
+        finally:
+            self.msgpack_sids.discard(eio_sid)
+
+    async def _send_packet(self, eio_sid, pkt):
+        if eio_sid in self.msgpack_sids:
+            await self.eio.send(eio_sid, _to_msgpack(pkt))
+        else:
+            await super()._send_packet(eio_sid, pkt)
+
+    async def _send_eio_packet(self, eio_sid, eio_pkt):
+        # Emits a salas: el manager codifica en JSON una vez para todos
+        if eio_sid in self.msgpack_sids and isinstance(eio_pkt.data, str):
+            encoded = self._msgpack_cache.get(eio_pkt)
+            if encoded is None:
+                encoded = _to_msgpack(self.packet_class(encoded_packet=eio_pkt.data))
+                self._msgpack_cache[eio_pkt] = encoded
+            await self.eio.send(eio_sid, encoded)
+        else:
+            await super()._send_eio_packet(eio_sid, eio_pkt)
+
+    async def _handle_eio_message(self, eio_sid, data):
+        if eio_sid not in self.msgpack_sids or not isinstance(data, bytes):
+            return await super()._handle_eio_message(eio_sid, data)
+        pkt = MsgPackPacket(encoded_packet=data)
+        if pkt.packet_type == packet.CONNECT:
+            await self._handle_connect(eio_sid, pkt.namespace, pkt.data)
+        elif pkt.packet_type == packet.DISCONNECT:
+            await self._handle_disconnect(eio_sid, pkt.namespace)
+        elif pkt.packet_type == packet.EVENT:
+            await self._handle_event(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        elif pkt.packet_type == packet.ACK:
+            await self._handle_ack(eio_sid, pkt.namespace, pkt.id, pkt.data)
+        else:
+            raise ValueError("Unexpected MessagePack packet type.")
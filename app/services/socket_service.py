@@ -1,63 +1,187 @@
+import asyncio
+import functools
+import os
+import signal
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Optional, Set
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
 from uuid import UUID
 
 import socketio
 from fastapi.responses import JSONResponse
 
-from app.models.action import ActionCreate, ActionState, ActionUpdate
+from app.models.action import ActionCreate, ActionState, ActionType, ActionUpdate
 from app.services import action as action_service
+from app.services import (
+    action_log,
+    delivery_metrics,
+    device_presence,
+    offline_queue,
+    outbound,
+    replay,
+    storm_control,
+)
+from app.services.connection_registry import ConnectionRegistry
+from app.services.presence import PresenceRegistry, create_presence
+from app.services.socket_cluster import create_client_manager
+from app.services.socket_codec import NegotiatingAsyncServer
+
+# Entrega de comandos con confirmación (ack) a todos los dispositivos. La
+# app actual no confirma: por defecto solo esperan ack los clientes que lo
+# anuncian al identificarse (``acks: true``)
+COMMAND_ACK_ENABLED = os.getenv("COMMAND_ACK_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Segundos que se espera el ack de cada intento
+COMMAND_ACK_TIMEOUT = float(os.getenv("COMMAND_ACK_TIMEOUT", "5"))
+# Reintentos tras un timeout antes de devolver el comando a la cola
+COMMAND_ACK_RETRIES = int(os.getenv("COMMAND_ACK_RETRIES", "2"))
+# Acciones masivas: dispositivos por lote y envíos simultáneos
+BULK_ACTION_BATCH_SIZE = int(os.getenv("BULK_ACTION_BATCH_SIZE", "500"))
+BULK_ACTION_CONCURRENCY = int(os.getenv("BULK_ACTION_CONCURRENCY", "200"))
 
 # 1. Crear una instancia del servidor Socket.IO
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+# (con SOCKETIO_MANAGER_URL los emits se reparten entre workers/nodos; los
+# clientes que conectan con ?serializer=msgpack usan MessagePack)
+sio = NegotiatingAsyncServer(
+    async_mode="asgi", cors_allowed_origins="*", client_manager=create_client_manager()
+)
+
+
+def store_room(store_id: str, plan_state: Optional[str] = None) -> str:
+    """Sala de los dispositivos de una tienda (o de los de un estado de plan en ella)."""
+    if plan_state:
+        return f"store:{store_id}:plan:{plan_state}"
+    return f"store:{store_id}"
+
+
+def _device_rooms(
+    device_id: str, store_id: Optional[str], plan_state: Optional[str]
+) -> List[str]:
+    rooms = [device_id]
+    if store_id:
+        rooms.append(store_room(store_id))
+        if plan_state:
+            rooms.append(store_room(store_id, plan_state))
+    return rooms
 
 
 class ConnectionManager:
     """
     Gestiona las conexiones de Socket.IO, asociando device_id con los SIDs.
     Utiliza las salas de Socket.IO para agrupar conexiones por device_id.
+
+    ``connections`` solo tiene las conexiones de este proceso. Con un
+    registro de presencia compartido (varios workers/nodos) es este el que
+    se consulta para saber si un dispositivo está conectado; sin él, este
+    proceso es todo el clúster.
     """
 
-    def __init__(self):
-        # Mapa de device_id -> set de SIDs (Session IDs) de Socket.IO
-        self.active_connections: Dict[str, Set[str]] = {}
+    def __init__(self, presence: Optional[PresenceRegistry] = None):
+        # Conexiones indexadas por SID, device_id y tienda
+        self.connections = ConnectionRegistry()
+        self.presence = presence if presence is not None else create_presence()
+        # SIDs de este proceso cuyo cliente confirma los comandos (ack)
+        self.ack_sids: Set[str] = set()
+
+    async def start(self):
+        if self.presence is not None:
+            await self.presence.start()
 
-    async def connect(self, sid: str, device_id: str):
+    async def stop(self):
+        if self.presence is not None:
+            await self.presence.stop()
+
+    async def connect(
+        self,
+        sid: str,
+        device_id: str,
+        store_id: Optional[str] = None,
+        plan_state: Optional[str] = None,
+        acks: bool = False,
+    ):
         """
-        Asocia un device_id con un SID y lo une a una sala con su nombre.
+        Asocia un device_id con un SID y lo une a una sala con su nombre y,
+        si los indica, a la sala de su tienda y a la de su estado de plan
+        en la tienda. ``acks`` indica que el cliente confirma los comandos.
         """
+        rooms = _device_rooms(device_id, store_id, plan_state)
+        previous = self.connections.get(sid)
+        if previous is not None:
+            # Se vuelve a identificar: se olvida la identidad anterior del SID
+            device_presence.tracker.disconnected(sid, previous.device_id)
+            if self.presence is not None:
+                await self.presence.remove(previous.device_id, sid)
+            for room in _device_rooms(
+                previous.device_id, previous.store_id, previous.plan_state
+            ):
+                if room not in rooms:
+                    await sio.leave_room(sid, room=room)
         # Almacena la asociación
-        self.active_connections.setdefault(device_id, set()).add(sid)
-        # Une el cliente a una sala con el nombre del device_id
-        await sio.enter_room(sid, room=device_id)
-        print(f"Device {device_id} (SID: {sid}) connected and joined room.")
+        self.connections.add(sid, device_id, store_id, plan_state if store_id else None)
+        if acks:
+            self.ack_sids.add(sid)
+        else:
+            self.ack_sids.discard(sid)
+        device_presence.tracker.connected(sid, device_id, store_id)
+        if self.presence is not None:
+            await self.presence.add(device_id, sid, rooms[1:])
+        # Une el cliente a sus salas
+        for room in rooms:
+            await sio.enter_room(sid, room=room)
+        print(f"Device {device_id} (SID: {sid}) connected and joined rooms {rooms}.")
 
     async def disconnect(self, sid: str):
         """
         Gestiona la desconexión de un cliente.
-        Encuentra el device_id asociado al SID y lo elimina de la gestión.
+        Busca el device_id asociado al SID y lo elimina de la gestión.
         """
-        device_to_remove = None
-        for device_id, sids in self.active_connections.items():
-            if sid in sids:
-                sids.discard(sid)
-                if not sids:  # Si no quedan más conexiones para este dispositivo
-                    device_to_remove = device_id
-                break
-
-        if device_to_remove:
-            self.active_connections.pop(device_to_remove)
-            print(f"Device {device_to_remove} fully disconnected.")
+        connection = self.connections.remove(sid)
+        self.ack_sids.discard(sid)
+        if connection is not None:
+            device_id = connection.device_id
+            device_presence.tracker.disconnected(sid, device_id)
+            # Si no quedan más conexiones para este dispositivo en ningún nodo
+            if self.presence is not None:
+                gone = await self.presence.remove(device_id, sid)
+            else:
+                gone = device_id not in self.connections
+            if gone:
+                print(f"Device {device_id} fully disconnected.")
 
         print(f"Client with SID {sid} disconnected.")
 
-    async def send_to_device(self, device_id: str, event: str, data: dict):
+    async def send_to_device(
+        self, device_id: str, event: str, data: dict, key: Optional[str] = None
+    ) -> Optional[bool]:
         """
-        Envía un evento con datos a un device_id específico usando su sala.
+        Envía un evento con datos a un device_id específico usando su sala,
+        a través de su cola de salida (``key``: clave de coalescencia). Si
+        este proceso lleva la secuencia del dispositivo (``owns_sequence``),
+        el evento lleva su ``seq`` y queda en el búfer de reenvío.
+
+        Devuelve True si se envió, o None si el dispositivo no está conectado
+        o la cola de salida lo descartó (llena, vencido o al apagar).
         """
-        if device_id in self.active_connections:
+        if self.owns_sequence(device_id):
+            # Se numera y guarda aunque esté desconectado: se reenvía al reconectar
+            data = replay.log.stamp(device_id, event, data)
+        if not await self.is_online(device_id):
+            return None
+
+        async def emit() -> bool:
             await sio.emit(event, data, room=device_id)
             print(f"Sent event '{event}' to device {device_id}")
+            return True
+
+        command = data.get("command") if event == "action" else None
+        return await outbound.scheduler.send(
+            device_id, emit, lane=outbound.lane_for(event, command), key=key
+        )
 
     async def broadcast(self, event: str, data: dict):
         """
@@ -66,112 +190,806 @@ class ConnectionManager:
         await sio.emit(event, data)
         print(f"Broadcasted event '{event}' to all clients.")
 
+    def owns_sequence(self, device_id: str) -> bool:
+        """
+        Si este proceso numera los envíos al dispositivo (``seq``): el que
+        tiene su socket o, sin registro de presencia compartido, el único
+        proceso. Los demás workers envían sin ``seq`` para no mezclar su
+        secuencia con la del dueño.
+        """
+        return self.presence is None or device_id in self.connections
+
+    async def is_online(self, device_id: str) -> bool:
+        """Si el dispositivo está conectado a este o a otro nodo."""
+        if device_id in self.connections:
+            return True
+        return self.presence is not None and await self.presence.is_online(device_id)
+
+    async def online_devices(self, device_ids: List[str]) -> Set[str]:
+        """Los dispositivos de ``device_ids`` conectados en cualquier nodo."""
+        local = {device_id for device_id in device_ids if device_id in self.connections}
+        remote = [device_id for device_id in device_ids if device_id not in local]
+        if self.presence is None or not remote:
+            return local
+        return local | await self.presence.online(remote)
+
+    async def device_sids(self, device_id: str) -> List[str]:
+        """SIDs del dispositivo en todo el clúster (primero los de este nodo)."""
+        local = self.connections.sids(device_id)
+        if self.presence is None:
+            return local
+        remote = [
+            sid for sid in await self.presence.sids(device_id) if sid not in local
+        ]
+        return local + remote
+
+    def confirming_sids(self, device_id: str) -> List[str]:
+        """SIDs del dispositivo en este proceso que confirman los comandos."""
+        return [sid for sid in self.connections.sids(device_id) if sid in self.ack_sids]
+
     def total_devices(self) -> int:
-        """Número de dispositivos únicos conectados."""
-        return len(self.active_connections)
+        """Número de dispositivos únicos conectados a este proceso."""
+        return len(self.connections)
+
+    async def count_devices(self) -> int:
+        """Número de dispositivos únicos conectados en todo el clúster."""
+        if self.presence is None:
+            return len(self.connections)
+        return await self.presence.count()
+
+    async def count_store_devices(
+        self, store_id: str, plan_state: Optional[str] = None
+    ) -> int:
+        """Dispositivos conectados en todo el clúster que están en la sala de la tienda."""
+        if self.presence is None:
+            return len(self.connections.store_devices(store_id, plan_state))
+        return await self.presence.group_count(store_room(store_id, plan_state))
+
+    async def send_to_store(
+        self, store_id: str, event: str, data: dict, plan_state: Optional[str] = None
+    ) -> int:
+        """
+        Envía un evento a todos los dispositivos de una tienda con un solo
+        emit a su sala (el reparto lo hace el servidor, también entre nodos).
+        Devuelve a cuántos dispositivos llega.
+        """
+        recipients = await self.count_store_devices(store_id, plan_state)
+        if recipients:
+            await sio.emit(event, data, room=store_room(store_id, plan_state))
+            print(
+                f"Evento '{event}' enviado a {recipients} dispositivo(s) de la tienda {store_id}"
+            )
+        return recipients
 
 
 # Crear una instancia global del manager
 manager = ConnectionManager()
+# Las sesiones sin heartbeat se cierran como una desconexión normal
+device_presence.tracker.on_expire = sio.disconnect
 
 
 # --- Application-Level Service Functions ---
 
+# Dispositivos cuya cola offline se está vaciando ahora mismo
+_flushing: Set[str] = set()
+# Tareas lanzadas en segundo plano (se guarda la referencia hasta que terminan)
+_background: Set["asyncio.Future"] = set()
 
-async def send_and_log_action(
-    device_id: UUID, command: str, applied_by_id: UUID, payload: Optional[dict] = None
-) -> JSONResponse:
 
-    if hasattr(command, "value"):
-        command = command.value
-    command = str(command)
+def _spawn(coro) -> None:
+    """Lanza ``coro`` en segundo plano guardando su referencia y su error."""
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+    task.add_done_callback(_background_done)
+
+
+def _background_done(task: "asyncio.Future") -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error en una tarea en segundo plano: {task.exception()}")
+
+
+async def mark_actions(updates: List[Tuple[Optional[str], ActionState, str]]) -> None:
+    """Actualiza a la vez el estado de varias acciones en la DB-API."""
+    updates = [update for update in updates if update[0]]
+    if not updates:
+        return
+    results = await asyncio.gather(
+        *(
+            action_service.update_action(
+                UUID(action_id), ActionUpdate(state=state, description=description)
+            )
+            for action_id, state, description in updates
+        ),
+        return_exceptions=True,
+    )
+    for (action_id, state, _), result in zip(updates, results):
+        if isinstance(result, Exception):
+            print(
+                f"ERROR: No se pudo pasar la acción {action_id} a '{state.value}'. Motivo: {result}"
+            )
+
+
+async def deliver_command(device_id: str, action_msg: dict) -> Optional[float]:
     """
-    Logs an action and sends it to a device if connected.
-    - If the device is connected, sends the command and returns a 200 OK response.
-    - If the device is offline, queues the action and returns a 202 Accepted response.
+    Envía un comando al dispositivo y espera su confirmación (ack).
+
+    El comando pasa por la cola de salida del dispositivo (carril según el
+    comando; un ``locate``/``refresh`` que ya espera no se repite) y
+    devuelve None si se descarta allí. Cada intento espera
+    ``COMMAND_ACK_TIMEOUT`` segundos y se reintenta hasta
+    ``COMMAND_ACK_RETRIES`` veces (rotando entre las conexiones del
+    dispositivo, también las de otros nodos: el client manager lleva el
+    envío y el ack). Devuelve la latencia en ms desde el primer envío hasta el
+    ack, o None si no se confirmó.
+
+    Con ``COMMAND_ACK_ENABLED`` desactivado solo se espera el ack de las
+    conexiones que anunciaron ``acks``; a un dispositivo sin ellas se le
+    envía una sola vez sin esperar (latencia 0), o None si la cola de
+    salida lo descartó.
     """
-    created_action = None
-    # 1. Create the action record.
+    command = action_msg["command"]
+    key = outbound.coalesce_key(command, action_msg.get("payload"))
+    if not COMMAND_ACK_ENABLED and not manager.confirming_sids(device_id):
+        sent = await manager.send_to_device(device_id, "action", action_msg, key=key)
+        return None if sent is None else 0.0
+
+    # Los reintentos repiten el seq: el dispositivo puede descartar duplicados
+    if manager.owns_sequence(device_id):
+        action_msg = replay.log.stamp(device_id, "action", action_msg, buffered=False)
+    return await outbound.scheduler.send(
+        device_id,
+        lambda: _call_with_ack(device_id, action_msg),
+        lane=outbound.lane_for("action", command),
+        key=key,
+    )
+
+
+async def _call_with_ack(device_id: str, action_msg: dict) -> Optional[float]:
+    command = action_msg["command"]
+    start = time.perf_counter()
+    for attempt in range(COMMAND_ACK_RETRIES + 1):
+        if COMMAND_ACK_ENABLED:
+            sids = await manager.device_sids(device_id)
+        else:
+            sids = manager.confirming_sids(device_id)
+        if not sids:
+            break
+        sid = sids[attempt % len(sids)]
+        try:
+            await sio.call("action", action_msg, to=sid, timeout=COMMAND_ACK_TIMEOUT)
+        except socketio.exceptions.TimeoutError:
+            delivery_metrics.record_timeout(
+                command, retrying=attempt < COMMAND_ACK_RETRIES
+            )
+            print(
+                f"Sin ack de '{command}' del dispositivo {device_id} (intento {attempt + 1})"
+            )
+            continue
+        except socketio.exceptions.SocketIOError as e:
+            # El SID se desconectó entre la consulta y el envío
+            print(f"No se pudo entregar '{command}' al dispositivo {device_id}: {e}")
+            continue
+        latency_ms = (time.perf_counter() - start) * 1000
+        delivery_metrics.record_ack(command, latency_ms)
+        return latency_ms
+
+    delivery_metrics.record_failure(command)
+    return None
+
+
+async def _enqueue(
+    device_id: str,
+    command: str,
+    payload: Optional[dict],
+    action_id: Optional[str],
+    timestamp: str,
+) -> bool:
+    """Guarda el comando en la cola offline; False si la cola está desactivada."""
+    queue = offline_queue.get_queue()
+    if queue is None:
+        return False
+    dropped = await asyncio.to_thread(
+        queue.push, device_id, command, payload, action_id, timestamp
+    )
+    await mark_actions(
+        [(action_id, ActionState.FAILED, reason) for action_id, reason in dropped]
+    )
+    return True
+
+
+async def flush_offline_queue(device_id: str) -> int:
+    """
+    Envía en orden los comandos encolados mientras el dispositivo estaba
+    desconectado (o que no confirmó) y marca como aplicados los confirmados;
+    los caducados se marcan como fallidos. Si un comando no se confirma, él
+    y los siguientes quedan en la cola. Devuelve cuántos se entregaron.
+    """
+    queue = offline_queue.get_queue()
+    if queue is None or device_id in _flushing:
+        return 0
+
+    _flushing.add(device_id)
+    delivered = 0
+    try:
+        # Repite hasta vaciar: pueden llegar comandos nuevos mientras se envía
+        while await manager.is_online(device_id):
+            due, expired = await asyncio.to_thread(queue.pending, device_id)
+            if not due and not expired:
+                break
+            acked = []
+            try:
+                for item in due:
+                    action_msg = {
+                        "command": item.command,
+                        "device_id": device_id,
+                        "payload": item.payload,
+                        "timestamp": item.queued_at,
+                    }
+                    if await deliver_command(device_id, action_msg) is None:
+                        break
+                    acked.append(item)
+                await asyncio.to_thread(queue.ack, [item.id for item in acked])
+            finally:
+                # Los no entregados vuelven a poder colapsarse con los nuevos
+                await asyncio.to_thread(queue.release, [item.id for item in due])
+            delivered += len(acked)
+            await mark_actions(
+                [
+                    (
+                        item.action_id,
+                        ActionState.APPLIED,
+                        f"Action '{item.command}' applied to device {device_id} after reconnecting.",
+                    )
+                    for item in acked
+                ]
+                + [
+                    (
+                        item.action_id,
+                        ActionState.FAILED,
+                        f"Action '{item.command}' expired before device {device_id} reconnected.",
+                    )
+                    for item in expired
+                ]
+            )
+            if len(acked) < len(due):
+                break
+    finally:
+        _flushing.discard(device_id)
+    if delivered:
+        print(f"Entregada(s) {delivered} acción(es) en cola al dispositivo {device_id}")
+    return delivered
+
+
+_OFFLINE_RESPONSE = {
+    "status": "Pending",
+    "detail": "Device is offline. Action has been queued for later execution.",
+}
+
+
+def action_message(
+    device_id: str, command: str, payload: Optional[dict], timestamp: str
+) -> dict:
+    """Evento ``action`` que recibe el dispositivo para ``command``."""
+    return {
+        "command": command,
+        "device_id": device_id,
+        "payload": payload or {},
+        "timestamp": timestamp,
+    }
+
+
+def _sent_response(
+    device_id: str, command: str, timestamp: str, latency_ms: float
+) -> dict:
+    return {
+        "status": "sent",
+        "detail": "Action sent to online device successfully.",
+        "command": command,
+        "device_id": device_id,
+        "timestamp": timestamp,
+        "latency_ms": round(latency_ms, 1),
+    }
+
+
+async def requeue_unacked(
+    device_id: str,
+    command: str,
+    payload: Optional[dict],
+    action_id: Optional[str],
+    timestamp: str,
+) -> Tuple[int, dict, Tuple[Optional[str], ActionState, str]]:
+    """Devuelve a la cola un comando que el dispositivo no confirmó."""
+    queued = await _enqueue(device_id, command, payload, action_id, timestamp)
+    update = (
+        action_id,
+        ActionState.PENDING if queued else ActionState.FAILED,
+        f"Action '{command}' was not acknowledged by device {device_id}"
+        + ("; queued for retry." if queued else "."),
+    )
+    response_data = {
+        "status": "Pending" if queued else "failed",
+        "detail": "Device did not acknowledge the action."
+        + (" Action has been queued for retry." if queued else ""),
+        "command": command,
+        "device_id": device_id,
+        "timestamp": timestamp,
+    }
+    return (202 if queued else 504), response_data, update
+
+
+async def _dispatch(
+    device_id: str,
+    command: str,
+    payload: Optional[dict],
+    action_id: Optional[str],
+    timestamp: str,
+) -> Tuple[int, dict, Optional[Tuple[Optional[str], ActionState, str]]]:
+    """
+    Entrega un comando ya registrado (o lo encola si el dispositivo no está).
+
+    Devuelve ``(status_code, respuesta, actualización de la acción)``; la
+    actualización la aplica el llamador para poder agruparlas.
+    """
+    # Check connection and attempt to send the command.
+    if not await manager.is_online(device_id):
+        if await _enqueue(device_id, command, payload, action_id, timestamp):
+            # El dispositivo pudo conectarse mientras se encolaba
+            if await manager.is_online(device_id):
+                await flush_offline_queue(device_id)
+        response_data = {
+            "command": command,
+            "device_id": device_id,
+            "timestamp": timestamp,
+        }
+        response_data.update(_OFFLINE_RESPONSE)
+        return 202, response_data, None
+
+    # Device is online: send the command and wait for its acknowledgement.
+    latency_ms = await deliver_command(
+        device_id, action_message(device_id, command, payload, timestamp)
+    )
+    if latency_ms is None:
+        # Sin confirmación: vuelve a la cola para reenviarse al reconectar
+        return await requeue_unacked(device_id, command, payload, action_id, timestamp)
+
+    update = (
+        action_id,
+        ActionState.APPLIED,
+        f"Action '{command}' applied to online device {device_id}.",
+    )
+    return 200, _sent_response(device_id, command, timestamp, latency_ms), update
+
+
+def _command_value(command) -> str:
+    if hasattr(command, "value"):
+        command = command.value
+    return str(command)
+
+
+async def create_action_record(
+    device_id: UUID, command: str, applied_by_id: UUID
+) -> Optional[str]:
+    """Registra la acción como pendiente en la DB-API y devuelve su ID."""
     try:
         # Mapear comandos específicos a tipos de acción genéricos para el registro en la BD.
         # El servicio de BD puede tener un conjunto de acciones más limitado que el gateway.
 
-        action_log = ActionCreate(
+        action_log_entry = ActionCreate(
             device_id=device_id,
             applied_by_id=applied_by_id,
             action=command,  # Usar el comando mapeado para el registro en la BD
             description=f"Action '{command}' initiated for device {device_id}.",  # Mantener el comando original en la descripción
         )
-        created_action = await action_service.create_action(action_log)
+        created_action = await action_service.create_action(action_log_entry)
     except Exception as e:
         # Handle potential errors during action creation (e.g., DB connection).
         print(f"ERROR: Could not create action for device '{device_id}'. Reason: {e}")
+        return None
+    return str(created_action.action_id) if created_action else None
 
-    timestamp = datetime.utcnow().isoformat() + "Z"
+
+async def send_and_log_action(
+    device_id: UUID, command: str, applied_by_id: UUID, payload: Optional[dict] = None
+) -> JSONResponse:
+    """
+    Logs an action and sends it to a device if connected.
+    - If the device is connected and acknowledges the command, returns a 200 OK response.
+      With write-behind logging the action is recorded as applied in the background,
+      so the response only waits for the device.
+    - If the device is offline or does not acknowledge it, queues the action
+      and returns a 202 Accepted response (504 if it cannot be queued).
+    """
+    command = _command_value(command)
     device_id_str = str(device_id)
+    timestamp = datetime.utcnow().isoformat() + "Z"
 
-    # 2. Check connection and attempt to send the command.
-    if device_id_str not in manager.active_connections:
-        response_data = {
-            "status": "Pending",
-            "detail": "Device is offline. Action has been queued for later execution.",
-            "command": command,
-            "device_id": device_id_str,
-            "timestamp": timestamp,
-        }
-        return JSONResponse(status_code=202, content=response_data)
+    update: Optional[Tuple[Optional[str], ActionState, str]]
+    if action_log.ACTION_LOG_WRITE_BEHIND and await manager.is_online(device_id_str):
+        latency_ms = await deliver_command(
+            device_id_str, action_message(device_id_str, command, payload, timestamp)
+        )
+        if latency_ms is not None:
+            action_log.writer.record(
+                ActionCreate(
+                    device_id=device_id,
+                    applied_by_id=applied_by_id,
+                    action=ActionType(command),
+                    state=ActionState.APPLIED,
+                    description=f"Action '{command}' applied to online device {device_id}.",
+                )
+            )
+            return JSONResponse(
+                status_code=200,
+                content=_sent_response(device_id_str, command, timestamp, latency_ms),
+            )
+        # Sin confirmación: se registra ya como pendiente para la cola offline
+        action_id = await create_action_record(device_id, command, applied_by_id)
+        status_code, response_data, update = await requeue_unacked(
+            device_id_str, command, payload, action_id, timestamp
+        )
+    else:
+        # 1. Create the action record.
+        action_id = await create_action_record(device_id, command, applied_by_id)
+        # 2. Deliver (or queue) the command and record the outcome.
+        status_code, response_data, update = await _dispatch(
+            device_id_str, command, payload, action_id, timestamp
+        )
 
-    # 3. Device is online: send the command and update the action to 'applied'.
-    action_msg = {
-        "command": command,
-        "device_id": device_id_str,
-        "payload": payload or {},
-        "timestamp": timestamp,
-    }
-    await manager.send_to_device(device_id_str, event="action", data=action_msg)
+    if update:
+        await mark_actions([update])
+    return JSONResponse(status_code=status_code, content=response_data)
 
-    if created_action:
-        try:
-            update_payload = ActionUpdate(
-                state=ActionState.APPLIED,
-                description=f"Action '{command}' applied to online device {device_id}.",
+
+async def send_bulk_action(
+    device_ids: List[UUID],
+    command: str,
+    applied_by_id: UUID,
+    payload: Optional[dict] = None,
+) -> AsyncIterator[dict]:
+    """
+    Envía el mismo comando a muchos dispositivos.
+
+    Procesa los IDs en lotes de ``BULK_ACTION_BATCH_SIZE``: registra las
+    acciones del lote en una llamada, entrega los comandos con como mucho
+    ``BULK_ACTION_CONCURRENCY`` envíos simultáneos y actualiza los estados
+    del lote juntos. Produce el resultado de cada dispositivo según termina
+    (con ``status_code`` y ``action_id``).
+    """
+    command = _command_value(command)
+    semaphore = asyncio.Semaphore(BULK_ACTION_CONCURRENCY)
+    # Dispositivos cuyo envío ya empezó (no se cancela si se corta la respuesta)
+    started: Set[str] = set()
+
+    async def dispatch_one(device_id: str, action_id: Optional[str], timestamp: str):
+        async with semaphore:
+            started.add(device_id)
+            try:
+                return await _dispatch(
+                    device_id, command, payload, action_id, timestamp
+                )
+            except Exception as e:
+                print(
+                    f"ERROR: No se pudo enviar '{command}' al dispositivo {device_id}. Motivo: {e}"
+                )
+                failed = {
+                    "command": command,
+                    "device_id": device_id,
+                    "timestamp": timestamp,
+                    "status": "failed",
+                    "detail": str(e),
+                }
+                return (
+                    500,
+                    failed,
+                    (action_id, ActionState.FAILED, f"Action '{command}' failed: {e}"),
+                )
+
+    for start in range(0, len(device_ids), BULK_ACTION_BATCH_SIZE):
+        end = start + BULK_ACTION_BATCH_SIZE
+        batch = device_ids[start:end]
+        created = await action_service.create_actions_bulk(
+            [
+                ActionCreate(
+                    device_id=device_id,
+                    applied_by_id=applied_by_id,
+                    action=ActionType(command),
+                    description=f"Action '{command}' initiated for device {device_id}.",
+                )
+                for device_id in batch
+            ]
+        )
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        action_ids = {
+            str(device_id): str(action.action_id) if action else None
+            for device_id, action in zip(batch, created)
+        }
+
+        # Los desconectados se encolan todos en una sola transacción
+        connected = await manager.online_devices(list(action_ids))
+        offline = [device_id for device_id in action_ids if device_id not in connected]
+        queue = offline_queue.get_queue()
+        if offline and queue is not None:
+            dropped = await asyncio.to_thread(
+                queue.push_many,
+                [
+                    (device_id, command, payload, action_ids[device_id], timestamp)
+                    for device_id in offline
+                ],
             )
-            await action_service.update_action(created_action.action_id, update_payload)
-        except Exception as e:
-            print(
-                f"ERROR: Could not update action {created_action.action_id} to 'applied'. Reason: {e}"
+            await mark_actions(
+                [
+                    (action_id, ActionState.FAILED, reason)
+                    for action_id, reason in dropped
+                ]
             )
+            for device_id in offline:
+                yield {
+                    "command": command,
+                    "device_id": device_id,
+                    "timestamp": timestamp,
+                    **_OFFLINE_RESPONSE,
+                    "status_code": 202,
+                    "action_id": action_ids[device_id],
+                }
+                # Se conectó mientras se encolaba
+                if device_id in manager.connections:
+                    _spawn(flush_offline_queue(device_id))
+            queued = set(offline)
+            online = [device_id for device_id in action_ids if device_id not in queued]
+        else:
+            online = list(action_ids)
+
+        updates = []
+        tasks = {
+            asyncio.ensure_future(
+                dispatch_one(device_id, action_ids[device_id], timestamp)
+            ): device_id
+            for device_id in online
+        }
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                status_code, response_data, update = await next_done
+                if update:
+                    updates.append(update)
+                yield {
+                    **response_data,
+                    "status_code": status_code,
+                    "action_id": action_ids[response_data["device_id"]],
+                }
+        finally:
+            # Si se corta la respuesta, los que no empezaron se cancelan y se
+            # marcan como fallidos; los que ya se están enviando terminan y
+            # su resultado se registra al acabar
+            sending = []
+            for task, device_id in tasks.items():
+                if task.done():
+                    continue
+                if device_id in started:
+                    sending.append(task)
+                    continue
+                task.cancel()
+                updates.append(
+                    (
+                        action_ids[device_id],
+                        ActionState.FAILED,
+                        f"Action '{command}' cancelled before being sent to device {device_id}.",
+                    )
+                )
+            if sending:
+                _spawn(_mark_when_done(sending))
+            await mark_actions(updates)
 
-    response_data = {
-        "status": "sent",
-        "detail": "Action sent to online device successfully.",
-        "command": command,
-        "device_id": device_id_str,
-        "timestamp": timestamp,
-    }
-    return JSONResponse(status_code=200, content=response_data)
+
+async def _mark_when_done(tasks: Iterable["asyncio.Future"]) -> None:
+    """Registra el resultado de los envíos masivos que seguían en curso."""
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    await mark_actions(
+        [result[2] for result in results if isinstance(result, tuple) and result[2]]
+    )
 
 
 # --- Event Handlers ---
 
 
 # Definir los manejadores de eventos de Socket.IO
+# Campos con los que el dispositivo se identifica y retoma su secuencia
+_HANDSHAKE_KEYS = ("deviceId", "storeId", "planState", "lastSeq", "epoch", "acks")
+
+
+def _handshake_data(environ: dict, auth) -> dict:
+    """
+    Campos de ``_HANDSHAKE_KEYS`` enviados al conectar, en el ``auth`` del
+    handshake o en la query string de la URL.
+    """
+    auth = auth if isinstance(auth, dict) else {}
+    query = parse_qs(environ.get("QUERY_STRING", ""))
+    data = {}
+    for key in _HANDSHAKE_KEYS:
+        value = auth.get(key)
+        if value is None:
+            value = query.get(key, [None])[0]
+        if value is not None:
+            data[key] = value
+    return data
+
+
+def _acks(data: dict) -> bool:
+    """Si el cliente anuncia que confirma los comandos (``acks``)."""
+    value = data.get("acks")
+    return value is True or str(value).lower() in ("1", "true", "yes")
+
+
+def _last_seq(data: dict) -> Optional[int]:
+    try:
+        return int(data["lastSeq"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def _welcome(sid: str, device_id: str, data: dict) -> None:
+    """
+    Confirma la identificación, reenvía lo perdido desde ``lastSeq`` (si el
+    dispositivo lo indica) y entrega lo encolado mientras estaba desconectado.
+    """
+    welcome_msg = {
+        "type": "connection_success",
+        "message": f"Device {device_id} connected successfully.",
+        "connected_devices": await manager.count_devices(),
+        "epoch": replay.log.epoch,
+        "last_seq": replay.log.last_seq(device_id),
+    }
+    missed: List[Tuple[str, dict]] = []
+    last_seq = _last_seq(data)
+    if last_seq is not None and replay.log.enabled:
+        missed, complete = replay.log.missed(device_id, last_seq, data.get("epoch"))
+        welcome_msg.update(replayed=len(missed), resync=not complete)
+    await sio.emit("message", welcome_msg, to=sid)
+    # Lo perdido va por la cola de salida del dispositivo, en orden
+    await asyncio.gather(
+        *(
+            _replay_event(sid, device_id, event, event_data)
+            for event, event_data in missed
+        )
+    )
+    # Durante el calentamiento los vaciados esperan turno; las uniones no
+    async with storm_control.admission.deferred():
+        await flush_offline_queue(device_id)
+
+
+async def _replay_event(sid: str, device_id: str, event: str, data: dict) -> None:
+    async def emit() -> bool:
+        await sio.emit(event, data, to=sid)
+        return True
+
+    command = data.get("command") if event == "action" else None
+    await outbound.scheduler.send(
+        device_id, emit, lane=outbound.lane_for(event, command)
+    )
+
+
+async def drain_connections(window: float = storm_control.SOCKETIO_DRAIN_WINDOW) -> int:
+    """
+    Cierra las conexiones de este proceso repartidas en ``window`` segundos
+    (al apagar). Antes de cerrar cada una le envía ``reconnect_hint`` con
+    los milisegundos que debe esperar para reconectar, repartidos también,
+    para que el nodo que arranca no reciba a todos a la vez. Devuelve
+    cuántas conexiones cerró.
+    """
+    admission = storm_control.admission
+    admission.draining = True
+    sids = [sid for sid, _ in sio.manager.get_participants("/", None)]
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for index, sid in enumerate(sids):
+        delay = start + window * index / len(sids) - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        hint = {"retry_after_ms": int(admission.drain_hint(window) * 1000)}
+        try:
+            await sio.emit("reconnect_hint", hint, to=sid)
+            await sio.disconnect(sid)
+        except Exception as e:
+            print(f"No se pudo drenar el SID {sid}: {e}")
+    if sids:
+        print(f"Drenada(s) {len(sids)} conexión(es) en {loop.time() - start:.1f}s")
+    return len(sids)
+
+
+# Drenaje lanzado por la señal de parada (se guarda la referencia a la tarea)
+_drain_task: Optional[asyncio.Task] = None
+
+
+def drain_on_signal(signals: Tuple[int, ...] = (signal.SIGTERM, signal.SIGINT)) -> bool:
+    """
+    Adelanta el drenaje a la señal de parada.
+
+    uvicorn cierra los websockets (código 1012) antes de ejecutar el apagado
+    del lifespan, así que drenar allí llega tarde. Se envuelve el manejador
+    que uvicorn instala para cada señal: la primera lanza
+    ``drain_connections`` y al terminar llama al manejador original, que
+    inicia el apagado; si llega otra durante el drenaje se llama de
+    inmediato. Debe llamarse en el arranque del lifespan, con los
+    manejadores de uvicorn ya instalados. Devuelve False si no se pudo
+    instalar (fuera del hilo principal).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return False
+    loop = asyncio.get_running_loop()
+    for sig in signals:
+        previous = signal.getsignal(sig)
+        if callable(previous):
+            signal.signal(sig, functools.partial(_on_stop_signal, loop, previous))
+    return True
+
+
+def _on_stop_signal(
+    loop: asyncio.AbstractEventLoop, previous: Callable, sig: int, frame
+) -> None:
+    admission = storm_control.admission
+    if admission.draining:
+        previous(sig, frame)
+        return
+    # Desde ya no se admiten sesiones nuevas
+    admission.draining = True
+
+    def start() -> None:
+        global _drain_task
+        _drain_task = loop.create_task(drain_connections())
+        _drain_task.add_done_callback(functools.partial(_drained, previous, sig))
+
+    loop.call_soon_threadsafe(start)
+
+
+def _drained(previous: Callable, sig: int, task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error drenando conexiones: {task.exception()}")
+    previous(sig, None)
+
+
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
     """
     Evento que se dispara cuando un cliente se conecta.
     'environ' contiene la información de la petición HTTP.
+
+    Si el cliente se identifica en el handshake (``auth`` o query con
+    ``deviceId`` y opcionalmente ``storeId``/``planState`` y
+    ``lastSeq``/``epoch``) se une ya a sus salas y recibe la bienvenida, lo
+    que perdió y sus comandos pendientes sin esperar a ``joinRoom``. Si no,
+    debe enviar ``joinRoom`` tras ``connection_ready``.
+
+    Si se supera el ritmo de admisión de sesiones (o el proceso se está
+    apagando) se rechaza con ``data.retry_after_ms`` en el ``connect_error``.
     """
+    retry_after = storm_control.admission.admit()
+    if retry_after is not None:
+        # Tormenta de reconexión: se rechaza antes de hacer ningún trabajo
+        raise socketio.exceptions.ConnectionRefusedError(
+            "Server busy, retry later", {"retry_after_ms": int(retry_after * 1000)}
+        )
     print(f"Client connected: {sid}")
-    # El cliente debe enviar un evento 'joinRoom' para identificarse.
-    await sio.emit("connection_ready", {"sid": sid}, to=sid)
+    data = _handshake_data(environ, auth)
+    device_id = data.get("deviceId")
+    if not device_id:
+        await sio.emit("connection_ready", {"sid": sid}, to=sid)
+        return
+
+    await manager.connect(
+        sid, device_id, data.get("storeId"), data.get("planState"), acks=_acks(data)
+    )
+    # Tras aceptar la conexión: la entrega espera los acks del cliente
+    sio.start_background_task(_welcome, sid, device_id, data)
 
 
 @sio.event
 async def joinRoom(sid, data):
     """
     Evento personalizado para que el cliente se una a una sala (se identifique).
-    El cliente debe enviar: {'deviceId': '...'}
+    El cliente debe enviar: {'deviceId': '...'} y opcionalmente 'storeId' y
+    'planState' (p. ej. 'overdue'), que lo unen a las salas de su tienda,
+    'lastSeq' y 'epoch' para recibir los eventos que perdió, y 'acks' si
+    confirma los comandos.
     """
     device_id = data.get("deviceId")
     if not device_id:
@@ -179,13 +997,27 @@ async def joinRoom(sid, data):
         await sio.emit("error", {"message": "'deviceId' is required"}, to=sid)
         return
 
-    await manager.connect(sid, device_id)
-    welcome_msg = {
-        "type": "connection_success",
-        "message": f"Device {device_id} connected successfully.",
-        "connected_devices": manager.total_devices(),
-    }
-    await sio.emit("message", welcome_msg, to=sid)
+    await manager.connect(
+        sid, device_id, data.get("storeId"), data.get("planState"), acks=_acks(data)
+    )
+    await _welcome(sid, device_id, data)
+
+
+@sio.event
+async def heartbeat(sid, data=None):
+    """
+    Señal de vida del dispositivo. Una vez enviada, si deja de llegar durante
+    ``PRESENCE_HEARTBEAT_TIMEOUT`` segundos la sesión se cierra.
+    Devuelve (ack) la hora del servidor.
+    """
+    device_id = manager.connections.device_of(sid)
+    if device_id is None:
+        await sio.emit(
+            "error", {"message": "joinRoom is required before heartbeat"}, to=sid
+        )
+        return None
+    device_presence.tracker.heartbeat(sid, device_id)
+    return {"server_time": datetime.utcnow().isoformat() + "Z"}
 
 
 @sio.event
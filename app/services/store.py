@@ -1,10 +1,12 @@
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
 import httpx
 
 from app.models.store import StoreCreate, StoreDB, StoreUpdate
+from app.services import dataloader, singleflight, upstream
+from app.services.circuit_breaker import CircuitOpenError
 from app.utils.logger import get_logger
 
 # Configurar el logger para este módulo
@@ -30,7 +32,7 @@ async def create_store(store_in: StoreCreate) -> StoreDB:
         HTTPException: Si ocurre un error en la comunicación con el servicio de DB
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.post(
                 f"{STORE_API_URL}/", json=store_in.model_dump(mode="json")
             )
@@ -42,36 +44,62 @@ async def create_store(store_in: StoreCreate) -> StoreDB:
         logger.error(f"Error al crear tienda: {e.response.text}", exc_info=True)
         # Re-lanzamos la excepción para que el endpoint pueda manejarla
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al crear tienda: {str(e)}", exc_info=True)
         raise
 
 
+@singleflight.coalesce
+async def _fetch_store(store_id: str) -> Optional[dict]:
+    async with upstream.client_session() as client:
+        response = await client.get(f"{STORE_API_URL}/{store_id}?expand=country,admin")
+    return response.json() if response.status_code == 200 else None
+
+
+async def _load_stores(store_ids: List[str]) -> Dict[str, Any]:
+    return await dataloader.fetch_by_ids(
+        f"{STORE_API_URL}/",
+        store_ids,
+        _fetch_store,
+        id_field="id",
+        params={"expand": "country,admin"},
+    )
+
+
+def _forget_store(store_id: UUID) -> None:
+    """Tras escribir una tienda, la siguiente lectura vuelve a la DB-API."""
+    _fetch_store.forget(str(store_id))
+    dataloader.forget(_load_stores, store_id)
+
+
 async def get_store(store_id: UUID):
     """
     Obtiene una tienda y transforma la respuesta al formato exacto requerido.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{STORE_API_URL}/{store_id}?expand=country,admin")
-            if response.status_code == 200:
-                store_data = response.json()
-                # Convertimos a StoreDB para validar y luego a dict para retornar
-                # Esto asegura que la estructura sea exactamente la que necesitamos
-                store = StoreDB.model_validate(store_data)
-                # Serializamos excluyendo la propiedad admin_id para evitar errores
-                result = store.model_dump(mode="json", exclude={"admin_id"})
-                # Agregamos manualmente el admin_id si existe
-                if store.admin:
-                    result["admin_id"] = str(store.admin.user_id)
-                return result
-            else:
-                return None
+        store_data = await dataloader.get_loader(_load_stores).load(store_id)
+        if store_data:
+            # Convertimos a StoreDB para validar y luego a dict para retornar
+            # Esto asegura que la estructura sea exactamente la que necesitamos
+            store = StoreDB.model_validate(store_data)
+            # Serializamos excluyendo la propiedad admin_id para evitar errores
+            result = store.model_dump(mode="json", exclude={"admin_id"})
+            # Agregamos manualmente el admin_id si existe
+            if store.admin:
+                result["admin_id"] = str(store.admin.user_id)
+            return result
+        else:
+            return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener tienda {store_id}: {str(e)}")
         return None
 
 
+@singleflight.coalesce
 async def get_stores(
     country_id: Optional[UUID] = None, plan: Optional[str] = None
 ) -> List[dict]:
@@ -85,7 +113,7 @@ async def get_stores(
         params["plan"] = plan
 
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.get(f"{STORE_API_URL}/", params=params)
             response.raise_for_status()
             
@@ -101,6 +129,8 @@ async def get_stores(
                     store_dict["admin_id"] = str(store.admin.user_id)
                 stores.append(store_dict)
             return stores
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener tiendas: {str(e)}")
         raise
@@ -118,11 +148,12 @@ async def update_store(store_id: UUID, store_in: StoreUpdate) -> Optional[dict]:
         dict: La tienda actualizada o None si no existe
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.patch(
                 f"{STORE_API_URL}/{store_id}",
                 json=store_in.model_dump(mode="json", exclude_unset=True),
             )
+            _forget_store(store_id)
             # Aceptar tanto 200 (con contenido) como 204 (sin contenido) como respuestas exitosas
             if response.status_code == 200:
                 store_data = response.json()
@@ -145,6 +176,8 @@ async def update_store(store_id: UUID, store_in: StoreUpdate) -> Optional[dict]:
             f"Error al actualizar tienda {store_id}: {e.response.text}", exc_info=True
         )
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al actualizar tienda {store_id}: {str(e)}", exc_info=True
@@ -163,14 +196,17 @@ async def delete_store(store_id: UUID) -> bool:
         bool: True si la tienda fue eliminada, False en caso contrario
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.delete(f"{STORE_API_URL}/{store_id}")
+            _forget_store(store_id)
             return response.status_code == 204
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Error al eliminar tienda {store_id}: {e.response.text}", exc_info=True
         )
         return False
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al eliminar tienda {store_id}: {str(e)}", exc_info=True
@@ -190,11 +226,12 @@ async def update_store_tokens(store_id: UUID, tokens: int) -> Optional[dict]:
         dict: La tienda actualizada o None si no existe
     """
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream.client_session() as client:
             response = await client.patch(
                 f"{STORE_API_URL}/{store_id}/tokens",
                 json={"tokens_disponibles": tokens},
             )
+            _forget_store(store_id)
             # Aceptar tanto 200 (con contenido) como 204 (sin contenido) como respuestas exitosas
             if response.status_code == 200:
                 store_data = response.json()
@@ -218,6 +255,8 @@ async def update_store_tokens(store_id: UUID, tokens: int) -> Optional[dict]:
             exc_info=True,
         )
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al actualizar tokens de tienda {store_id}: {str(e)}",
@@ -0,0 +1,165 @@
+"""
+Control de tormentas de reconexión de Socket.IO.
+
+Al reiniciar el contenedor todos los dispositivos reconectan a la vez. Para
+que el proceso no se caiga:
+
+- Admisión: las sesiones nuevas pasan por un token bucket
+  (``SOCKETIO_ADMISSION_RATE`` por segundo con ráfagas de
+  ``SOCKETIO_ADMISSION_BURST``). Las que no caben se rechazan en el
+  ``connect`` con ``retry_after_ms``.
+- Pistas de reintento: cada rechazo reserva un hueco futuro al ritmo de
+  admisión y la pista es la espera hasta ese hueco, con jitter, entre
+  ``SOCKETIO_RETRY_MIN`` y ``SOCKETIO_RETRY_MAX`` segundos. Así los
+  reintentos llegan repartidos en lugar de en otra ola.
+- Calentamiento: durante ``SOCKETIO_WARMUP_SECONDS`` tras arrancar, el
+  trabajo secundario de cada conexión (vaciar su cola offline) se limita a
+  ``SOCKETIO_WARMUP_CONCURRENCY`` a la vez; unirse a las salas y la
+  bienvenida no esperan.
+- Drenaje: al apagar se cierran las conexiones repartidas en
+  ``SOCKETIO_DRAIN_WINDOW`` segundos, cada una con una pista de reconexión
+  con jitter (evento ``reconnect_hint``), y no se admiten sesiones nuevas.
+  Empieza al recibir ``SIGTERM``/``SIGINT`` (``SOCKETIO_DRAIN_ON_SIGNAL``),
+  antes de que uvicorn cierre los websockets.
+"""
+
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+# Sesiones nuevas admitidas por segundo; 0 = sin límite
+SOCKETIO_ADMISSION_RATE = float(os.getenv("SOCKETIO_ADMISSION_RATE", "100"))
+# Sesiones que se admiten de golpe con el bucket lleno
+SOCKETIO_ADMISSION_BURST = int(os.getenv("SOCKETIO_ADMISSION_BURST", "200"))
+# Límites en segundos de la pista de reintento enviada al rechazar
+SOCKETIO_RETRY_MIN = float(os.getenv("SOCKETIO_RETRY_MIN", "1"))
+SOCKETIO_RETRY_MAX = float(os.getenv("SOCKETIO_RETRY_MAX", "60"))
+# Segundos de calentamiento tras arrancar y vaciados de cola simultáneos en ellos
+SOCKETIO_WARMUP_SECONDS = float(os.getenv("SOCKETIO_WARMUP_SECONDS", "30"))
+SOCKETIO_WARMUP_CONCURRENCY = int(os.getenv("SOCKETIO_WARMUP_CONCURRENCY", "20"))
+# Segundos en que se reparten las desconexiones al apagar (por debajo del
+# tiempo de gracia de ``docker stop``, 10 s por defecto)
+SOCKETIO_DRAIN_WINDOW = float(os.getenv("SOCKETIO_DRAIN_WINDOW", "8"))
+# Drenar al recibir la señal de parada, antes de que uvicorn cierre los
+# websockets (con código 1012) y ejecute el apagado del lifespan
+SOCKETIO_DRAIN_ON_SIGNAL = os.getenv("SOCKETIO_DRAIN_ON_SIGNAL", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Margen de jitter sobre la espera calculada (hasta +50 %)
+RETRY_JITTER = 0.5
+
+
+class TokenBucket:
+    """Token bucket: ``rate`` fichas por segundo hasta un máximo de ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "clock")
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.clock = clock
+        self.updated = clock()
+
+    def try_acquire(self) -> bool:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AdmissionControl:
+    """Admisión de sesiones, calentamiento y estado de drenaje de este proceso."""
+
+    def __init__(
+        self,
+        rate: float = SOCKETIO_ADMISSION_RATE,
+        burst: int = SOCKETIO_ADMISSION_BURST,
+        retry_min: float = SOCKETIO_RETRY_MIN,
+        retry_max: float = SOCKETIO_RETRY_MAX,
+        warmup: float = SOCKETIO_WARMUP_SECONDS,
+        warmup_concurrency: int = SOCKETIO_WARMUP_CONCURRENCY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.bucket = TokenBucket(rate, burst, clock) if rate > 0 else None
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.warmup = warmup
+        self.warmup_concurrency = warmup_concurrency
+        self.clock = clock
+        self.started_at = clock()
+        self.draining = False
+        self.admitted = 0
+        self.refused = 0
+        self._next_slot = 0.0
+        self._warmup_slots: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        """Empieza el calentamiento (al arrancar la aplicación)."""
+        self.started_at = self.clock()
+        self.draining = False
+        self._warmup_slots = None
+
+    def in_warmup(self) -> bool:
+        return self.clock() - self.started_at < self.warmup
+
+    def admit(self) -> Optional[float]:
+        """None si se admite la sesión; si no, segundos que debe esperar el cliente."""
+        if self.draining:
+            self.refused += 1
+            return self.drain_hint(self.retry_max)
+        if self.bucket is None or self.bucket.try_acquire():
+            self.admitted += 1
+            return None
+        self.refused += 1
+        return self.retry_hint()
+
+    def retry_hint(self) -> float:
+        """Espera hasta el siguiente hueco libre al ritmo de admisión, con jitter."""
+        now = self.clock()
+        self._next_slot = max(self._next_slot, now) + 1 / self.rate
+        wait = min(self.retry_max, max(self.retry_min, self._next_slot - now))
+        return random.uniform(wait, wait * (1 + RETRY_JITTER))
+
+    def drain_hint(self, window: float) -> float:
+        """Pista de reconexión al drenar: repartida uniformemente en ``window``."""
+        return random.uniform(self.retry_min, self.retry_min + window)
+
+    @asynccontextmanager
+    async def deferred(self) -> AsyncIterator[None]:
+        """
+        Trabajo secundario de una conexión nueva: durante el calentamiento
+        solo ``warmup_concurrency`` a la vez, para que las uniones no esperen.
+        """
+        if not self.in_warmup():
+            yield
+            return
+        if self._warmup_slots is None:
+            self._warmup_slots = asyncio.Semaphore(self.warmup_concurrency)
+        async with self._warmup_slots:
+            yield
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": self.rate,
+            "tokens": round(self.bucket.tokens, 1) if self.bucket is not None else None,
+            "admitted": self.admitted,
+            "refused": self.refused,
+            "warmup": self.in_warmup(),
+            "draining": self.draining,
+        }
+
+
+admission = AdmissionControl()
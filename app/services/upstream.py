@@ -0,0 +1,233 @@
+"""
+Cliente HTTP compartido para las llamadas al servicio smartpay-db-api.
+
+Todos los servicios reutilizan un único ``httpx.AsyncClient`` con pool de
+conexiones keep-alive, creado y cerrado por el lifespan de la aplicación
+(ver ``app.main``). Así cada petición del gateway deja de pagar un handshake
+TCP/TLS nuevo contra la DB-API.
+
+Opcionalmente (``UPSTREAM_HTTP2``) el transporte usa HTTP/2 para multiplexar
+muchas llamadas concurrentes sobre pocas conexiones, con un límite de streams
+por host y retorno a HTTP/1.1 si el servidor no soporta h2 (se vuelve a
+probar h2 pasados ``UPSTREAM_H2_RETRY_AFTER`` segundos).
+
+El transporte final va envuelto en un circuit breaker por familia de rutas
+(ver ``app.services.circuit_breaker``), de modo que una DB-API caída o lenta
+devuelve ``CircuitOpenError`` al instante en lugar de agotar el timeout.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Set, cast
+
+import httpx
+
+from app.services.circuit_breaker import (
+    UPSTREAM_BREAKER_ENABLED,
+    CircuitBreakerTransport,
+)
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Límites del pool de conexiones (configurables por variables de entorno)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+# Timeout por defecto (mismo valor que usaba httpx en cada cliente efímero)
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5.0"))
+# Reintentos de conexión a nivel de transporte (solo fallos al conectar)
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "0"))
+# HTTP/2 opcional: "off", "on" (negociado por ALPN sobre https) o
+# "prior-knowledge" (h2c directo, para la DB-API interna sin TLS)
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "off").lower()
+# Streams HTTP/2 concurrentes máximos por host
+UPSTREAM_H2_MAX_STREAMS = int(os.getenv("UPSTREAM_H2_MAX_STREAMS", "100"))
+# Segundos que un host que rechazó h2 se atiende por HTTP/1.1 antes de
+# volver a probar HTTP/2 (p. ej. tras un despliegue que lo activa)
+UPSTREAM_H2_RETRY_AFTER = float(os.getenv("UPSTREAM_H2_RETRY_AFTER", "300"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Cuerpo de respuesta que libera el stream HTTP/2 al cerrarse."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class Http2Transport(httpx.AsyncBaseTransport):
+    """
+    Transporte HTTP/2 con límite de streams por host y retorno a HTTP/1.1.
+
+    Cada host tiene un semáforo de ``max_streams`` peticiones en vuelo (se
+    libera al cerrar el cuerpo de la respuesta). Si un host nunca ha respondido
+    por HTTP/2 y la conexión falla con un error de protocolo, se atiende por
+    HTTP/1.1 durante ``retry_h2_after`` segundos y la petición se repite por
+    ese transporte; pasado ese tiempo se vuelve a probar HTTP/2.
+    """
+
+    def __init__(
+        self,
+        http2: httpx.AsyncBaseTransport,
+        http1_factory: Callable[[], httpx.AsyncBaseTransport],
+        max_streams: int,
+        retry_h2_after: float = UPSTREAM_H2_RETRY_AFTER,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._http2 = http2
+        self._http1_factory = http1_factory
+        self._http1: Optional[httpx.AsyncBaseTransport] = None
+        self._max_streams = max_streams
+        self._retry_h2_after = retry_h2_after
+        self._clock = clock
+        self._streams: Dict[str, asyncio.Semaphore] = {}
+        self._h2_hosts: Set[str] = set()
+        # host -> instante hasta el que se usa HTTP/1.1
+        self._h1_hosts: Dict[str, float] = {}
+
+    def _http1_transport(self) -> httpx.AsyncBaseTransport:
+        if self._http1 is None:
+            self._http1 = self._http1_factory()
+        return self._http1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = f"{request.url.host}:{request.url.port}"
+        h1_until = self._h1_hosts.get(host)
+        if h1_until is not None:
+            if self._clock() < h1_until:
+                return await self._http1_transport().handle_async_request(request)
+            del self._h1_hosts[host]
+
+        semaphore = self._streams.setdefault(host, asyncio.Semaphore(self._max_streams))
+        await semaphore.acquire()
+        try:
+            response = await self._http2.handle_async_request(request)
+        except httpx.RemoteProtocolError:
+            semaphore.release()
+            if host in self._h2_hosts:
+                raise
+            logger.warning(
+                f"{host} no soporta HTTP/2, se usará HTTP/1.1 durante "
+                f"{self._retry_h2_after:.0f}s"
+            )
+            self._h1_hosts[host] = self._clock() + self._retry_h2_after
+            return await self._http1_transport().handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        self._h2_hosts.add(host)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(
+                cast(httpx.AsyncByteStream, response.stream), semaphore.release
+            ),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._http2.aclose()
+        if self._http1 is not None:
+            await self._http1.aclose()
+
+
+def _build_transport() -> httpx.AsyncBaseTransport:
+    limits = httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+    def http1() -> httpx.AsyncBaseTransport:
+        return httpx.AsyncHTTPTransport(limits=limits, retries=UPSTREAM_RETRIES)
+
+    if UPSTREAM_HTTP2 not in ("on", "prior-knowledge"):
+        return http1()
+
+    try:
+        http2 = httpx.AsyncHTTPTransport(
+            limits=limits,
+            retries=UPSTREAM_RETRIES,
+            http2=True,
+            # Con "prior-knowledge" se habla h2 directamente, sin negociación
+            http1=UPSTREAM_HTTP2 != "prior-knowledge",
+        )
+    except ImportError:
+        logger.warning(
+            "UPSTREAM_HTTP2 activo pero el paquete 'h2' no está instalado; "
+            "se usará HTTP/1.1"
+        )
+        return http1()
+    return Http2Transport(http2, http1, UPSTREAM_H2_MAX_STREAMS)
+
+
+def _build_client() -> httpx.AsyncClient:
+    transport = _build_transport()
+    if UPSTREAM_BREAKER_ENABLED:
+        transport = CircuitBreakerTransport(transport)
+    return httpx.AsyncClient(
+        transport=transport, timeout=httpx.Timeout(UPSTREAM_TIMEOUT)
+    )
+
+
+async def start_client() -> httpx.AsyncClient:
+    """Crea el cliente compartido. Se llama desde el lifespan de la app."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        logger.info(
+            f"Cliente upstream iniciado (max_connections={UPSTREAM_MAX_CONNECTIONS}, "
+            f"max_keepalive={UPSTREAM_MAX_KEEPALIVE}, http2={UPSTREAM_HTTP2})"
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Cierra el cliente compartido liberando las conexiones del pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        logger.info("Cliente upstream cerrado")
+    _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente compartido.
+
+    Si el lifespan no se ha ejecutado (scripts, tests), el cliente se crea
+    de forma perezosa en la primera llamada.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+@asynccontextmanager
+async def client_session() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Reemplazo directo de ``async with httpx.AsyncClient() as client``.
+
+    Entrega el cliente compartido sin cerrarlo al salir del bloque.
+    """
+    yield get_client()
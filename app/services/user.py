@@ -1,10 +1,14 @@
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
 import httpx
 
+from app.auth.claims import bump_user_version
+from app.auth.user_cache import invalidate_user
 from app.models.user import User, UserCreate, UserUpdate
+from app.services import dataloader, upstream
+from app.services.circuit_breaker import CircuitOpenError
 from app.utils.logger import get_logger
 
 # Configurar el logger para este módulo
@@ -15,13 +19,16 @@ USER_API_URL = f"{USER_SVC_URL}/api/v1/users"
 
 # Configuración de timeout para las solicitudes HTTP
 TIMEOUT_SECONDS = 30.0
+INTERNAL_HDR = {"X-Internal-Request": "true"}
 
 
 async def create_user(user_in: UserCreate) -> User:
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
+        async with upstream.client_session() as client:
             response = await client.post(
-                f"{USER_API_URL}/", json=user_in.model_dump(mode="json")
+                f"{USER_API_URL}/",
+                json=user_in.model_dump(mode="json"),
+                timeout=TIMEOUT_SECONDS,
             )
             response.raise_for_status()  # Will raise an exception for 4xx/5xx responses
             return User(**response.json())
@@ -29,23 +36,50 @@ async def create_user(user_in: UserCreate) -> User:
         logger.error(f"Error al crear usuario: {e.response.text}", exc_info=True)
         # Re-lanzamos la excepción para que el endpoint pueda manejarla
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al crear usuario: {str(e)}", exc_info=True)
         raise
 
 
+async def _fetch_user(user_id: str) -> Optional[dict]:
+    async with upstream.client_session() as client:
+        response = await client.get(
+            f"{USER_API_URL}/{user_id}", headers=INTERNAL_HDR, timeout=TIMEOUT_SECONDS
+        )
+    return response.json() if response.status_code == 200 else None
+
+
+async def _load_users(user_ids: List[str]) -> Dict[str, Any]:
+    return await dataloader.fetch_by_ids(
+        f"{USER_API_URL}/", user_ids, _fetch_user, id_field="user_id", headers=INTERNAL_HDR
+    )
+
+
+async def get_user_data(user_id: UUID) -> Optional[dict]:
+    """
+    Datos crudos del usuario tal como los devuelve la DB-API, o None si no existe.
+
+    Se devuelve una copia: la entidad cargada se comparte durante la petición.
+    """
+    data = await dataloader.get_loader(_load_users).load(user_id)
+    return dict(data) if data else None
+
+
 async def get_user(user_id: UUID) -> Optional[User]:
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-            response = await client.get(f"{USER_API_URL}/{user_id}")
-            if response.status_code == 200:
-                return User(**response.json())
-            return None
+        user_data = await get_user_data(user_id)
+        if user_data:
+            return User(**user_data)
+        return None
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Error al obtener usuario {user_id}: {e.response.text}", exc_info=True
         )
         return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al obtener usuario {user_id}: {str(e)}", exc_info=True
@@ -70,14 +104,18 @@ async def get_users(
         params["store_id"] = str(store)
 
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-            response = await client.get(f"{USER_API_URL}/", params=params)
+        async with upstream.client_session() as client:
+            response = await client.get(
+                f"{USER_API_URL}/", params=params, timeout=TIMEOUT_SECONDS
+            )
             response.raise_for_status()
             return [User(**item) for item in response.json()]
     except httpx.HTTPStatusError as e:
         logger.error(f"Error al obtener usuarios: {e.response.text}", exc_info=True)
         # Re-lanzamos la excepción para que el endpoint pueda manejarla
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"Error inesperado al obtener usuarios: {str(e)}", exc_info=True)
         raise
@@ -85,11 +123,15 @@ async def get_users(
 
 async def update_user(user_id: UUID, user_in: UserUpdate) -> Optional[User]:
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
+        async with upstream.client_session() as client:
             response = await client.patch(
                 f"{USER_API_URL}/{user_id}",
                 json=user_in.model_dump(mode="json", exclude_none=True),
+                timeout=TIMEOUT_SECONDS,
             )
+            dataloader.forget(_load_users, user_id)
+            invalidate_user(user_id)
+            await bump_user_version(user_id)
             response.raise_for_status()  # Lanza una excepción para errores 4xx/5xx
             return User(**response.json())
     except httpx.HTTPStatusError as e:
@@ -97,6 +139,8 @@ async def update_user(user_id: UUID, user_in: UserUpdate) -> Optional[User]:
             f"Error al actualizar usuario {user_id}: {e.response.text}", exc_info=True
         )
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al actualizar usuario {user_id}: {str(e)}", exc_info=True
@@ -106,14 +150,21 @@ async def update_user(user_id: UUID, user_in: UserUpdate) -> Optional[User]:
 
 async def delete_user(user_id: UUID) -> bool:
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT_SECONDS) as client:
-            response = await client.delete(f"{USER_API_URL}/{user_id}")
+        async with upstream.client_session() as client:
+            response = await client.delete(
+                f"{USER_API_URL}/{user_id}", timeout=TIMEOUT_SECONDS
+            )
+            dataloader.forget(_load_users, user_id)
+            invalidate_user(user_id)
+            await bump_user_version(user_id)
             return response.status_code == 204
     except httpx.HTTPStatusError as e:
         logger.error(
             f"Error al eliminar usuario {user_id}: {e.response.text}", exc_info=True
         )
         return False
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(
             f"Error inesperado al eliminar usuario {user_id}: {str(e)}", exc_info=True
@@ -0,0 +1,28 @@
+"""
+Respuestas condicionales con ETag para los endpoints de lectura.
+"""
+
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+
+def not_modified(
+    request: Request, response: Response, etag: Optional[str]
+) -> Optional[Response]:
+    """
+    Añade ``ETag`` a la respuesta y devuelve un 304 si el cliente ya tiene esa
+    versión (``If-None-Match``); en otro caso devuelve None.
+    """
+    if etag is None:
+        return None
+    response.headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match", "")
+    if (
+        etag in [tag.strip() for tag in if_none_match.split(",")]
+        or if_none_match == "*"
+    ):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return None
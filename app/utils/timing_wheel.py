@@ -0,0 +1,62 @@
+"""
+Rueda de temporización (hashed timing wheel).
+
+Programa vencimientos para muchas claves con un solo temporizador: cada
+clave cae en la ranura ``(cursor + ticks) % slots`` con las vueltas
+completas que le faltan. Programar, reprogramar y cancelar son O(1), y cada
+avance solo recorre la ranura actual.
+"""
+
+import math
+from typing import Dict, Generic, Hashable, List, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TimingWheel(Generic[K]):
+    """Vencimientos con resolución de ``tick`` segundos."""
+
+    __slots__ = ("tick", "_slots", "_where", "_cursor")
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        # Ranura -> {clave: vueltas completas que faltan}
+        self._slots: List[Dict[K, int]] = [{} for _ in range(slots)]
+        self._where: Dict[K, int] = {}
+        self._cursor = 0
+
+    def schedule(self, key: K, delay: float) -> None:
+        """Programa (o reprograma) ``key`` para dentro de ``delay`` segundos."""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        size = len(self._slots)
+        slot = (self._cursor + ticks) % size
+        self._slots[slot][key] = (ticks - 1) // size
+        self._where[key] = slot
+
+    def cancel(self, key: K) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self) -> List[K]:
+        """Avanza un tick y devuelve las claves vencidas."""
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        bucket = self._slots[self._cursor]
+        if not bucket:
+            return []
+        expired = [key for key, rounds in bucket.items() if rounds == 0]
+        for key in expired:
+            del bucket[key]
+            del self._where[key]
+        for key in bucket:
+            bucket[key] -= 1
+        return expired
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._where
+
+    def __len__(self) -> int:
+        return len(self._where)
@@ -0,0 +1,6 @@
+"""
+Benchmarks del gateway contra un stub local de la DB-API.
+
+Se ejecutan desde la raíz del repositorio, por ejemplo:
+``python -m benchmarks.bench_upstream_pool``
+"""
@@ -0,0 +1,171 @@
+"""
+Benchmark: bloquear miles de dispositivos, una petición por dispositivo frente
+a ``POST /device-actions/bulk``.
+
+Levanta el gateway en un subproceso (uvicorn) contra el stub local de la
+DB-API (con latencia artificial) y conecta algunos dispositivos por Socket.IO
+que confirman el comando; el resto están desconectados y su comando va a la
+cola offline. Se mide el tiempo total y el número de llamadas a la DB-API.
+
+Uso: ``python -m benchmarks.bench_bulk_actions [--devices N] [--online M]``
+(requiere aiohttp para los clientes Socket.IO)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+import httpx
+import socketio
+
+from benchmarks import stub_db_api
+from benchmarks.bench_login_storm import wait_ready
+from benchmarks.stub_db_api import free_port, run_stub
+
+
+def upstream_calls() -> Counter:
+    """Llamadas a la DB-API agrupadas por tipo (las PATCH sin el ID)."""
+    calls = Counter()
+    for key, count in stub_db_api.REQUEST_COUNTS.items():
+        if key.startswith("PATCH /api/v1/actions/"):
+            key = "PATCH /api/v1/actions/{id}"
+        calls[key] += count
+    return calls
+
+
+async def connect_devices(url: str, device_ids):
+    clients = []
+    for device_id in device_ids:
+        client = socketio.AsyncClient()
+
+        @client.on("action")
+        async def on_action(data):
+            return True
+
+        await client.connect(url, transports=["websocket"])
+        await client.call("joinRoom", {"deviceId": device_id}, timeout=10)
+        clients.append(client)
+    return clients
+
+
+async def run_single(url: str, device_ids, concurrency: int) -> Counter:
+    statuses: Counter = Counter()
+    queue = list(device_ids)
+    body = {"applied_by_id": str(uuid.uuid4())}
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+
+        async def worker():
+            while queue:
+                device_id = queue.pop()
+                response = await client.post(
+                    f"/api/v1/device-actions/{device_id}/block", json=body
+                )
+                statuses[response.status_code] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+async def run_bulk(url: str, device_ids):
+    statuses: Counter = Counter()
+    first_line = None
+    start = time.perf_counter()
+    body = {
+        "applied_by_id": str(uuid.uuid4()),
+        "command": "block",
+        "device_ids": device_ids,
+    }
+    async with httpx.AsyncClient(base_url=url, timeout=300) as client:
+        async with client.stream(
+            "POST", "/api/v1/device-actions/bulk", json=body
+        ) as response:
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                if first_line is None:
+                    first_line = (time.perf_counter() - start) * 1000
+                result = json.loads(line)
+                if "summary" not in result:
+                    statuses[result["status_code"]] += 1
+    return statuses, first_line
+
+
+async def main(devices: int, online: int, concurrency: int, latency: float):
+    port = free_port()
+    async with run_stub(port, latency=latency) as stub_url:
+        gateway_port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DB_API": stub_url,
+                "USER_SVC_URL": stub_url,
+                "OFFLINE_QUEUE_PATH": os.path.join(tmp, "queue.db"),
+            }
+            gateway = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "app.main:app",
+                    "--port",
+                    str(gateway_port),
+                    "--log-level",
+                    "warning",
+                ],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            url = f"http://127.0.0.1:{gateway_port}"
+            try:
+                await wait_ready(url)
+                for label in ("single", "bulk"):
+                    device_ids = [str(uuid.uuid4()) for _ in range(devices)]
+                    clients = await connect_devices(url, device_ids[:online])
+                    stub_db_api.REQUEST_COUNTS.clear()
+                    start = time.perf_counter()
+                    if label == "single":
+                        statuses = await run_single(url, device_ids, concurrency)
+                        first = ""
+                    else:
+                        statuses, first_ms = await run_bulk(url, device_ids)
+                        first = f" first line {first_ms:6.1f} ms |"
+                    elapsed = time.perf_counter() - start
+                    calls = upstream_calls()
+                    print(
+                        f"{label:<7} {devices} devices ({online} online): {elapsed:6.2f} s "
+                        f"({devices / elapsed:7.0f} devices/s) |{first} "
+                        f"status {dict(sorted(statuses.items()))} | "
+                        f"DB-API calls {sum(calls.values())} {dict(sorted(calls.items()))}"
+                    )
+                    for client in clients:
+                        await client.disconnect()
+            finally:
+                gateway.terminate()
+                gateway.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument(
+        "--online", type=int, default=100, help="dispositivos conectados que confirman"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=20,
+        help="peticiones simultáneas en modo single",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="latencia del stub en segundos"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.devices, args.online, args.concurrency, args.latency))
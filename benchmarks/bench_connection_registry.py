@@ -0,0 +1,95 @@
+"""
+Benchmark: tiempo y memoria del registro de conexiones Socket.IO.
+
+Compara el diccionario anterior (device_id → set de SIDs, con búsqueda
+lineal del dispositivo al desconectar) con ``ConnectionRegistry`` a 100k
+conexiones simuladas: tiempo de conexión, una tormenta de reconexión (se
+desconecta y reconecta una parte de los dispositivos con todo el resto
+conectado) y memoria ocupada (tracemalloc), para comprobar que los índices
+por SID y por tienda no la aumentan.
+
+Uso: ``python -m benchmarks.bench_connection_registry [--connections N] [--storm M]``
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from typing import Dict, Set
+
+from app.services.connection_registry import ConnectionRegistry
+
+
+class LegacyConnections:
+    """Estructura anterior de ``ConnectionManager``."""
+
+    def __init__(self):
+        self.active_connections: Dict[str, Set[str]] = {}
+
+    def add(self, sid: str, device_id: str, store_id=None) -> None:
+        self.active_connections.setdefault(device_id, set()).add(sid)
+
+    def remove(self, sid: str) -> None:
+        device_to_remove = None
+        for device_id, sids in self.active_connections.items():
+            if sid in sids:
+                sids.discard(sid)
+                if not sids:
+                    device_to_remove = device_id
+                break
+        if device_to_remove:
+            self.active_connections.pop(device_to_remove)
+
+
+def simulated_connections(count: int, stores: int):
+    """(sid, device_id, store_id) como llegarían del socket: strings nuevos."""
+    store_ids = [str(uuid.uuid4()) for _ in range(stores)]
+    return [
+        (uuid.uuid4().hex[:20], str(uuid.uuid4()), store_ids[index % stores])
+        for index in range(count)
+    ]
+
+
+def run(label: str, registry, connections, storm: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for sid, device_id, store_id in connections:
+        # Copias, como las que entrega cada evento joinRoom
+        registry.add("".join(sid), "".join(device_id), "".join(store_id))
+    connect_s = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Tormenta: se caen los últimos ``storm`` dispositivos y vuelven a entrar
+    storming = connections[-storm:]
+    start = time.perf_counter()
+    for sid, _, _ in storming:
+        registry.remove(sid)
+    for sid, device_id, store_id in storming:
+        registry.add(sid, device_id, store_id)
+    storm_s = time.perf_counter() - start
+    print(
+        f"{label:<8} {len(connections)} connections: {memory / 1024 / 1024:7.1f} MiB "
+        f"({memory / len(connections):5.0f} B/conn) | connect {connect_s:6.2f} s | "
+        f"storm {storm} reconnects {storm_s * 1000:9.1f} ms "
+        f"({storm_s / storm * 1e6:8.1f} µs/reconnect)"
+    )
+
+
+def main(count: int, stores: int, storm: int) -> None:
+    connections = simulated_connections(count, stores)
+    run("legacy", LegacyConnections(), connections, storm)
+    run("registry", ConnectionRegistry(), connections, storm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=100000)
+    parser.add_argument("--stores", type=int, default=500)
+    parser.add_argument(
+        "--storm", type=int, default=2000, help="dispositivos que reconectan"
+    )
+    args = parser.parse_args()
+    main(args.connections, args.stores, args.storm)
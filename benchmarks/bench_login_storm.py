@@ -0,0 +1,145 @@
+"""
+Benchmark: latencia de Socket.IO durante una ráfaga de logins.
+
+Levanta el gateway en un subproceso (uvicorn) contra el stub local de la
+DB-API, conecta un dispositivo por Socket.IO y mide el tiempo de ida y
+vuelta de un evento con ack (``joinRoom``) mientras muchos clientes hacen
+login a la vez. Se compara bcrypt en línea (``PASSWORD_HASH_WORKERS=0``)
+con bcrypt en el pool de hilos acotado.
+
+Uso: ``python -m benchmarks.bench_login_storm [--logins C] [--seconds S]``
+(requiere aiohttp para el cliente Socket.IO)
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+import socketio
+
+from benchmarks.stub_db_api import BENCH_PASSWORD, free_port, run_stub
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def wait_ready(url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError(f"El gateway no arrancó en {url}")
+
+
+async def probe(client: socketio.AsyncClient, stop: asyncio.Event, samples: list):
+    """Evento con ack cada 20 ms; mide el tiempo de ida y vuelta."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.call("joinRoom", {"deviceId": "bench-probe"}, timeout=60)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)
+
+
+async def login_storm(url: str, concurrency: int, seconds: float, results: Counter):
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+
+        async def worker(index: int):
+            while time.perf_counter() < deadline:
+                response = await client.post(
+                    "/api/v1/auth/login",
+                    data={"username": f"user{index}", "password": BENCH_PASSWORD},
+                )
+                results[response.status_code] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def run_mode(
+    label: str, workers: int, stub_url: str, concurrency: int, seconds: float
+):
+    port = free_port()
+    env = {
+        **os.environ,
+        "USER_SVC_URL": stub_url,
+        "DB_API": stub_url,
+        "PASSWORD_HASH_WORKERS": str(workers),
+    }
+    gateway = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(url)
+        client = socketio.AsyncClient()
+        await client.connect(url, transports=["websocket"])
+
+        idle, storm = [], []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, idle))
+        await asyncio.sleep(1)
+        stop.set()
+        await task
+
+        results: Counter = Counter()
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, storm))
+        await login_storm(url, concurrency, seconds, results)
+        stop.set()
+        await task
+        await client.disconnect()
+    finally:
+        gateway.terminate()
+        gateway.wait()
+
+    print(
+        f"{label:<8} idle p50={statistics.median(idle):6.1f} ms | "
+        f"storm p50={statistics.median(storm):7.1f} ms "
+        f"p99={percentile(storm, 99):7.1f} ms max={max(storm):7.1f} ms | "
+        f"logins {dict(sorted(results.items()))}"
+    )
+
+
+async def main(concurrency: int, seconds: float, workers: int):
+    port = free_port()
+    async with run_stub(port) as stub_url:
+        # Precalcula el hash bcrypt del stub antes de medir
+        async with httpx.AsyncClient() as client:
+            await client.get(f"{stub_url}/api/v1/users/by-username/warmup")
+        await run_mode("inline", 0, stub_url, concurrency, seconds)
+        await run_mode("pool", workers, stub_url, concurrency, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--logins", type=int, default=50, help="clientes haciendo login en bucle"
+    )
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.seconds, args.workers))
@@ -0,0 +1,316 @@
+"""
+Benchmark: tormenta de reconexión de dispositivos contra el servidor Socket.IO.
+
+Simula en proceso que ``--devices`` dispositivos reconectan a la vez tras un
+reinicio, identificándose en el handshake. Los paquetes salen por un
+transporte falso (sin red) y el vaciado de la cola offline de cada uno se
+sustituye por una llamada simulada a la DB-API cuya latencia crece con las
+llamadas simultáneas, como la DB-API real al saturarse. Los dispositivos
+rechazados esperan el ``retry_after_ms`` recibido y vuelven a intentarlo.
+
+Compara sin control (admisión y calentamiento desactivados) con el control
+de tormentas: tiempo hasta tener todos unidos y con la cola entregada,
+latencia de unión p50/p99, máximo de llamadas simultáneas a la DB-API (en
+curso o esperando turno), llamadas fallidas por timeout y conexiones
+rechazadas.
+
+Con ``--stop`` mide en cambio la parada real: levanta el gateway con uvicorn
+en un subproceso, conecta ``--devices`` clientes Socket.IO y le envía
+``SIGTERM``. Compara el drenaje desde la señal (``SOCKETIO_DRAIN_ON_SIGNAL``)
+con el drenaje solo en el apagado del lifespan: cuántos clientes reciben
+``reconnect_hint`` y cómo se reparten sus desconexiones.
+
+Uso: ``python -m benchmarks.bench_reconnect_storm [--devices N] [--rate R]``
+``python -m benchmarks.bench_reconnect_storm --stop [--devices N] [--window S]``
+(requiere aiohttp para el cliente Socket.IO)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+import socketio
+
+from app.services import socket_service, storm_control
+from app.services.connection_registry import ConnectionRegistry
+from app.services.storm_control import AdmissionControl
+from benchmarks.bench_login_storm import wait_ready
+from benchmarks.stub_db_api import free_port, run_stub
+
+
+class SimulatedDbApi:
+    """
+    DB-API con ``capacity`` llamadas en paralelo de ``latency`` segundos; las
+    demás esperan turno y las que esperan más de ``timeout`` fallan, como
+    las peticiones del cliente HTTP del gateway.
+    """
+
+    def __init__(self, latency: float, capacity: int, timeout: float):
+        self.latency = latency
+        self.timeout = timeout
+        self.workers = asyncio.Semaphore(capacity)
+        self.inflight = 0
+        self.peak = 0
+        self.failed = 0
+
+    async def flush_offline_queue(self, device_id: str) -> int:
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await asyncio.wait_for(self.workers.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            return 0
+        else:
+            await asyncio.sleep(self.latency)
+            self.workers.release()
+        finally:
+            self.inflight -= 1
+        return 0
+
+
+async def storm(
+    devices: int, admission: AdmissionControl, db_api: SimulatedDbApi
+) -> dict:
+    sio = socket_service.sio
+    inbox = {}
+    done = {}
+
+    async def send(eio_sid, data):
+        inbox[eio_sid].put_nowait(data)
+
+    async def send_packet(eio_sid, eio_pkt):
+        inbox[eio_sid].put_nowait(eio_pkt.data)
+
+    async def flush_offline_queue(device_id):
+        await db_api.flush_offline_queue(device_id)
+        done[device_id].set()
+        return 0
+
+    sio.eio.send = send
+    sio.eio.send_packet = send_packet
+    socket_service.flush_offline_queue = flush_offline_queue
+    socket_service.manager.connections = ConnectionRegistry()
+    socket_service.manager.presence = None
+    storm_control.admission = admission
+    admission.start()
+
+    join_latencies = []
+    refused = 0
+    run = uuid.uuid4().hex
+
+    async def device(index: int) -> None:
+        nonlocal refused
+        device_id = str(uuid.uuid4())
+        done[device_id] = asyncio.Event()
+        # Retardo de reconexión de socket.io-client: 1 s con factor de aleatoriedad 0,5
+        await asyncio.sleep(random.uniform(0.5, 1.5))
+        start = time.perf_counter()
+        for attempt in range(1000):
+            eio_sid = f"{run}-{index}-{attempt}"
+            inbox[eio_sid] = asyncio.Queue()
+            await sio._handle_eio_connect(eio_sid, {"QUERY_STRING": "EIO=4"})
+            await sio._handle_eio_message(
+                eio_sid, "0" + json.dumps({"deviceId": device_id})
+            )
+            first = await inbox[eio_sid].get()
+            if first.startswith("4"):
+                # connect_error con la pista de reintento
+                refused += 1
+                del inbox[eio_sid]
+                await asyncio.sleep(
+                    json.loads(first[1:])["data"]["retry_after_ms"] / 1000
+                )
+                continue
+            while "connection_success" not in await inbox[eio_sid].get():
+                pass
+            join_latencies.append(time.perf_counter() - start)
+            await done[device_id].wait()
+            return
+
+    start = time.perf_counter()
+    await asyncio.gather(*(device(index) for index in range(devices)))
+    elapsed = time.perf_counter() - start
+    for eio_sid in inbox:
+        await sio._handle_eio_disconnect(eio_sid)
+    join_latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "p50": join_latencies[len(join_latencies) // 2],
+        "p99": join_latencies[int(len(join_latencies) * 0.99) - 1],
+        "peak_db_calls": db_api.peak,
+        "failed": db_api.failed,
+        "refused": refused,
+    }
+
+
+async def uvicorn_stop(
+    devices: int, window: float, on_signal: bool, stub_url: str
+) -> dict:
+    """Parada real del gateway con ``SIGTERM`` y ``devices`` clientes conectados."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "DB_API": stub_url,
+        "USER_SVC_URL": stub_url,
+        "SOCKETIO_ADMISSION_RATE": "0",
+        "SOCKETIO_DRAIN_WINDOW": str(window),
+        "SOCKETIO_DRAIN_ON_SIGNAL": "true" if on_signal else "false",
+    }
+    gateway = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    hints = 0
+    disconnects = []
+    clients = []
+    try:
+        await wait_ready(url)
+
+        async def device() -> None:
+            client = socketio.AsyncClient(reconnection=False)
+
+            @client.on("reconnect_hint")
+            async def reconnect_hint(data):
+                nonlocal hints
+                hints += 1
+
+            @client.event
+            async def disconnect():
+                disconnects.append(time.perf_counter())
+
+            await client.connect(
+                url, auth={"deviceId": str(uuid.uuid4())}, transports=["websocket"]
+            )
+            clients.append(client)
+
+        await asyncio.gather(*(device() for _ in range(devices)))
+        await asyncio.sleep(0.5)
+        start = time.perf_counter()
+        gateway.send_signal(signal.SIGTERM)
+        deadline = start + window + 10
+        while len(disconnects) < len(clients) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        stopped = await asyncio.to_thread(gateway.wait, 15)
+    finally:
+        if gateway.poll() is None:
+            gateway.kill()
+            gateway.wait()
+        for client in clients:
+            with contextlib.suppress(Exception):
+                await client.disconnect()
+    offsets = sorted(moment - start for moment in disconnects)
+    return {
+        "connected": len(clients),
+        "hints": hints,
+        "disconnected": len(offsets),
+        "first": offsets[0] if offsets else 0.0,
+        "last": offsets[-1] if offsets else 0.0,
+        "exit_code": stopped,
+    }
+
+
+async def stop_main(devices: int, window: float) -> None:
+    async with run_stub(free_port()) as stub_url:
+        for label, on_signal in (("lifespan", False), ("señal", True)):
+            result = await uvicorn_stop(devices, window, on_signal, stub_url)
+            print(
+                f"{label:<9} {result['connected']} devices: reconnect_hint {result['hints']:5d} | "
+                f"disconnected {result['disconnected']:5d} between "
+                f"{result['first']:5.2f} s and {result['last']:5.2f} s after SIGTERM | "
+                f"exit code {result['exit_code']}"
+            )
+
+
+def main(
+    devices: int,
+    rate: float,
+    burst: int,
+    warmup_concurrency: int,
+    latency: float,
+    capacity: int,
+    timeout: float,
+) -> None:
+    scenarios = (
+        ("sin control", AdmissionControl(rate=0, warmup=0)),
+        (
+            "control",
+            AdmissionControl(
+                rate=rate,
+                burst=burst,
+                retry_min=0.05,
+                warmup=3600,
+                warmup_concurrency=warmup_concurrency,
+            ),
+        ),
+    )
+    for label, admission in scenarios:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(
+                storm(devices, admission, SimulatedDbApi(latency, capacity, timeout))
+            )
+        print(
+            f"{label:<12} {devices} devices: all served {result['elapsed']:6.2f} s | "
+            f"join p50 {result['p50'] * 1000:7.0f} ms p99 {result['p99'] * 1000:7.0f} ms | "
+            f"DB-API calls peak {result['peak_db_calls']:5d} failed {result['failed']:5d} | "
+            f"refused {result['refused']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument(
+        "--rate", type=float, default=300, help="sesiones admitidas por segundo"
+    )
+    parser.add_argument("--burst", type=int, default=300)
+    parser.add_argument("--warmup-concurrency", type=int, default=20)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="latencia base de la DB-API (s)"
+    )
+    parser.add_argument(
+        "--capacity", type=int, default=20, help="llamadas simultáneas de la DB-API"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=5, help="espera máxima de una llamada (s)"
+    )
+    parser.add_argument(
+        "--stop", action="store_true", help="parada real de uvicorn con SIGTERM"
+    )
+    parser.add_argument(
+        "--window", type=float, default=2, help="ventana de drenaje con --stop (s)"
+    )
+    args = parser.parse_args()
+    if args.stop:
+        asyncio.run(stop_main(args.devices, args.window))
+        raise SystemExit
+    main(
+        args.devices,
+        args.rate,
+        args.burst,
+        args.warmup_concurrency,
+        args.latency,
+        args.capacity,
+        args.timeout,
+    )
@@ -0,0 +1,101 @@
+"""
+Benchmark: tamaño y CPU de los paquetes Socket.IO en JSON frente a MessagePack.
+
+Codifica y decodifica paquetes ``action`` y de ubicación típicos con los
+dos serializadores de python-socketio y mide bytes por mensaje (también
+comprimidos con deflate, como haría permessage-deflate sin contexto
+compartido) y microsegundos por codificación y decodificación.
+
+Uso: ``python -m benchmarks.bench_socket_serializer [--iterations N]``
+(requiere msgpack)
+"""
+
+import argparse
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+from socketio import packet
+from socketio.msgpack_packet import MsgPackPacket
+
+
+def sample_payloads():
+    device_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    return {
+        "action block": [
+            "action",
+            {
+                "command": "block",
+                "device_id": device_id,
+                "payload": {},
+                "timestamp": timestamp,
+            },
+        ],
+        "action notify": [
+            "action",
+            {
+                "command": "notify",
+                "device_id": device_id,
+                "payload": {
+                    "title": "Recordatorio de pago",
+                    "description": "Tu cuota vence mañana. Evita el bloqueo del equipo.",
+                },
+                "timestamp": timestamp,
+            },
+        ],
+        "location": [
+            "location",
+            {
+                "device_id": device_id,
+                "latitude": 4.710988599999999,
+                "longitude": -74.072092,
+                "accuracy": 12.5,
+                "timestamp": timestamp,
+            },
+        ],
+    }
+
+
+def deflated_size(encoded) -> int:
+    if isinstance(encoded, str):
+        encoded = encoded.encode()
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(encoded) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def measure(packet_class, data, iterations: int):
+    encoded = packet_class(packet.EVENT, data=data, namespace="/").encode()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        packet_class(packet.EVENT, data=data, namespace="/").encode()
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        packet_class(encoded_packet=encoded)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+    size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+    return size, deflated_size(encoded), encode_us, decode_us
+
+
+def main(iterations: int) -> None:
+    for name, data in sample_payloads().items():
+        for label, packet_class in (
+            ("json", packet.Packet),
+            ("msgpack", MsgPackPacket),
+        ):
+            size, deflated, encode_us, decode_us = measure(
+                packet_class, data, iterations
+            )
+            print(
+                f"{name:<14} {label:<8} {size:4d} B ({deflated:4d} B deflate) | "
+                f"encode {encode_us:5.1f} µs | decode {decode_us:5.1f} µs"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,85 @@
+"""
+Benchmark: pool HTTP/1.1 vs. HTTP/2 multiplexado hacia la DB-API.
+
+Levanta el stub con hypercorn (h2c) y lanza una mezcla concurrente de
+``store.get_stores``, ``payment.get_payments`` y ``role.get_roles``. Muestra
+p50/p99, throughput y cuántas conexiones TCP abrió el gateway en cada modo.
+
+Uso: ``python -m benchmarks.bench_upstream_http2 [--requests N] [--concurrency C]``
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from benchmarks.stub_db_api import CLIENT_ADDRESSES, free_port, run_stub
+
+PORT = free_port()
+os.environ["USER_SVC_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["DB_API"] = f"http://127.0.0.1:{PORT}"
+
+from app.services import payment as payment_service  # noqa: E402
+from app.services import role as role_service  # noqa: E402
+from app.services import store as store_service  # noqa: E402
+from app.services import upstream  # noqa: E402
+
+# payment.py activa logging DEBUG global; silenciar httpx/httpcore/hpack
+for noisy in ("httpx", "httpcore", "hpack", "asyncio"):
+    logging.getLogger(noisy).setLevel(logging.WARNING)
+
+CALLS = (store_service.get_stores, payment_service.get_payments, role_service.get_roles)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await CALLS[i % len(CALLS)]()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+async def measure(mode: str, total: int, concurrency: int):
+    upstream.UPSTREAM_HTTP2 = mode
+    await upstream.start_client()
+    CLIENT_ADDRESSES.clear()
+    start = time.perf_counter()
+    latencies = await run_load(total, concurrency)
+    elapsed = time.perf_counter() - start
+    await upstream.close_client()
+    print(
+        f"{mode:<16} n={len(latencies):<6} "
+        f"p50={statistics.median(latencies):7.2f} ms  "
+        f"p99={percentile(latencies, 99):7.2f} ms  "
+        f"rps={len(latencies) / elapsed:8.1f}  "
+        f"tcp_connections={len(CLIENT_ADDRESSES)}"
+    )
+
+
+async def main(total: int, concurrency: int, latency: float):
+    async with run_stub(PORT, latency=latency, server="hypercorn"):
+        await measure("off", total, concurrency)
+        await measure("prior-knowledge", total, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency))
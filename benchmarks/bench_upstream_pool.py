@@ -0,0 +1,87 @@
+"""
+Benchmark: cliente httpx efímero por llamada vs. cliente compartido con pool.
+
+Mide la latencia de ``role_service.get_roles`` contra el stub local de la
+DB-API y muestra p50/p99 para ambos modos.
+
+Uso: ``python -m benchmarks.bench_upstream_pool [--requests N] [--concurrency C]``
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.stub_db_api import free_port, run_stub
+
+PORT = free_port()
+os.environ["USER_SVC_URL"] = f"http://127.0.0.1:{PORT}"
+
+from app.services import role as role_service  # noqa: E402
+from app.services import upstream  # noqa: E402
+
+
+@asynccontextmanager
+async def per_call_session():
+    """Comportamiento anterior: un cliente (y una conexión) nuevo por llamada."""
+    async with httpx.AsyncClient() as client:
+        yield client
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await role_service.get_roles()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def report(label, latencies, elapsed):
+    print(
+        f"{label:<10} n={len(latencies):<6} "
+        f"p50={statistics.median(latencies):7.2f} ms  "
+        f"p99={percentile(latencies, 99):7.2f} ms  "
+        f"rps={len(latencies) / elapsed:8.1f}"
+    )
+
+
+async def main(total: int, concurrency: int):
+    async with run_stub(PORT):
+        original = upstream.client_session
+
+        upstream.client_session = per_call_session
+        start = time.perf_counter()
+        before = await run_load(total, concurrency)
+        report("per-call", before, time.perf_counter() - start)
+
+        upstream.client_session = original
+        await upstream.start_client()
+        await run_load(concurrency, concurrency)  # calentar el pool
+        start = time.perf_counter()
+        after = await run_load(total, concurrency)
+        report("pooled", after, time.perf_counter() - start)
+        await upstream.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,219 @@
+"""
+Stub mínimo de smartpay-db-api para los benchmarks.
+
+Expone las rutas de lectura más usadas por el gateway con datos fijos y una
+latencia artificial opcional, servido en un puerto local libre por uvicorn
+(HTTP/1.1) o por hypercorn (HTTP/1.1 y HTTP/2 h2c).
+"""
+
+import asyncio
+import socket
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Set, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+ROLES: List[Dict] = [
+    {"role_id": str(uuid.uuid4()), "name": name, "description": None}
+    for name in ("admin", "superadmin", "vendor", "customer")
+]
+COUNTRIES: List[Dict] = [
+    {"country_id": str(uuid.uuid4()), "name": name, "code": code, "prefix": prefix}
+    for name, code, prefix in (
+        ("Colombia", "CO", "+57"),
+        ("Ecuador", "EC", "+593"),
+        ("Perú", "PE", "+51"),
+        ("México", "MX", "+52"),
+    )
+]
+
+# Contraseña de todos los usuarios del stub (hash bcrypt calculado al arrancar)
+BENCH_PASSWORD = "bench-password"
+_password_hash: List[str] = []
+
+# Direcciones (host, puerto) de cliente vistas por el stub: una por conexión TCP
+CLIENT_ADDRESSES: Set[Tuple[str, int]] = set()
+# Peticiones recibidas por "MÉTODO ruta" (para contar llamadas upstream)
+REQUEST_COUNTS: Counter = Counter()
+
+
+def free_port() -> int:
+    """Obtiene un puerto TCP libre en localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_app(latency: float = 0.0):
+    """Construye la app del stub con una latencia fija por respuesta."""
+
+    async def _delay() -> None:
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def roles(request: Request) -> Response:
+        await _delay()
+        return JSONResponse(ROLES)
+
+    async def countries(request: Request) -> Response:
+        await _delay()
+        return JSONResponse(COUNTRIES)
+
+    async def stores(request: Request) -> Response:
+        await _delay()
+        return JSONResponse([])
+
+    async def payments(request: Request) -> Response:
+        await _delay()
+        return JSONResponse([])
+
+    async def user(request: Request) -> Response:
+        await _delay()
+        user_id = request.path_params["user_id"]
+        return JSONResponse(
+            {
+                "user_id": user_id,
+                "email": "bench@smartpay.test",
+                "username": f"user-{user_id[:8]}",
+                "state": "Active",
+                "role": ROLES[0],
+            }
+        )
+
+    async def user_by_username(request: Request) -> Response:
+        await _delay()
+        if not _password_hash:
+            from app.auth.security import get_password_hash
+
+            _password_hash.append(get_password_hash(BENCH_PASSWORD))
+        username = request.path_params["username"]
+        return JSONResponse(
+            {
+                "user_id": str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+                "email": "bench@smartpay.test",
+                "username": username,
+                "state": "Active",
+                "role": ROLES[0],
+                "password_hash": _password_hash[0],
+            }
+        )
+
+    def _action(item: Dict) -> Dict:
+        now = datetime.utcnow().isoformat()
+        return {
+            **item,
+            "action_id": str(uuid.uuid4()),
+            "created_at": now,
+            "updated_at": now,
+            "applied_by": {
+                "user_id": item["applied_by_id"],
+                "email": "bench@smartpay.co",
+                "username": "bench",
+            },
+        }
+
+    async def create_action(request: Request) -> Response:
+        await _delay()
+        return JSONResponse(_action(await request.json()), status_code=201)
+
+    async def create_actions_bulk(request: Request) -> Response:
+        await _delay()
+        return JSONResponse(
+            [_action(item) for item in await request.json()], status_code=201
+        )
+
+    async def update_action(request: Request) -> Response:
+        await _delay()
+        body = await request.json()
+        return JSONResponse(
+            _action(
+                {
+                    "device_id": str(uuid.uuid4()),
+                    "applied_by_id": str(uuid.uuid4()),
+                    "action": "block",
+                    "state": body.get("state", "pending"),
+                    "description": body.get("description"),
+                }
+            )
+        )
+
+    app = Starlette(
+        routes=[
+            Route("/api/v1/actions", create_action, methods=["POST"]),
+            Route("/api/v1/actions/bulk", create_actions_bulk, methods=["POST"]),
+            Route("/api/v1/actions/{action_id}", update_action, methods=["PATCH"]),
+            Route("/api/v1/roles/", roles),
+            Route("/api/v1/countries/", countries),
+            Route("/api/v1/stores/", stores),
+            Route("/api/v1/payments", payments),
+            Route("/api/v1/users/by-username/{username}", user_by_username),
+            Route("/api/v1/users/{user_id}", user),
+        ]
+    )
+
+    async def track_connections(scope, receive, send):
+        if scope["type"] == "http" and scope.get("client"):
+            CLIENT_ADDRESSES.add(tuple(scope["client"]))
+            REQUEST_COUNTS[f"{scope['method']} {scope['path']}"] += 1
+        await app(scope, receive, send)
+
+    return track_connections
+
+
+@asynccontextmanager
+async def run_stub(
+    port: int, latency: float = 0.0, server: str = "uvicorn"
+) -> AsyncIterator[str]:
+    """Levanta el stub en segundo plano y entrega su URL base."""
+    if server == "hypercorn":
+        async with _run_hypercorn(port, latency) as url:
+            yield url
+        return
+
+    config = uvicorn.Config(
+        build_app(latency), host="127.0.0.1", port=port, log_level="warning"
+    )
+    uvicorn_server = uvicorn.Server(config)
+    task = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        uvicorn_server.should_exit = True
+        await task
+
+
+@asynccontextmanager
+async def _run_hypercorn(port: int, latency: float) -> AsyncIterator[str]:
+    # hypercorn acepta HTTP/2 sin TLS con "prior knowledge" (h2c)
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.loglevel = "WARNING"
+    config.keep_alive_max_requests = 1_000_000
+    shutdown = asyncio.Event()
+    task = asyncio.create_task(
+        serve(build_app(latency), config, shutdown_trigger=shutdown.wait)
+    )
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        shutdown.set()
+        await task
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import threading
+import uuid
+
+import httpx
+
+from app.models.action import ActionCreate, ActionState
+from app.services import action as action_service
+from app.services.action_log import ActionLogWriter, _flock
+
+
+def make_action():
+    return ActionCreate(
+        device_id=uuid.uuid4(),
+        applied_by_id=uuid.uuid4(),
+        action="block",
+        state=ActionState.APPLIED,
+    )
+
+
+def test_writer_batches_and_spills_while_upstream_is_down(tmp_path, monkeypatch):
+    """Sin DB-API los registros van al fichero y se reenvían al recuperarse."""
+    up = {"value": False}
+    batches = []
+
+    async def write_actions(actions_in):
+        batches.append(len(actions_in))
+        if not up["value"]:
+            return [httpx.ConnectError("down")] * len(actions_in)
+        return [object()] * len(actions_in)
+
+    monkeypatch.setattr(action_service, "write_actions", write_actions)
+    writer = ActionLogWriter(
+        batch_size=3, flush_interval=60, spill_path=str(tmp_path / "spill.ndjson")
+    )
+
+    async def scenario():
+        for _ in range(5):
+            writer.record(make_action())
+        # El lote lleno despierta al escritor sin esperar al intervalo
+        for _ in range(20):
+            if writer.spilled:
+                break
+            await asyncio.sleep(0.01)
+        assert writer.spilled == 5 and writer.has_spill()
+
+        up["value"] = True
+        writer.record(make_action())
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert batches == [3, 2, 1]
+    assert writer.written == 1 and writer.has_spill()
+
+    # Al volver la DB-API (o al arrancar) se reenvía el fichero local
+    asyncio.run(writer._replay_spill())
+    assert batches[3:] == [3, 2]
+    assert writer.written == 6 and not writer.has_spill()
+
+
+def test_overflow_goes_to_spill_file_off_the_event_loop(tmp_path, monkeypatch):
+    """Por encima de max_pending los registros van al fichero desde un hilo."""
+
+    async def write_actions(actions_in):
+        return [object()] * len(actions_in)
+
+    spill_threads = []
+    original_spill = ActionLogWriter._spill
+
+    def spill(self, items):
+        spill_threads.append(threading.current_thread())
+        original_spill(self, items)
+
+    monkeypatch.setattr(action_service, "write_actions", write_actions)
+    monkeypatch.setattr(ActionLogWriter, "_spill", spill)
+    writer = ActionLogWriter(
+        batch_size=10,
+        flush_interval=60,
+        max_pending=1,
+        spill_path=str(tmp_path / "spill.ndjson"),
+    )
+
+    async def scenario():
+        for _ in range(3):
+            writer.record(make_action())
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert writer.written == 1 and writer.spilled == 2
+    assert spill_threads and threading.main_thread() not in spill_threads
+
+
+def test_replay_is_owned_by_one_worker_and_resumes_after_a_crash(tmp_path, monkeypatch):
+    """Un solo worker reenvía el fichero; tras una caída se sigue desde lo anotado."""
+    batches = []
+
+    async def write_actions(actions_in):
+        batches.append(len(actions_in))
+        return [object()] * len(actions_in)
+
+    monkeypatch.setattr(action_service, "write_actions", write_actions)
+    path = str(tmp_path / "spill.ndjson")
+    first = ActionLogWriter(batch_size=2, spill_path=path)
+    second = ActionLogWriter(batch_size=2, spill_path=path)
+    first._spill([make_action() for _ in range(5)])
+    second._spill([make_action()])
+
+    # Otro worker tiene el reenvío: este no lo toca
+    claim = _flock(path + ".replay.lock")
+    asyncio.run(second._replay_spill())
+    assert batches == [] and second.has_spill()
+
+    os.close(claim)
+
+    # El dueño cae tras anotar el primer lote: el siguiente no lo repite
+    items, done = second._take_spill()
+    assert (len(items), done) == (6, 0)
+    second._mark_replayed(2)
+    second._end_replay(finished=False)
+    asyncio.run(first._replay_spill())
+    assert batches == [2, 2]
+    assert first.written == 4 and not first.has_spill()
+
+
+def test_has_spill_does_not_touch_the_disk(tmp_path, monkeypatch):
+    """El estado del fichero local se lleva en memoria y se refresca al reenviar."""
+
+    async def write_actions(actions_in):
+        return [object()] * len(actions_in)
+
+    monkeypatch.setattr(action_service, "write_actions", write_actions)
+    path = str(tmp_path / "spill.ndjson")
+    ActionLogWriter(spill_path=path)._spill([make_action() for _ in range(2)])
+    writer = ActionLogWriter(spill_path=path)
+
+    def exists(_path):
+        raise AssertionError("has_spill no debe mirar el disco")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(os.path, "exists", exists)
+        assert not writer.has_spill()
+
+    # El fichero de otro worker se descubre al buscarlo para reenviar
+    asyncio.run(writer._replay_spill())
+    assert writer.written == 2 and not writer.has_spill()
@@ -0,0 +1,101 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth import claims
+from app.auth.dependencies import get_current_user
+from app.auth.security import create_access_token
+
+
+def make_token(user_id):
+    user = {
+        "user_id": user_id,
+        "username": "vendor",
+        "email": "vendor@example.com",
+        "state": "Active",
+        "role": {"role_id": str(uuid.uuid4()), "name": "Vendor"},
+        "store": {"id": str(uuid.uuid4()), "nombre": "Tienda"},
+    }
+    return create_access_token(
+        {
+            "sub": user_id,
+            "username": "vendor",
+            "role": "Vendor",
+            **asyncio.run(claims.build_claims(user)),
+        }
+    )
+
+
+def test_principal_is_built_from_claims_and_revoked_on_mutation(monkeypatch):
+    """En modo claims no se consulta la DB-API y una mutación revoca el token."""
+    monkeypatch.setattr(claims, "AUTH_CLAIMS_MODE", True)
+    monkeypatch.setattr(claims, "versions", claims.UserVersions())
+
+    async def no_lookup(user_id):
+        raise AssertionError("no debe consultar la DB-API")
+
+    monkeypatch.setattr("app.services.user.get_user_data", no_lookup)
+    user_id = str(uuid.uuid4())
+    token = make_token(user_id)
+
+    user = asyncio.run(get_current_user(token))
+    assert str(user.user_id) == user_id
+    assert user.state == "A"
+    assert user.role.name == "Vendor"
+    assert user.store.nombre == "Tienda"
+
+    asyncio.run(claims.bump_user_version(user_id))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_current_user(token))
+    assert exc.value.status_code == 401
+
+    # Un token emitido tras la mutación vuelve a ser válido
+    assert asyncio.run(get_current_user(make_token(user_id))).username == "vendor"
+
+
+def test_missing_or_invalid_claims_are_rejected_with_401(monkeypatch):
+    monkeypatch.setattr(claims, "AUTH_CLAIMS_MODE", True)
+    monkeypatch.setattr(claims, "versions", claims.UserVersions())
+    user_id = str(uuid.uuid4())
+    tokens = [
+        create_access_token({"sub": user_id, "ver": 0, "email": "vendor@example.com"}),
+        create_access_token(
+            {"sub": user_id, "ver": 0, "username": "vendor", "email": "no es un email"}
+        ),
+        create_access_token(
+            {
+                "sub": user_id,
+                "ver": 0,
+                "username": "vendor",
+                "email": "vendor@example.com",
+                "role_id": "no-uuid",
+                "role": "Vendor",
+            }
+        ),
+        create_access_token({"sub": user_id, "ver": "x"}),
+    ]
+    for token in tokens:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_current_user(token))
+        assert exc.value.status_code == 401
+
+
+def test_versions_store_is_created_on_first_use(monkeypatch):
+    monkeypatch.setattr(claims, "versions", None)
+    monkeypatch.setattr(claims, "AUTH_VERSIONS_REDIS_URL", "")
+    created = []
+    monkeypatch.setattr(claims, "RedisUserVersions", lambda url: created.append(url))
+
+    assert isinstance(
+        claims.create_user_versions("", "", "memory://test"), claims.UserVersions
+    )
+    claims.create_user_versions("", "", "redis://bus:6379/0")
+    assert created == ["redis://bus:6379/0"]
+
+    assert claims.versions is None
+    assert asyncio.run(claims.current_version("u")) == 0
+    assert isinstance(claims.versions, claims.UserVersions)
+    asyncio.run(claims.close_versions())
+    assert claims.versions is None
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.action import ActionState
+from app.services import action as action_service
+from app.services import offline_queue, outbound, socket_service
+from app.services.connection_registry import ConnectionRegistry
+from app.services.offline_queue import OfflineQueue
+from app.services.outbound import OutboundScheduler
+
+
+def test_bulk_action_streams_one_line_per_device(tmp_path, monkeypatch):
+    """Un lote registra sus acciones en una llamada; online se entrega, offline se encola."""
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    monkeypatch.setattr(offline_queue, "_queue", queue)
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(socket_service, "BULK_ACTION_BATCH_SIZE", 2)
+    online = str(uuid.uuid4())
+    offline = [str(uuid.uuid4()) for _ in range(2)]
+    connections = ConnectionRegistry()
+    connections.add("sid", online)
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    batches, updates, emitted = [], [], []
+
+    async def create_actions_bulk(actions_in):
+        batches.append(len(actions_in))
+        return [None] * len(actions_in)
+
+    async def call(event, data, to, timeout):
+        emitted.append(data["device_id"])
+
+    async def update_action(action_id, action_in):
+        updates.append(action_id)
+
+    monkeypatch.setattr(action_service, "create_actions_bulk", create_actions_bulk)
+    monkeypatch.setattr(action_service, "update_action", update_action)
+    monkeypatch.setattr(socket_service.sio, "call", call)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", True)
+
+    body = {
+        "applied_by_id": str(uuid.uuid4()),
+        "command": "block",
+        "device_ids": [online, *offline, online],
+    }
+    with TestClient(app) as client:
+        response = client.post("/api/v1/device-actions/bulk", json=body)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["device_id"]: line["status_code"] for line in lines[:-1]}
+    assert results == {online: 200, offline[0]: 202, offline[1]: 202}
+    assert lines[-1]["summary"] == {
+        "command": "block",
+        "devices": 3,
+        "sent": 1,
+        "Pending": 2,
+    }
+    assert batches == [2, 1] and emitted == [online]
+    assert queue.count() == 2
+
+
+def test_cut_stream_records_an_outcome_for_every_action(monkeypatch):
+    """Al cortarse la respuesta, lo no enviado falla y lo que ya salía se registra al acabar."""
+    devices = [str(uuid.uuid4()) for _ in range(3)]
+    action_ids = {device_id: str(uuid.uuid4()) for device_id in devices}
+    connections = ConnectionRegistry()
+    for device_id in devices:
+        connections.add(f"sid-{device_id}", device_id)
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(socket_service, "BULK_ACTION_CONCURRENCY", 1)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", True)
+    monkeypatch.setattr(outbound, "scheduler", OutboundScheduler())
+    updates = {}
+
+    async def create_actions_bulk(actions_in):
+        return [
+            SimpleNamespace(action_id=action_ids[str(a.device_id)]) for a in actions_in
+        ]
+
+    async def update_action(action_id, action_in):
+        updates[str(action_id)] = action_in.state
+
+    monkeypatch.setattr(action_service, "create_actions_bulk", create_actions_bulk)
+    monkeypatch.setattr(action_service, "update_action", update_action)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def call(event, data, to, timeout):
+            await release.wait()
+
+        monkeypatch.setattr(socket_service.sio, "call", call)
+        stream = socket_service.send_bulk_action(devices, "block", uuid.uuid4())
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        # El cliente se desconecta con el primer envío en curso
+        first.cancel()
+        await asyncio.sleep(0.01)
+        sending = [d for d in devices if action_ids[d] not in updates]
+        release.set()
+        await asyncio.sleep(0.05)
+        return sending
+
+    sending = asyncio.run(scenario())
+    assert len(sending) == 1
+    assert updates[action_ids[sending[0]]] == ActionState.APPLIED
+    assert sorted(updates.values()) == sorted(
+        [ActionState.APPLIED, ActionState.FAILED, ActionState.FAILED]
+    )
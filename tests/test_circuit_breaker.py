@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import circuit_breaker
+from app.services.circuit_breaker import BreakerState, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock):
+    return CircuitBreaker(
+        "payments",
+        window=10,
+        min_calls=4,
+        failure_ratio=0.5,
+        open_seconds=30,
+        half_open_probes=1,
+        clock=clock,
+    )
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(False)
+
+
+def test_breaker_opens_and_fails_fast():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    assert breaker.state == BreakerState.OPEN
+
+    clock.now = 10
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.family == "payments"
+    assert exc_info.value.retry_after == 20
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+
+    clock.now = 31
+    breaker.before_call()
+    assert breaker.state == BreakerState.HALF_OPEN
+    # Solo se permite una prueba simultánea
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == BreakerState.OPEN
+
+    clock.now = 62
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_open_breaker_returns_503_with_retry_after():
+    circuit_breaker.reset_breakers()
+    circuit_breaker.get_breaker("roles")._open()
+    try:
+        with TestClient(app) as client:
+            response = client.get("/api/v1/roles/")
+            assert response.status_code == 503
+            assert int(response.headers["Retry-After"]) > 0
+
+            status = client.get("/api/v1/diagnostics/upstream").json()
+            assert status["breakers"]["roles"]["state"] == "open"
+            assert status["breakers"]["roles"]["rejected"] == 1
+    finally:
+        circuit_breaker.reset_breakers()
@@ -0,0 +1,121 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import socketio
+
+from app.models.action import ActionState
+from app.services import delivery_metrics, offline_queue, outbound, socket_service
+from app.services.connection_registry import ConnectionRegistry
+from app.services.delivery_metrics import LatencyHistogram
+from app.services.offline_queue import OfflineQueue
+from app.services.outbound import OutboundScheduler
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LatencyHistogram(buckets=(10, 100))
+    for value in (3, 8, 50, 400):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"10": 2, "100": 3, "+Inf": 4}
+    assert histogram.quantile(0.5) == 10
+
+
+def test_unacknowledged_command_is_retried_then_reported(monkeypatch):
+    """Tras un timeout se reintenta; sin ack en ningún intento devuelve None."""
+    calls = []
+    acks = {"block": [False, True], "unblock": [False, False, False]}
+
+    async def call(event, data, to, timeout):
+        calls.append(data["command"])
+        if not acks[data["command"]].pop(0):
+            raise socketio.exceptions.TimeoutError()
+
+    monkeypatch.setattr(socket_service.sio, "call", call)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", True)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_RETRIES", 2)
+    connections = ConnectionRegistry()
+    connections.add("sid", "dev")
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    delivery_metrics.reset_stats()
+
+    async def scenario():
+        block = await socket_service.deliver_command("dev", {"command": "block"})
+        unblock = await socket_service.deliver_command("dev", {"command": "unblock"})
+        return block, unblock
+
+    block, unblock = asyncio.run(scenario())
+    assert block is not None and unblock is None
+    assert calls == ["block", "block", "unblock", "unblock", "unblock"]
+    stats = delivery_metrics.get_stats()
+    assert stats["block"]["acked"] == 1 and stats["block"]["retries"] == 1
+    assert stats["block"]["latency"]["count"] == 1
+    assert stats["unblock"]["timeouts"] == 3 and stats["unblock"]["failed"] == 1
+    delivery_metrics.reset_stats()
+
+
+def test_client_without_acks_gets_one_delivery(monkeypatch):
+    """La app que no confirma recibe el comando una vez; la que anuncia acks, con ack."""
+    emits, calls = [], []
+
+    async def emit(event, data, room=None, to=None):
+        emits.append((room, data["command"]))
+
+    async def call(event, data, to, timeout):
+        calls.append((to, data["command"]))
+
+    monkeypatch.setattr(socket_service.sio, "emit", emit)
+    monkeypatch.setattr(socket_service.sio, "call", call)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", False)
+    connections = ConnectionRegistry()
+    connections.add("sid-old", "old")
+    connections.add("sid-new", "new")
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(socket_service.manager, "ack_sids", {"sid-new"})
+
+    async def scenario():
+        old = await socket_service.deliver_command("old", {"command": "block"})
+        new = await socket_service.deliver_command("new", {"command": "block"})
+        return old, new
+
+    old, new = asyncio.run(scenario())
+    assert old == 0.0 and emits == [("old", "block")]
+    assert new is not None and calls == [("sid-new", "block")]
+
+
+def test_dropped_command_goes_back_to_offline_queue(tmp_path, monkeypatch):
+    """Un comando que la cola de salida descarta no cuenta como aplicado."""
+    emits, updates = [], []
+    action_id = uuid.uuid4()
+
+    async def emit(event, data, room=None, to=None):
+        emits.append(data["command"])
+
+    async def create_action(action_in):
+        return SimpleNamespace(action_id=action_id)
+
+    async def update_action(action_id, action_in):
+        updates.append(action_in.state)
+
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    monkeypatch.setattr(offline_queue, "_queue", queue)
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(socket_service.sio, "emit", emit)
+    monkeypatch.setattr(socket_service.action_service, "create_action", create_action)
+    monkeypatch.setattr(socket_service.action_service, "update_action", update_action)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", False)
+    # Cola de salida sin sitio: todo envío se descarta
+    monkeypatch.setattr(outbound, "scheduler", OutboundScheduler(max_depth=0))
+    device_id = uuid.uuid4()
+    connections = ConnectionRegistry()
+    connections.add("sid", str(device_id))
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(socket_service.manager, "ack_sids", set())
+
+    response = asyncio.run(
+        socket_service.send_and_log_action(device_id, "block", uuid.uuid4())
+    )
+    assert response.status_code == 202 and emits == []
+    assert updates == [ActionState.PENDING] and queue.count(str(device_id)) == 1
@@ -0,0 +1,36 @@
+from app.services.connection_registry import ConnectionRegistry
+
+
+def test_registry_indexes_by_sid_device_and_store():
+    registry = ConnectionRegistry()
+    assert registry.add("s1", "dev-1", "store-a")
+    assert not registry.add("s2", "dev-1", "store-a")
+    assert registry.add("s3", "dev-2", "store-a")
+    assert registry.add("s4", "dev-3")
+
+    assert registry.device_of("s2") == "dev-1"
+    assert registry.sids("dev-1") == ["s1", "s2"]
+    assert registry.store_devices("store-a") == {"dev-1", "dev-2"}
+    assert len(registry) == 3 and registry.connection_count() == 4
+
+    assert registry.remove("s1").device_id == "dev-1"
+    assert "dev-1" in registry and registry.store_devices("store-a") == {
+        "dev-1",
+        "dev-2",
+    }
+    registry.remove("s2")
+    assert "dev-1" not in registry and registry.store_devices("store-a") == {"dev-2"}
+    assert registry.remove("s2") is None
+    registry.remove("s3")
+    assert registry.stores() == {}
+
+
+def test_rejoin_with_same_sid_moves_the_connection():
+    """Un SID que vuelve a identificarse con otro dispositivo deja el anterior."""
+    registry = ConnectionRegistry()
+    registry.add("s1", "dev-1", "store-a")
+    assert not registry.add("s1", "dev-1", "store-a")
+    assert registry.add("s1", "dev-2", "store-b")
+    assert "dev-1" not in registry
+    assert registry.stores() == {"store-b": 1}
+    assert registry.connection_count() == 1
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+
+from app.services import dataloader, upstream
+
+
+def test_loads_in_same_tick_are_batched_and_memoized():
+    """Las cargas concurrentes salen en un solo lote y se memorizan en la petición."""
+    batches = []
+
+    async def load_items(ids):
+        batches.append(ids)
+        return {item_id: {"id": item_id} for item_id in ids if item_id != "missing"}
+
+    async def scenario():
+        token = dataloader.start_request_scope()
+        try:
+            loader = dataloader.get_loader(load_items)
+            results = await asyncio.gather(
+                loader.load("a"),
+                loader.load("b"),
+                loader.load("a"),
+                loader.load("missing"),
+            )
+            again = await dataloader.get_loader(load_items).load("b")
+            dataloader.forget(load_items, "b")
+            await dataloader.get_loader(load_items).load("b")
+            return results, again
+        finally:
+            dataloader.end_request_scope(token)
+
+    results, again = asyncio.run(scenario())
+
+    assert batches == [["a", "b", "missing"], ["b"]]
+    assert results == [{"id": "a"}, {"id": "b"}, {"id": "a"}, None]
+    assert again == {"id": "b"}
+
+
+def test_fetch_by_ids_falls_back_to_fan_out_without_bulk_route():
+    """Si la DB-API no acepta ``?ids=``, cada ID se pide por separado."""
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path == "/api/v1/things/":
+            return httpx.Response(404)
+        return httpx.Response(
+            200, json={"thing_id": request.url.path.rsplit("/", 1)[-1]}
+        )
+
+    async def fetch_one(thing_id):
+        async with upstream.client_session() as client:
+            response = await client.get(f"http://db/api/v1/things/{thing_id}")
+        return response.json()
+
+    async def scenario():
+        upstream._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            first = await dataloader.fetch_by_ids(
+                "http://db/api/v1/things/", ["1", "2"], fetch_one, id_field="thing_id"
+            )
+            second = await dataloader.fetch_by_ids(
+                "http://db/api/v1/things/", ["3", "4"], fetch_one, id_field="thing_id"
+            )
+            return first, second
+        finally:
+            await upstream.close_client()
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {"1": {"thing_id": "1"}, "2": {"thing_id": "2"}}
+    assert second == {"3": {"thing_id": "3"}, "4": {"thing_id": "4"}}
+    # La ruta agrupada solo se intenta la primera vez
+    assert paths.count("/api/v1/things/") == 1
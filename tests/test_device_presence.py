@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import device_presence, socket_service
+from app.services.connection_registry import ConnectionRegistry
+from app.services.device_presence import PresenceTracker
+from app.utils.timing_wheel import TimingWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timing_wheel_expires_after_full_rounds_and_reschedules():
+    wheel = TimingWheel(tick=1.0, slots=4)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 6)  # más de una vuelta
+    expired = [wheel.advance() for _ in range(6)]
+    assert expired == [[], ["a"], [], [], [], ["b"]]
+
+    wheel.schedule("c", 2)
+    wheel.advance()
+    wheel.schedule("c", 2)  # un heartbeat lo aplaza
+    assert wheel.advance() == [] and wheel.advance() == ["c"]
+    wheel.schedule("d", 1)
+    assert wheel.cancel("d") and wheel.advance() == [] and len(wheel) == 0
+
+
+def test_tracker_records_sessions_heartbeats_and_expiry():
+    clock = FakeClock()
+    tracker = PresenceTracker(heartbeat_timeout=2, tick=1, retention=60, clock=clock)
+    closed = []
+
+    async def on_expire(sid):
+        closed.append(sid)
+        tracker.disconnected(sid, "dev-1")
+
+    tracker.on_expire = on_expire
+    tracker.connected("s1", "dev-1", "store-a")
+    tracker.connected("s2", "dev-2", "store-a")
+    tracker.connected("s3", "dev-3", "store-b")
+    clock.now += 5
+    tracker.heartbeat("s1", "dev-1")
+    tracker.disconnected("s2", "dev-2")
+
+    total, page = tracker.query(store_id="store-a", online=True)
+    assert total == 1 and page[0].device_id == "dev-1"
+    assert page[0].last_seen == 1005.0 and page[0].connected_at == 1000.0
+    assert [r.device_id for r in tracker.query(skip=1, limit=1)[1]] == ["dev-2"]
+
+    # dev-3 nunca envió heartbeat: no vence; dev-1 sí
+    asyncio.run(tracker.expire(tracker._wheel.advance()))
+    assert closed == []
+    asyncio.run(tracker.expire(tracker._wheel.advance()))
+    assert closed == ["s1"] and not tracker.get("dev-1").online
+    assert tracker.get("dev-3").online
+
+    clock.now += 61
+    assert tracker.purge() == 2
+    assert tracker.query(store_id="store-a") == (0, [])
+
+
+def test_presence_endpoints(monkeypatch):
+    clock = FakeClock()
+    tracker = PresenceTracker(clock=clock)
+    tracker.connected("s1", "dev-1", "store-a")
+    tracker.connected("s2", "dev-2", "store-b")
+    monkeypatch.setattr("app.api.endpoints.presence.tracker", tracker)
+    monkeypatch.setattr(device_presence, "tracker", tracker)
+    connections = ConnectionRegistry()
+    connections.add("s2", "dev-2", "store-b")
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+
+    class SharedPresence:
+        async def is_online(self, device_id):
+            return device_id == "dev-1"
+
+        async def online(self, device_ids):
+            return {device_id for device_id in device_ids if device_id == "dev-1"}
+
+    monkeypatch.setattr(socket_service.manager, "presence", SharedPresence())
+
+    client = TestClient(app)
+    response = client.get(
+        "/api/v1/presence", params={"store_id": "store-b", "online": True}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 1 and body["items"][0]["device_id"] == "dev-2"
+    assert body["items"][0]["last_seen"].startswith("1970-01-01T00:16:40")
+
+    assert body["items"][0]["online"] is True
+
+    # dev-1 sigue conectado según el registro compartido (p. ej. ya en otro worker)
+    assert client.get("/api/v1/presence/dev-1").json()["online"] is True
+    tracker.disconnected("s1", "dev-1")
+    items = client.get("/api/v1/presence").json()["items"]
+    assert [item["online"] for item in items] == [True, True]
+    assert client.get("/api/v1/presence/unknown").status_code == 404
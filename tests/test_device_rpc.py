@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+
+import socketio
+
+from app.models.location import LocationDB
+from app.services import action_log, device_rpc, socket_service
+from app.services.connection_registry import ConnectionRegistry
+
+
+def _setup(monkeypatch, reply):
+    device_id = uuid.uuid4()
+    saved, recorded, queued = [], [], []
+
+    async def call(event, data, to, timeout):
+        assert data["reply"] is True and data["command"] == "locate"
+        if reply is None:
+            raise socketio.exceptions.TimeoutError()
+        return dict(reply, correlation_id=data["correlation_id"])
+
+    async def create_location(location_in):
+        saved.append((location_in.latitude, location_in.longitude))
+
+    async def get_location_by_device(dev):
+        return LocationDB(
+            location_id=uuid.uuid4(),
+            device_id=dev,
+            latitude=1.5,
+            longitude=2.5,
+            created_at=datetime(2024, 1, 1),
+        )
+
+    async def queue_for_later(dev, command, applied_by_id, payload):
+        queued.append(command)
+
+    connections = ConnectionRegistry()
+    connections.add("sid", str(device_id))
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(socket_service.manager, "ack_sids", {"sid"})
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", False)
+    monkeypatch.setattr(socket_service.sio, "call", call)
+    monkeypatch.setattr(device_rpc.location_service, "create_location", create_location)
+    monkeypatch.setattr(
+        device_rpc.location_service, "get_location_by_device", get_location_by_device
+    )
+    monkeypatch.setattr(device_rpc, "_queue_for_later", queue_for_later)
+    monkeypatch.setattr(action_log, "ACTION_LOG_WRITE_BEHIND", True)
+    monkeypatch.setattr(action_log.writer, "record", recorded.append)
+    monkeypatch.setattr(device_rpc, "_last_reports", {})
+    return device_id, saved, recorded, queued
+
+
+def _locate(device_id):
+    async def scenario():
+        response = await device_rpc.locate(device_id, uuid.uuid4(), timeout=1)
+        await asyncio.sleep(0)  # guardado de la ubicación en segundo plano
+        return response
+
+    response = asyncio.run(scenario())
+    return response.status_code, json.loads(response.body)
+
+
+def test_locate_returns_device_reply(monkeypatch):
+    reply = {
+        "location": {"latitude": 4.7, "longitude": -74.1},
+        "battery": 80,
+        "locked": True,
+    }
+    device_id, saved, recorded, queued = _setup(monkeypatch, reply)
+
+    status, body = _locate(device_id)
+    assert status == 200 and body["source"] == "device"
+    assert (
+        body["location"]["latitude"] == 4.7 and body["battery"] == 80 and body["locked"]
+    )
+    assert saved == [(4.7, -74.1)] and len(recorded) == 1 and queued == []
+    assert device_rpc._last_reports[str(device_id)]["battery"] == 80
+
+
+def test_locate_falls_back_to_last_known(monkeypatch):
+    """Sin respuesta: ubicación guardada y el locate queda en la cola offline."""
+    device_id, saved, recorded, queued = _setup(monkeypatch, None)
+
+    status, body = _locate(device_id)
+    assert status == 200 and body["source"] == "last_known"
+    assert body["location"]["latitude"] == 1.5 and body["battery"] is None
+    assert queued == ["locate"] and saved == [] and recorded == []
+
+    # La última respuesta del dispositivo tiene prioridad sobre la DB-API
+    device_rpc._last_reports[str(device_id)] = device_rpc.parse_report(
+        {"location": {"latitude": 9, "longitude": 9}, "battery": 5}
+    )
+    status, body = _locate(device_id)
+    assert body["location"]["latitude"] == 9.0 and body["battery"] == 5
+
+
+def test_locate_to_device_without_acks_is_sent_once(monkeypatch):
+    """Una app que no confirma recibe el locate una vez y no se espera ni se reencola."""
+    device_id, saved, recorded, queued = _setup(monkeypatch, None)
+    monkeypatch.setattr(socket_service.manager, "ack_sids", set())
+    emits = []
+
+    async def emit(event, data, room=None, to=None):
+        emits.append((room, data["command"]))
+
+    monkeypatch.setattr(socket_service.sio, "emit", emit)
+
+    start = time.perf_counter()
+    status, body = _locate(device_id)
+    assert time.perf_counter() - start < 0.5
+    assert status == 200 and body["source"] == "last_known"
+    assert emits == [(str(device_id), "locate")]
+    assert queued == [] and len(recorded) == 1
@@ -0,0 +1,104 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.location import CityDB, CountryDB, RegionDB
+from app.services import location as location_service
+from app.services import location_catalog
+from app.services.prefix_index import PrefixIndex
+
+
+def test_catalog_serves_tree_and_subtrees_from_snapshot(monkeypatch):
+    """El árbol sale de la caché de referencia y se rehace tras invalidar."""
+    country = CountryDB(
+        country_id=uuid.uuid4(), code="CO", name="Colombia", prefix="+57"
+    )
+    region = RegionDB(
+        region_id=uuid.uuid4(), name="Antioquia", country_id=country.country_id
+    )
+    cities = [
+        CityDB(city_id=uuid.uuid4(), name="Medellín", region_id=region.region_id),
+        CityDB(city_id=uuid.uuid4(), name="Envigado", region_id=region.region_id),
+    ]
+    loads = []
+
+    def loader(name, items):
+        async def load():
+            loads.append(name)
+            return list(items)
+
+        return load
+
+    monkeypatch.setattr(
+        location_service.countries_cache, "_load", loader("countries", [country])
+    )
+    monkeypatch.setattr(
+        location_service.regions_cache, "_load", loader("regions", [region])
+    )
+    monkeypatch.setattr(
+        location_service.cities_cache, "_load", loader("cities", cities)
+    )
+    location_service._invalidate_countries()
+    monkeypatch.setattr(location_catalog, "_snapshot", None)
+
+    with TestClient(app) as client:
+        response = client.get("/api/v1/locations/catalog")
+        assert response.status_code == 200
+        tree = response.json()
+        assert tree[0]["name"] == "Colombia"
+        assert [c["name"] for c in tree[0]["regions"][0]["cities"]] == [
+            "Envigado",
+            "Medellín",
+        ]
+        etag = response.headers["ETag"]
+
+        again = client.get("/api/v1/locations/catalog", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+
+        subtree = client.get(
+            "/api/v1/locations/catalog", params={"region_id": str(region.region_id)}
+        )
+        assert subtree.json()["name"] == "Antioquia"
+        missing = client.get(
+            "/api/v1/locations/catalog", params={"country_id": str(uuid.uuid4())}
+        )
+        assert missing.status_code == 404
+        assert loads.count("cities") == 1
+
+        cities.append(
+            CityDB(city_id=uuid.uuid4(), name="Bello", region_id=region.region_id)
+        )
+        location_service.cities_cache.invalidate()
+        rebuilt = client.get(
+            "/api/v1/locations/catalog", headers={"If-None-Match": etag}
+        )
+        assert rebuilt.status_code == 200
+        assert len(rebuilt.json()[0]["regions"][0]["cities"]) == 3
+
+        found = client.get("/api/v1/cities/search", params={"q": "mede"}).json()
+        assert [(c["name"], c["region"], c["country"]) for c in found] == [
+            ("Medellín", "Antioquia", "Colombia")
+        ]
+        by_code = client.get("/api/v1/countries/search", params={"q": "co"}).json()
+        assert [c["name"] for c in by_code] == ["Colombia"]
+        assert loads.count("cities") == 2
+
+    location_service._invalidate_countries()
+
+
+def test_prefix_index_ignores_accents_and_ranks_full_names_first():
+    index = PrefixIndex(
+        [
+            (("Bogotá",), "bogota"),
+            (("Santa Marta",), "santa-marta"),
+            (("Martinica",), "martinica"),
+            (("Medellín",), "medellin"),
+        ]
+    )
+    assert index.search("BOGO") == ["bogota"]
+    assert index.search("medellin") == ["medellin"]
+    assert index.search("mar") == ["martinica", "santa-marta"]
+    assert index.search("mar", limit=1) == ["martinica"]
+    assert index.search("x") == []
+    assert index.search("  ") == []
@@ -0,0 +1,115 @@
+import asyncio
+
+from app.models.action import ActionState
+from app.services import offline_queue, socket_service
+from app.services.connection_registry import ConnectionRegistry
+from app.services.offline_queue import OfflineQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_queue_collapses_bounds_and_expires(tmp_path):
+    clock = FakeClock()
+    queue = OfflineQueue(
+        str(tmp_path / "queue.db"), max_per_device=3, ttl=60, clock=clock
+    )
+
+    assert queue.push("dev", "block", None, "a1", "t1") == []
+    # unblock anula el block pendiente
+    assert queue.push("dev", "unblock", None, "a2", "t2") == [
+        ("a1", "Superseded by a later 'unblock' command.")
+    ]
+    queue.push("dev", "notify", {"n": 1}, "a3", "t3")
+    queue.push("dev", "notify", {"n": 2}, "a4", "t4")
+    # Al superar el máximo se descarta el más antiguo
+    assert [a for a, _ in queue.push("other", "locate", None, "b1", "t5")] == []
+    dropped = queue.push("dev", "notify", {"n": 3}, "a5", "t6")
+    assert [a for a, _ in dropped] == ["a2"]
+
+    due, expired = queue.pending("dev")
+    assert [item.payload["n"] for item in due] == [1, 2, 3] and expired == []
+
+    # Persiste entre instancias (reinicio del gateway) y caduca con el TTL
+    queue.close()
+    clock.now += 61
+    reopened = OfflineQueue(str(tmp_path / "queue.db"), ttl=60, clock=clock)
+    due, expired = reopened.pending("dev")
+    assert due == [] and [item.action_id for item in expired] == ["a3", "a4", "a5"]
+    assert reopened.count("dev") == 0 and reopened.count() == 1
+
+
+def test_collapse_skips_commands_being_delivered(tmp_path):
+    """Un comando que un vaciado está entregando no se colapsa ni se descarta."""
+    queue = OfflineQueue(str(tmp_path / "queue.db"), max_per_device=1)
+    queue.push("dev", "block", None, "a1", "t1")
+    (claimed,), _ = queue.pending("dev")
+
+    assert queue.push("dev", "unblock", None, "a2", "t2") == []
+    assert queue.count("dev") == 2
+    queue.ack([claimed.id])
+
+    # Liberado, el siguiente vuelve a colapsar lo pendiente
+    (second,), _ = queue.pending("dev")
+    queue.release([second.id])
+    assert queue.push("dev", "block", None, "a3", "t3") == [
+        ("a2", "Superseded by a later 'block' command.")
+    ]
+
+
+def test_workers_sharing_the_file_claim_devices(tmp_path):
+    """Con el fichero compartido, cada comando lo entrega un solo worker."""
+    clock = FakeClock()
+    path = str(tmp_path / "queue.db")
+    first = OfflineQueue(path, clock=clock, claim_ttl=60, owner="w1")
+    second = OfflineQueue(path, clock=clock, claim_ttl=60, owner="w2")
+    first.push("dev", "notify", {"n": 1}, "a1", "t1")
+    (claimed,), _ = first.pending("dev")
+
+    # Lo nuevo espera a que el worker que vacía el dispositivo lo recoja
+    second.push("dev", "notify", {"n": 2}, "a2", "t2")
+    assert second.pending("dev") == ([], [])
+    # Solo el dueño de la reserva puede liberarla
+    second.release([claimed.id])
+    assert second.pending("dev") == ([], [])
+    first.ack([claimed.id])
+    assert [item.payload["n"] for item in first.pending("dev")[0]] == [2]
+
+    # Si el dueño cae, su reserva vence y otro worker la recoge
+    clock.now += 61
+    assert [item.payload["n"] for item in second.pending("dev")[0]] == [2]
+
+
+def test_join_room_flushes_queue_in_order(tmp_path, monkeypatch):
+    queue = OfflineQueue(str(tmp_path / "queue.db"))
+    monkeypatch.setattr(offline_queue, "_queue", queue)
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_ENABLED", True)
+    sent, updates = [], []
+
+    async def call(event, data, to, timeout):
+        sent.append((to, event, data["command"]))
+
+    async def update_action(action_id, action_in):
+        updates.append((str(action_id), action_in.state))
+
+    monkeypatch.setattr(socket_service.sio, "call", call)
+    monkeypatch.setattr(socket_service, "COMMAND_ACK_ENABLED", True)
+    monkeypatch.setattr(socket_service.action_service, "update_action", update_action)
+    connections = ConnectionRegistry()
+    connections.add("sid", "dev")
+    monkeypatch.setattr(socket_service.manager, "connections", connections)
+
+    ids = ["00000000-0000-0000-0000-00000000000%d" % i for i in range(1, 4)]
+    queue.push("dev", "block", None, ids[0], "t1")
+    queue.push("dev", "notify", {"title": "Pago"}, ids[1], "t2")
+    queue.push("dev", "locate", None, ids[2], "t3")
+
+    assert asyncio.run(socket_service.flush_offline_queue("dev")) == 3
+    assert [command for _, _, command in sent] == ["block", "notify", "locate"]
+    assert sorted(updates) == [(i, ActionState.APPLIED) for i in ids]
+    assert queue.count("dev") == 0
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.services import outbound
+from app.services.outbound import (
+    LANE_COMMAND,
+    LANE_CRITICAL,
+    LANE_NOTIFY,
+    OutboundScheduler,
+)
+
+
+def test_lanes_coalescing_and_backpressure():
+    """Un envío en curso retiene la cola salvo lo crítico, que no lo espera; locate se envía una vez."""
+    scheduler = OutboundScheduler(max_depth=3, max_wait=60)
+    sent = []
+    gate = asyncio.Event()
+
+    def transport(name):
+        async def send():
+            if name == "first":
+                await gate.wait()
+            sent.append(name)
+            return name
+
+        return send
+
+    async def scenario():
+        first = scheduler.submit("dev", transport("first"), LANE_NOTIFY)
+        await asyncio.sleep(0)  # en vuelo, esperando al gate
+        notify = scheduler.submit("dev", transport("notify"), LANE_NOTIFY)
+        locate = scheduler.submit(
+            "dev", transport("locate"), LANE_COMMAND, key="locate"
+        )
+        again = scheduler.submit(
+            "dev", transport("locate-2"), LANE_COMMAND, key="locate"
+        )
+        block = scheduler.submit("dev", transport("block"), LANE_CRITICAL)
+        # Cola llena (3): el desbloqueo desplaza a la notificación y otra
+        # notificación ya no cabe
+        unblock = scheduler.submit("dev", transport("unblock"), LANE_CRITICAL)
+        late = scheduler.submit("dev", transport("late"), LANE_NOTIFY)
+        assert scheduler.depth("dev") == 3
+        await asyncio.sleep(0)
+        # Lo crítico sale sin esperar al envío en curso
+        assert sent == ["block", "unblock"]
+        gate.set()
+        return await asyncio.gather(first, notify, locate, again, block, unblock, late)
+
+    results = asyncio.run(scenario())
+    assert sent == ["block", "unblock", "first", "locate"]
+    assert results == ["first", None, "locate", "locate", "block", "unblock", None]
+    lanes = scheduler.snapshot()["lanes"]
+    assert lanes["command"]["coalesced"] == 1
+    assert lanes["notify"]["dropped"] == 2 and lanes["critical"]["sent"] == 2
+    assert scheduler.snapshot()["queued"] == 0
+
+
+def test_cancelled_transport_resolves_waiting_sends():
+    """Si el envío en curso se cancela (p. ej. al apagar), él y los que esperan devuelven None."""
+    scheduler = OutboundScheduler(max_depth=10, max_wait=60)
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def send():
+        return True
+
+    async def scenario():
+        first = scheduler.submit("dev", cancelled, LANE_COMMAND)
+        second = scheduler.submit("dev", send, LANE_NOTIFY)
+        results = await asyncio.wait_for(asyncio.gather(first, second), 1)
+        return results, scheduler.snapshot()["queued"]
+
+    assert asyncio.run(scenario()) == ([None, None], 0)
+
+
+def test_expired_messages_are_not_sent():
+    scheduler = OutboundScheduler(max_depth=10, max_wait=0)
+    sent = []
+
+    async def send():
+        sent.append(True)
+        return True
+
+    async def scenario():
+        first = scheduler.submit("dev", send, LANE_COMMAND)
+        await asyncio.sleep(0.01)
+        return await first
+
+    assert asyncio.run(scenario()) is None and sent == []
+    assert scheduler.snapshot()["lanes"]["command"]["expired"] == 1
+
+
+def test_lane_for_commands():
+    assert outbound.lane_for("action", "block") == LANE_CRITICAL
+    assert outbound.lane_for("action", "locate") == LANE_COMMAND
+    assert outbound.lane_for("action", "notify") == LANE_NOTIFY
+    assert outbound.lane_for("message") == LANE_NOTIFY
+    assert outbound.coalesce_key("refresh", {}) == "refresh"
+    assert outbound.coalesce_key("locate", {"accuracy": "high"}) is None
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth.security import PasswordHashPool
+
+
+def test_excess_password_checks_are_rejected_fast():
+    """Por encima del límite de admisión se responde 503 sin esperar."""
+    pool = PasswordHashPool(workers=1, max_pending=1, queue_timeout=5)
+
+    async def scenario():
+        slow = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await pool.run(time.sleep, 0.2)
+        await slow
+        return exc.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert pool.rejected == 1 and pool.pending == 0
+
+
+def test_queue_timeout_rejects_waiting_checks():
+    """Si no queda un hilo libre a tiempo, la verificación en espera recibe 503."""
+    pool = PasswordHashPool(workers=1, max_pending=10, queue_timeout=0.05)
+
+    async def scenario():
+        return await asyncio.gather(
+            pool.run(time.sleep, 0.2), pool.run(time.sleep, 0.2), return_exceptions=True
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first is None
+    assert isinstance(second, HTTPException) and second.status_code == 503
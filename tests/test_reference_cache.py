@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.role import Role
+from app.services import role as role_service
+from app.services.reference_cache import ReferenceCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_roles(*names):
+    return [Role(role_id=uuid.uuid4(), name=name) for name in names]
+
+
+def test_stale_list_is_served_while_refreshing():
+    """Pasado el TTL se sirve la copia anterior y se refresca en segundo plano."""
+    clock = FakeClock()
+    versions = [make_roles("Admin"), make_roles("Admin", "Vendor")]
+    loads = []
+
+    async def load():
+        loads.append(clock.now)
+        return versions[len(loads) - 1]
+
+    cache = ReferenceCache(
+        "roles", load, id_field="role_id", ttl=10, stale=100, clock=clock
+    )
+
+    async def scenario():
+        first = await cache.get_all()
+        clock.now = 5
+        assert await cache.get_all() is first
+        clock.now = 20
+        stale = await cache.get_all()
+        await asyncio.sleep(0)
+        fresh = await cache.get_all()
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(scenario())
+    assert stale is first
+    assert [role.name for role in fresh] == ["Admin", "Vendor"]
+    assert loads == [0, 20]
+
+
+def test_role_list_is_filtered_locally_and_served_with_etag(monkeypatch):
+    """Los filtros no van a la DB-API y un ETag vigente responde 304."""
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return make_roles("Admin", "Superadmin", "Vendor")
+
+    monkeypatch.setattr(role_service.roles_cache, "_load", load)
+    role_service.roles_cache.invalidate()
+
+    with TestClient(app) as client:
+        response = client.get("/api/v1/roles/", params={"name": "admin"})
+        assert response.status_code == 200
+        assert [role["name"] for role in response.json()] == ["Admin", "Superadmin"]
+        etag = response.headers["ETag"]
+
+        again = client.get(
+            "/api/v1/roles/", params={"name": "admin"}, headers={"If-None-Match": etag}
+        )
+        assert again.status_code == 304
+        other = client.get("/api/v1/roles/", headers={"If-None-Match": etag})
+        assert other.status_code == 200
+
+    assert loads == [1]
+    role_service.roles_cache.invalidate()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+from app.services import outbound, replay, socket_service, storm_control
+from app.services.connection_registry import ConnectionRegistry
+from app.services.outbound import OutboundScheduler
+from app.services.replay import ReplayLog
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sequence_and_bounded_buffer():
+    """Solo se reenvía lo posterior a lastSeq; si algo salió del búfer hay que resincronizar."""
+    clock = FakeClock()
+    log = ReplayLog(size=3, ttl=60, clock=clock)
+
+    sent = [log.stamp("dev", "message", {"n": n}) for n in range(1, 3)]
+    command = log.stamp("dev", "action", {"command": "block"}, buffered=False)
+    assert [data["seq"] for data in sent] == [1, 2] and command["seq"] == 3
+    assert log.last_seq("dev") == 3
+
+    events, complete = log.missed("dev", 1, log.epoch)
+    assert events == [("message", {"n": 2, "seq": 2})] and complete
+
+    for n in range(4, 8):
+        log.stamp("dev", "message", {"n": n})
+    events, complete = log.missed("dev", 1, log.epoch)
+    assert [data["seq"] for _, data in events] == [5, 6, 7] and not complete
+    assert log.missed("dev", 4, log.epoch)[1]
+
+    # Vencidos por TTL, de otro epoch o de una secuencia que no existe
+    clock.now += 61
+    assert log.missed("dev", 6, log.epoch) == ([], False)
+    assert log.missed("dev", 7, log.epoch) == ([], True)
+    assert log.missed("dev", 7, "other") == ([], False)
+    assert log.missed("dev", 50, log.epoch) == ([], False)
+    assert log.missed("new", 0, log.epoch) == ([], True)
+
+
+def test_purge_forgets_idle_disconnected_devices():
+    clock = FakeClock()
+    log = ReplayLog(size=3, ttl=60, clock=clock)
+    for device_id in ("gone", "online", "recent"):
+        log.stamp(device_id, "message", {"n": 1})
+    clock.now += 50
+    log.stamp("recent", "message", {"n": 2})
+    clock.now += 11
+
+    assert log.purge(connected={"online"}) == 1
+    assert log.snapshot()["devices"] == 2
+    assert log.last_seq("online") == 1 and log.last_seq("recent") == 2
+    # El olvidado vuelve con un lastSeq que ya no existe: debe resincronizar
+    assert log.missed("gone", 1, log.epoch) == ([], False)
+    assert log.stamp("gone", "message", {})["seq"] == 1
+
+
+def test_reconnect_receives_missed_messages(monkeypatch):
+    sio = socket_service.sio
+    sent = []
+
+    async def send(eio_sid, data):
+        sent.append((eio_sid, data))
+
+    async def send_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, eio_pkt.data))
+
+    async def flush_offline_queue(device_id):
+        return 0
+
+    monkeypatch.setattr(sio.eio, "send", send)
+    monkeypatch.setattr(sio.eio, "send_packet", send_packet)
+    monkeypatch.setattr(socket_service, "flush_offline_queue", flush_offline_queue)
+    monkeypatch.setattr(socket_service.manager, "connections", ConnectionRegistry())
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(
+        storm_control, "admission", storm_control.AdmissionControl(rate=0)
+    )
+    monkeypatch.setattr(replay, "log", ReplayLog())
+    monkeypatch.setattr(outbound, "scheduler", OutboundScheduler())
+
+    async def scenario():
+        # Mientras el dispositivo está desconectado
+        for n in (1, 2, 3):
+            await socket_service.manager.send_to_device("dev-1", "message", {"n": n})
+        auth = {"deviceId": "dev-1", "lastSeq": 1, "epoch": replay.log.epoch}
+        await sio._handle_eio_connect("e1", {"QUERY_STRING": "EIO=4"})
+        await sio._handle_eio_message("e1", "0" + json.dumps(auth))
+        await asyncio.sleep(0.01)
+        await sio._handle_eio_disconnect("e1")
+
+    asyncio.run(scenario())
+    events = [json.loads(data[1:]) for _, data in sent if data.startswith("2")]
+    welcome = events[0][1]
+    assert welcome["type"] == "connection_success" and welcome["last_seq"] == 3
+    assert welcome["replayed"] == 2 and welcome["resync"] is False
+    assert events[1:] == [
+        ["message", {"n": 2, "seq": 2}],
+        ["message", {"n": 3, "seq": 3}],
+    ]
+    # Lo perdido sale por la cola de salida del dispositivo
+    assert outbound.scheduler.snapshot()["lanes"]["notify"]["sent"] == 2
+
+
+class RemotePresence:
+    """Presencia compartida en la que el dispositivo está en otro worker."""
+
+    async def is_online(self, device_id):
+        return True
+
+
+def test_only_the_socket_owner_stamps(monkeypatch):
+    emitted = []
+
+    async def emit(event, data, room=None, to=None):
+        emitted.append(data)
+
+    monkeypatch.setattr(socket_service.sio, "emit", emit)
+    monkeypatch.setattr(socket_service.manager, "connections", ConnectionRegistry())
+    monkeypatch.setattr(socket_service.manager, "presence", RemotePresence())
+    monkeypatch.setattr(replay, "log", ReplayLog())
+    monkeypatch.setattr(outbound, "scheduler", OutboundScheduler())
+
+    async def scenario():
+        await socket_service.manager.send_to_device("dev-1", "message", {"n": 1})
+        socket_service.manager.connections.add("sid-1", "dev-1")
+        await socket_service.manager.send_to_device("dev-1", "message", {"n": 2})
+
+    asyncio.run(scenario())
+    # Desde otro worker va sin seq; el dueño del socket numera desde 1
+    assert emitted == [{"n": 1}, {"n": 2, "seq": 1}]
+    assert replay.log.missed("dev-1", 0, replay.log.epoch)[0] == [
+        ("message", {"n": 2, "seq": 1})
+    ]
@@ -0,0 +1,48 @@
+import asyncio
+
+from app.services import singleflight
+
+
+def test_concurrent_identical_reads_share_one_call():
+    """Las llamadas concurrentes con los mismos argumentos se fusionan."""
+    calls = []
+
+    @singleflight.coalesce
+    async def fetch(resource_id, params=None):
+        calls.append(resource_id)
+        await asyncio.sleep(0.01)
+        return {"id": resource_id}
+
+    async def scenario():
+        results = await asyncio.gather(
+            *[fetch("a", params={"x": 1}) for _ in range(5)], fetch("b")
+        )
+        # Terminada la llamada, la siguiente vuelve a salir upstream
+        await fetch("a", params={"x": 1})
+        return results
+
+    singleflight.reset_stats()
+    results = asyncio.run(scenario())
+
+    assert calls == ["a", "b", "a"]
+    assert results[0] is results[4]
+    stats = singleflight.get_stats()["test_singleflight.fetch"]
+    assert stats == {"calls": 7, "executions": 3, "merged": 4, "in_flight": 0}
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    """Cancelar a un llamador no afecta a los demás que esperan."""
+
+    @singleflight.coalesce
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.ensure_future(slow())
+        second = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
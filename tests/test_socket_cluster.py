@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+import socketio
+
+from app.services import presence, socket_service
+from app.services.presence import LocalPresence
+from app.services.socket_cluster import create_client_manager
+
+
+def _node(channel, sent):
+    """Servidor Socket.IO que registra lo que enviaría a sus clientes."""
+    server = socketio.AsyncServer(
+        async_mode="asgi", client_manager=create_client_manager(channel)
+    )
+
+    async def send_eio_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, eio_pkt.data, None))
+
+    async def send_packet(eio_sid, pkt):
+        sent.append((eio_sid, pkt.data, pkt.id))
+
+    server._send_eio_packet = send_eio_packet
+    server._send_packet = send_packet
+    server.manager.initialize()
+    return server
+
+
+def test_emit_and_ack_cross_nodes_through_shared_manager():
+    """Un emit o un call en el nodo A llega al dispositivo conectado al nodo B."""
+
+    async def scenario():
+        sent_a, sent_b = [], []
+        node_a = _node("memory://cluster-test", sent_a)
+        node_b = _node("memory://cluster-test", sent_b)
+        await asyncio.sleep(0.01)  # los listeners se suscriben al canal
+        sid = await node_b.manager.connect("eio-1", "/")
+        await node_b.manager.enter_room(sid, "/", "dev-1")
+
+        await node_a.emit("message", {"text": "hola"}, room="dev-1")
+        await asyncio.sleep(0.01)
+        assert sent_a == []
+        assert sent_b == [("eio-1", '2["message",{"text":"hola"}]', None)]
+
+        async def ack_from_device():
+            while len(sent_b) < 2:
+                await asyncio.sleep(0.005)
+            _, data, ack_id = sent_b[1]
+            assert data == ["action", {"command": "block"}]
+            await node_b.manager.trigger_callback(sid, ack_id, [True])
+
+        acking = asyncio.ensure_future(ack_from_device())
+        result = await node_a.call("action", {"command": "block"}, to=sid, timeout=1)
+        await acking
+        assert result is True
+
+    asyncio.run(scenario())
+
+
+def test_presence_is_shared_between_managers():
+    async def scenario():
+        store = {}
+        node_a = socket_service.ConnectionManager(presence=LocalPresence(store))
+        node_b = socket_service.ConnectionManager(presence=LocalPresence(store))
+        await node_b.presence.add("dev-1", "sid-b")
+        node_b.connections.add("sid-b", "dev-1")
+        await node_a.presence.add("dev-2", "sid-a")
+        node_a.connections.add("sid-a", "dev-2")
+
+        assert await node_a.is_online("dev-1")
+        assert await node_a.device_sids("dev-1") == ["sid-b"]
+        assert await node_a.online_devices(["dev-1", "dev-2", "dev-3"]) == {
+            "dev-1",
+            "dev-2",
+        }
+        assert await node_a.count_devices() == 2 and node_a.total_devices() == 1
+
+        assert await node_b.presence.remove("dev-1", "sid-b")
+        assert not await node_a.is_online("dev-1")
+        assert await node_b.count_devices() == 1
+
+    asyncio.run(scenario())
+
+
+def test_presence_falls_back_to_manager_redis(monkeypatch, caplog):
+    created = []
+    monkeypatch.setattr(
+        presence, "RedisPresence", lambda url: created.append(url) or url
+    )
+    assert presence.create_presence("", "redis://bus:6379/0") == "redis://bus:6379/0"
+    assert (
+        presence.create_presence("redis://presence", "redis://bus")
+        == "redis://presence"
+    )
+    assert presence.create_presence("", "memory://test") is None
+    assert presence.create_presence("", "") is None
+    with caplog.at_level("ERROR"):
+        assert presence.create_presence("", "amqp://guest@rabbit//") is None
+    assert "PRESENCE_REDIS_URL" in caplog.text
+
+
+def test_presence_registry_is_abstract():
+    with pytest.raises(TypeError):
+        presence.PresenceRegistry()
@@ -0,0 +1,76 @@
+import asyncio
+import inspect
+
+import msgpack
+import socketio
+from socketio import packet
+from socketio.msgpack_packet import MsgPackPacket
+
+from app.services.socket_codec import PRIVATE_SERVER_API, NegotiatingAsyncServer
+
+
+def test_private_server_api_is_still_there():
+    """Falla si una actualización de python-socketio cambia los métodos que se sobrescriben."""
+    for name, params in PRIVATE_SERVER_API.items():
+        method = getattr(socketio.AsyncServer, name, None)
+        assert method is not None, f"socketio.AsyncServer.{name} ya no existe"
+        signature = tuple(inspect.signature(method).parameters)[1:]
+        assert (
+            signature == params
+        ), f"socketio.AsyncServer.{name}{signature} cambió de firma"
+
+
+def test_serializer_is_negotiated_per_client():
+    """Los clientes con ?serializer=msgpack reciben MessagePack; el resto, JSON."""
+    server = NegotiatingAsyncServer(async_mode="asgi")
+    sent, received = [], []
+
+    async def send(eio_sid, data):
+        sent.append((eio_sid, data))
+
+    async def send_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, eio_pkt.data))
+
+    server.eio.send = send
+    server.eio.send_packet = send_packet
+
+    @server.on("heartbeat")
+    async def heartbeat(sid, data):
+        received.append(data)
+        return {"ok": True}
+
+    async def scenario():
+        await server._handle_eio_connect(
+            "mp", {"QUERY_STRING": "EIO=4&serializer=msgpack"}
+        )
+        await server._handle_eio_connect("js", {"QUERY_STRING": "EIO=4"})
+        await server._handle_eio_message(
+            "mp", MsgPackPacket(packet.CONNECT, namespace="/").encode()
+        )
+        await server._handle_eio_message("js", "0")
+        for eio_sid in ("mp", "js"):
+            sid = server.manager.sid_from_eio_sid(eio_sid, "/")
+            await server.enter_room(sid, "store:a")
+        sent.clear()
+
+        await server.emit("message", {"x": 1}, room="store:a")
+        event = MsgPackPacket(
+            packet.EVENT, data=["heartbeat", {"n": 1}], namespace="/", id=7
+        )
+        await server._handle_eio_message("mp", event.encode())
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    by_client = {}
+    for eio_sid, data in sent:
+        by_client.setdefault(eio_sid, []).append(data)
+    assert by_client["js"] == ['2["message",{"x":1}]']
+    broadcast, ack = (msgpack.loads(data) for data in by_client["mp"])
+    assert broadcast["data"] == ["message", {"x": 1}]
+    assert (
+        ack["type"] == packet.ACK and ack["id"] == 7 and ack["data"] == [{"ok": True}]
+    )
+    assert received == [{"n": 1}]
+    assert (
+        server.serializer_of("mp") == "msgpack" and server.serializer_of("js") == "json"
+    )
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from app.services import socket_service, storm_control
+from app.services.connection_registry import ConnectionRegistry
+
+
+def test_device_identifies_in_handshake(monkeypatch):
+    """Con deviceId en el auth se une a sus salas y recibe la bienvenida sin joinRoom."""
+    sio = socket_service.sio
+    sent, flushed = [], []
+
+    async def send(eio_sid, data):
+        sent.append((eio_sid, data))
+
+    async def send_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, eio_pkt.data))
+
+    async def flush_offline_queue(device_id):
+        flushed.append(device_id)
+        return 0
+
+    monkeypatch.setattr(sio.eio, "send", send)
+    monkeypatch.setattr(sio.eio, "send_packet", send_packet)
+    monkeypatch.setattr(socket_service, "flush_offline_queue", flush_offline_queue)
+    monkeypatch.setattr(socket_service.manager, "connections", ConnectionRegistry())
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(
+        storm_control, "admission", storm_control.AdmissionControl(rate=0)
+    )
+
+    async def scenario():
+        await sio._handle_eio_connect("new", {"QUERY_STRING": "EIO=4"})
+        await sio._handle_eio_connect("old", {"QUERY_STRING": "EIO=4"})
+        auth = json.dumps({"deviceId": "dev-1", "storeId": "s1"})
+        await sio._handle_eio_message("new", "0" + auth)
+        await sio._handle_eio_message("old", "0")
+        await asyncio.sleep(0.01)
+        sid = sio.manager.sid_from_eio_sid("new", "/")
+        rooms = sorted(sio.rooms(sid))
+        for eio_sid in ("new", "old"):
+            await sio._handle_eio_disconnect(eio_sid)
+        return sid, rooms
+
+    sid, rooms = asyncio.run(scenario())
+    assert rooms == sorted([sid, "dev-1", "store:s1"])
+    assert flushed == ["dev-1"]
+    new = [data for eio_sid, data in sent if eio_sid == "new"]
+    assert new[0].startswith("0{") and "connection_success" in new[1]
+    assert not any("connection_ready" in data for data in new)
+    assert any("connection_ready" in data for eio_sid, data in sent if eio_sid == "old")
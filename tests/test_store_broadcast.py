@@ -0,0 +1,82 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import socket_router
+from app.services import socket_service
+from app.services.presence import LocalPresence
+
+
+def _fake_sio(monkeypatch):
+    rooms, emitted = {}, []
+
+    async def enter_room(sid, room, namespace=None):
+        rooms.setdefault(room, set()).add(sid)
+
+    async def leave_room(sid, room, namespace=None):
+        rooms[room].discard(sid)
+
+    async def emit(event, data, room=None, **kwargs):
+        emitted.append((event, room, data))
+
+    monkeypatch.setattr(socket_service.sio, "enter_room", enter_room)
+    monkeypatch.setattr(socket_service.sio, "leave_room", leave_room)
+    monkeypatch.setattr(socket_service.sio, "emit", emit)
+    return rooms, emitted
+
+
+def test_store_broadcast_is_one_emit_with_registry_count(monkeypatch):
+    rooms, emitted = _fake_sio(monkeypatch)
+    manager = socket_service.ConnectionManager()
+    monkeypatch.setattr(socket_router, "manager", manager)
+
+    async def join():
+        await manager.connect("s1", "dev-1", "store-a", "overdue")
+        await manager.connect("s2", "dev-1", "store-a", "overdue")  # segundo socket
+        await manager.connect("s3", "dev-2", "store-a")
+        await manager.connect("s4", "dev-3", "store-b", "overdue")
+
+    asyncio.run(join())
+    assert rooms["store:store-a"] == {"s1", "s2", "s3"}
+    assert rooms["store:store-a:plan:overdue"] == {"s1", "s2"}
+
+    client = TestClient(app)
+    response = client.post("/api/v1/broadcast/store/store-a", json={"message": "Hola"})
+    assert response.status_code == 200 and response.json()["recipients"] == 2
+    response = client.post(
+        "/api/v1/broadcast/store/store-a",
+        json={"message": "Pago", "plan_state": "overdue"},
+    )
+    assert response.json()["recipients"] == 1
+    assert [(event, room) for event, room, _ in emitted] == [
+        ("message", "store:store-a"),
+        ("message", "store:store-a:plan:overdue"),
+    ]
+    assert (
+        client.post(
+            "/api/v1/broadcast/store/store-x", json={"message": "?"}
+        ).status_code
+        == 404
+    )
+
+
+def test_store_count_uses_shared_presence_and_rejoin_moves_rooms(monkeypatch):
+    rooms, _ = _fake_sio(monkeypatch)
+    store = {}
+    node_a = socket_service.ConnectionManager(presence=LocalPresence(store))
+    node_b = socket_service.ConnectionManager(presence=LocalPresence(store))
+
+    async def scenario():
+        await node_a.connect("s1", "dev-1", "store-a")
+        await node_b.connect("s2", "dev-2", "store-a", "overdue")
+        assert await node_a.count_store_devices("store-a") == 2
+        assert await node_a.count_store_devices("store-a", "overdue") == 1
+
+        await node_b.connect("s2", "dev-2", "store-b")  # vuelve a identificarse
+        assert rooms["store:store-a"] == {"s1"} and rooms["store:store-b"] == {"s2"}
+        assert await node_a.count_store_devices("store-a", "overdue") == 0
+        await node_a.disconnect("s1")
+        assert await node_b.count_store_devices("store-a") == 0
+
+    asyncio.run(scenario())
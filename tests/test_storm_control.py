@@ -0,0 +1,126 @@
+import asyncio
+import signal
+
+from app.services import socket_service, storm_control
+from app.services.connection_registry import ConnectionRegistry
+from app.services.storm_control import AdmissionControl
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_admission_rate_and_spread_retry_hints():
+    """Pasada la ráfaga se rechaza, con pistas de reintento cada vez más lejanas."""
+    clock = FakeClock()
+    admission = AdmissionControl(
+        rate=10, burst=5, retry_min=0, retry_max=60, clock=clock
+    )
+
+    assert [admission.admit() for _ in range(5)] == [None] * 5
+    hints = [admission.admit() for _ in range(20)]
+    assert all(hint is not None for hint in hints)
+    # El rechazo n-ésimo espera al menos n / rate segundos (más jitter)
+    for n, hint in enumerate(hints, start=1):
+        assert n / 10 <= hint <= n / 10 * 1.5 + 1e-9
+    # El bucket se rellena al ritmo de admisión, hasta la ráfaga
+    clock.now += 1
+    assert [admission.admit() for _ in range(5)] == [None] * 5
+    assert admission.admit() is not None
+    assert admission.admitted == 10 and admission.refused == 21
+
+    admission.draining = True
+    assert 0 <= admission.admit() <= 60
+
+
+def test_warmup_limits_deferred_work():
+    clock = FakeClock()
+    admission = AdmissionControl(rate=0, warmup=30, warmup_concurrency=2, clock=clock)
+    running, peak = [0], [0]
+
+    async def flush():
+        async with admission.deferred():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(flush() for _ in range(6)))
+        limited = peak[0]
+        clock.now += 31  # fin del calentamiento
+        peak[0] = 0
+        await asyncio.gather(*(flush() for _ in range(6)))
+        return limited, peak[0]
+
+    assert asyncio.run(scenario()) == (2, 6)
+
+
+def test_drain_spreads_disconnects(monkeypatch):
+    sio = socket_service.sio
+    sent = []
+
+    async def send(eio_sid, data):
+        sent.append((eio_sid, data))
+
+    async def send_packet(eio_sid, eio_pkt):
+        sent.append((eio_sid, eio_pkt.data))
+
+    monkeypatch.setattr(sio.eio, "send", send)
+    monkeypatch.setattr(sio.eio, "send_packet", send_packet)
+    monkeypatch.setattr(socket_service.manager, "connections", ConnectionRegistry())
+    monkeypatch.setattr(socket_service.manager, "presence", None)
+    monkeypatch.setattr(storm_control, "admission", AdmissionControl(rate=0))
+
+    async def scenario():
+        for index in range(4):
+            await sio._handle_eio_connect(f"e{index}", {"QUERY_STRING": "EIO=4"})
+            await sio._handle_eio_message(f"e{index}", "0")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        drained = await socket_service.drain_connections(window=0.2)
+        elapsed = loop.time() - start
+        remaining = list(sio.manager.get_participants("/", None))
+        refused = storm_control.admission.admit()
+        return drained, elapsed, remaining, refused
+
+    drained, elapsed, remaining, refused = asyncio.run(scenario())
+    assert drained == 4 and remaining == []
+    assert 0.1 <= elapsed < 0.2 + 0.1
+    assert sum("reconnect_hint" in data for _, data in sent) == 4
+    # Mientras drena no se admiten sesiones nuevas
+    assert refused is not None
+
+
+def test_stop_signal_drains_before_shutdown(monkeypatch):
+    """La señal de parada drena primero y luego pasa al manejador de uvicorn."""
+    calls = []
+    monkeypatch.setattr(storm_control, "admission", AdmissionControl(rate=0))
+
+    async def drain():
+        calls.append("drain")
+        await asyncio.sleep(0.05)
+        calls.append("drained")
+        return 0
+
+    monkeypatch.setattr(socket_service, "drain_connections", drain)
+    original = signal.signal(signal.SIGUSR1, lambda sig, frame: calls.append(sig))
+
+    async def scenario():
+        assert socket_service.drain_on_signal((signal.SIGUSR1,))
+        signal.raise_signal(signal.SIGUSR1)
+        # Mientras drena no se admiten sesiones nuevas
+        assert storm_control.admission.admit() is not None
+        await asyncio.sleep(0.1)
+        # Una segunda señal pasa directamente
+        signal.raise_signal(signal.SIGUSR1)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        signal.signal(signal.SIGUSR1, original)
+    assert calls == ["drain", "drained", signal.SIGUSR1, signal.SIGUSR1]
@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import upstream
+
+
+def test_client_is_shared_between_calls():
+    """Todas las llamadas reutilizan el mismo cliente con pool."""
+
+    async def scenario():
+        first = upstream.get_client()
+        async with upstream.client_session() as client:
+            assert client is first
+        # Salir del bloque no debe cerrar el cliente compartido
+        assert not first.is_closed
+        await upstream.close_client()
+        assert first.is_closed
+
+    asyncio.run(scenario())
+
+
+def test_lifespan_opens_and_closes_client():
+    """El lifespan crea el cliente al arrancar y lo cierra al apagar."""
+    with TestClient(app):
+        client = upstream.get_client()
+        assert not client.is_closed
+    assert client.is_closed
+
+
+def test_http2_falls_back_to_http1_when_peer_rejects_h2():
+    """Un host que no habla h2 queda marcado y se atiende por HTTP/1.1."""
+    calls = {"h2": 0, "h1": 0}
+
+    def reject_h2(request):
+        calls["h2"] += 1
+        raise httpx.RemoteProtocolError("invalid preface", request=request)
+
+    def serve_h1(request):
+        calls["h1"] += 1
+        return httpx.Response(200, json={"ok": True})
+
+    now = [0.0]
+    transport = upstream.Http2Transport(
+        httpx.MockTransport(reject_h2),
+        lambda: httpx.MockTransport(serve_h1),
+        max_streams=2,
+        retry_h2_after=60,
+        clock=lambda: now[0],
+    )
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(3):
+                response = await client.get("http://db-api:8002/api/v1/roles/")
+                assert response.json() == {"ok": True}
+            # Pasada la ventana se vuelve a probar HTTP/2
+            now[0] += 61
+            response = await client.get("http://db-api:8002/api/v1/roles/")
+            assert response.json() == {"ok": True}
+
+    asyncio.run(scenario())
+    assert calls == {"h2": 2, "h1": 4}
@@ -0,0 +1,46 @@
+import uuid
+
+from app.auth.user_cache import UserCache
+from app.models.user import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(user_id):
+    return User(user_id=user_id, email="user@example.com", username="user")
+
+
+def test_entries_expire_and_are_evicted_lru():
+    """Las entradas caducan por TTL y se descarta la menos usada."""
+    clock = FakeClock()
+    cache = UserCache(ttl=10, max_size=2, clock=clock)
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+
+    cache.put(ids[0], make_user(ids[0]))
+    cache.put(ids[1], make_user(ids[1]))
+    assert cache.get(ids[0]) is not None
+    cache.put(ids[2], make_user(ids[2]))
+    # ids[1] era la menos usada
+    assert cache.get(ids[1]) is None
+    assert len(cache) == 2
+
+    clock.now = 11
+    assert cache.get(ids[0]) is None
+
+
+def test_load_started_before_invalidation_is_not_cached():
+    """Una carga iniciada antes de una mutación no vuelve a poblar la caché."""
+    cache = UserCache(ttl=10, max_size=10, clock=FakeClock())
+    user_id = str(uuid.uuid4())
+
+    generation = cache.generation
+    cache.invalidate(user_id)
+    cache.put(user_id, make_user(user_id), generation)
+
+    assert cache.get(user_id) is None